@@ -1,4 +1,32 @@
-from .frame import FoconFrame
-from .bus import FoconTransport, FoconSerialTransport, FoconBus
-from .message import FoconMessage, FoconMessageBus
-from .devices.display import FoconDisplay
+from typing import TYPE_CHECKING, Any
+import importlib
+
+if TYPE_CHECKING:
+	from .frame import FoconFrame, FoconFrameLog
+	from .bus import FoconTransport, FoconSerialTransport, FoconBus
+	from .message import FoconMessage, FoconMessageBus
+	from .devices.display import FoconDisplay
+
+# submodules are only imported once one of their names is used, to keep start-up fast
+LAZY_NAMES = {
+	'FoconFrame': '.frame',
+	'FoconFrameLog': '.frame',
+	'FoconTransport': '.bus',
+	'FoconSerialTransport': '.bus',
+	'FoconBus': '.bus',
+	'FoconMessage': '.message',
+	'FoconMessageBus': '.message',
+	'FoconDisplay': '.devices.display',
+}
+
+__all__ = list(LAZY_NAMES)
+
+def __getattr__(name: str) -> Any:
+	if name not in LAZY_NAMES:
+		raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+	value = getattr(importlib.import_module(LAZY_NAMES[name], __name__), name)
+	globals()[name] = value
+	return value
+
+def __dir__() -> list[str]:
+	return sorted(set(globals()) | set(__all__))
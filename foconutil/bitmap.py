@@ -0,0 +1,111 @@
+from typing import Any, Iterator, List
+
+from dataclasses import dataclass
+
+
+def column_stride(height: int) -> int:
+	return ((height + 15) // 16) * 2
+
+@dataclass(frozen=True)
+class FoconBitmap:
+	# Column-major 1-bit bitmap, stored in the exact layout DrawPixels expects:
+	# every column is padded to a multiple of 16 rows, MSB first from the top.
+	width:  int
+	height: int
+	data:   bytes
+
+	@property
+	def stride(self) -> int:
+		return column_stride(self.height)
+
+	@classmethod
+	def blank(cls, width: int, height: int) -> 'FoconBitmap':
+		return cls(width=width, height=height, data=bytes(width * column_stride(height)))
+
+	@classmethod
+	def filled(cls, width: int, height: int) -> 'FoconBitmap':
+		stride = column_stride(height)
+		column = (((1 << height) - 1) << (stride * 8 - height)).to_bytes(stride, 'big')
+		return cls(width=width, height=height, data=column * width)
+
+	@classmethod
+	def from_columns(cls, columns: List[int], height: int) -> 'FoconBitmap':
+		stride = column_stride(height)
+		return cls(width=len(columns), height=height, data=b''.join(c.to_bytes(stride, 'big') for c in columns))
+
+	@classmethod
+	def from_values(cls, values: List[List[bool]], height: int) -> 'FoconBitmap':
+		nbits = column_stride(height) * 8
+		columns = []
+		for col in values:
+			bits = ''.join('1' if v else '0' for v in col[:height])
+			columns.append(int(bits, 2) << (nbits - len(bits)) if bits else 0)
+		return cls.from_columns(columns, height)
+
+	@classmethod
+	def from_image(cls, image: Any) -> 'FoconBitmap':
+		import PIL.Image
+
+		if image.mode != '1':
+			image = image.convert('1')
+		stride = column_stride(image.height)
+		# Transposing turns columns into rows, which PIL already packs MSB first;
+		# pasting into a wider canvas pads every row to the column stride in one go.
+		transposed = image.transpose(PIL.Image.Transpose.TRANSPOSE)
+		if transposed.width != stride * 8:
+			padded = PIL.Image.new('1', (stride * 8, transposed.height))
+			padded.paste(transposed, (0, 0))
+			transposed = padded
+		return cls(width=image.width, height=image.height, data=transposed.tobytes())
+
+	def to_image(self) -> Any:
+		import PIL.Image
+
+		# the reverse of from_image: every packed column is a row of the transposed image
+		transposed = PIL.Image.frombytes('1', (self.stride * 8, self.width), self.data)
+		return transposed.transpose(PIL.Image.Transpose.TRANSPOSE).crop((0, 0, self.width, self.height))
+
+	def column(self, x: int) -> int:
+		stride = self.stride
+		return int.from_bytes(self.data[x * stride:(x + 1) * stride], 'big')
+
+	def columns(self) -> Iterator[int]:
+		for x in range(self.width):
+			yield self.column(x)
+
+	def to_values(self) -> List[List[bool]]:
+		nbits = self.stride * 8
+		return [[bool(c >> (nbits - 1 - y) & 1) for y in range(self.height)] for c in self.columns()]
+
+	def is_empty(self) -> bool:
+		return not any(self.data)
+
+	def occupied_columns(self) -> List[bool]:
+		stride = self.stride
+		return [any(self.data[x * stride:(x + 1) * stride]) for x in range(self.width)]
+
+	def bbox(self) -> tuple[int, int, int, int] | None:
+		occupied = [x for x, o in enumerate(self.occupied_columns()) if o]
+		if not occupied:
+			return None
+		mask = 0
+		for x in occupied:
+			mask |= self.column(x)
+		nbits = self.stride * 8
+		y_start = nbits - mask.bit_length()
+		y_end = nbits - 1 - ((mask & -mask).bit_length() - 1)
+		return occupied[0], y_start, occupied[-1], y_end
+
+	def crop(self, x_start: int, y_start: int, x_end: int, y_end: int) -> 'FoconBitmap':
+		height = y_end - y_start + 1
+		nbits = self.stride * 8
+		new_nbits = column_stride(height) * 8
+		mask = (1 << height) - 1
+		shift = nbits - y_start - height
+		columns = []
+		# areas outside of the bitmap are padded with blank pixels
+		for x in range(x_start, x_end + 1):
+			c = self.column(x) if 0 <= x < self.width else 0
+			c = (c >> shift if shift >= 0 else c << -shift) & mask
+			columns.append(c << (new_nbits - height))
+		return self.from_columns(columns, height)
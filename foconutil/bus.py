@@ -1,10 +1,13 @@
-from typing import Callable, Protocol
+from typing import Callable, Protocol, Sequence
 from logging import getLogger
 
+import time
 from math import ceil
-from serial import Serial
+from dataclasses import dataclass
 
 from .frame import FoconFrame
+from .direction import FoconDirectionControl, make_direction_control
+from .util import FoconBuffer, split_parts
 
 LOG = getLogger(__name__)
 
@@ -13,71 +16,233 @@ class FoconTransport(Protocol):
 	def read(self) -> bytes:
 		...
 
-	def write(self, data: bytes) -> None:
+	def write(self, data: FoconBuffer) -> None:
+		# data may be a view on a buffer that is reused for the next frame, so it must not be kept around
 		...
 
 class FoconSerialTransport(FoconTransport):
 	BAUDRATE = 57600
 	XTAL = 1.8432
 
-	def __init__(self, device: str, flow_control: bool = False, baudrate: int | None = None, xtal: float | None = None, debug=False) -> None:
+	# seconds without a byte before a read gives up
+	TIMEOUT = 2.0
+
+	def __init__(self, device: str, flow_control: bool = False, baudrate: int | None = None, xtal: float | None = None,
+	             direction: FoconDirectionControl | str | None = None, debug: bool = False, timeout: float | None = None) -> None:
 		if baudrate is None:
 			baudrate = self.BAUDRATE
 		if xtal is not None:
 			baudrate = int(baudrate * (xtal / self.XTAL))
 		LOG.debug('connecting at baud rate: %s', baudrate)
 
-		self.serial = Serial(device, baudrate=baudrate, rtscts=flow_control)
+		# flow control used to imply toggling RTS around every write
+		if direction is None:
+			direction = 'rts' if flow_control else 'none'
+		if isinstance(direction, str):
+			direction = make_direction_control(direction)
+
+		if flow_control and direction.uses_rts:
+			# RTS is switched by hand then, flow control would fight over it
+			LOG.debug('direction control uses RTS, not enabling RTS/CTS flow control')
+			flow_control = False
+
+		from serial import Serial
+		self.serial = Serial(device, baudrate=baudrate, rtscts=flow_control, timeout=self.TIMEOUT if timeout is None else timeout)
 		self.serial.reset_output_buffer()
 		self.serial.reset_input_buffer()
+		self.direction = direction
+		self.direction.attach(self.serial)
 		self.debug = debug
 		self.n = 0
 
 	def read(self) -> bytes:
-		if self.serial.rtscts:
-			self.serial.setRTS(0)
+		self.direction.receive()
 		data: bytes = self.serial.read()
+		if not data:
+			raise TimeoutError(f'no data from {self.serial.port} within {self.serial.timeout}s')
 		self.n += len(data)
 		if self.debug:
 			LOG.debug('  <: %s', data.hex())
 		return data
 
-	def write(self, data: bytes) -> None:
+	def write(self, data: FoconBuffer) -> None:
 		if self.debug:
 			LOG.debug('  >: %s', data.hex())
-		if self.serial.rtscts:
-			self.serial.setRTS(1)
+		# the line is only released again once we start reading, so back-to-back frames don't toggle it
+		self.direction.transmit()
 		self.serial.write(data)
 		self.n += len(data)
-		if self.serial.rtscts:
-			self.serial.setRTS(0)
+
+@dataclass(slots=True)
+class FoconBusStats:
+	# frames addressed to us
+	received: int = 0
+	# frames addressed to other devices
+	foreign:  int = 0
+	# our own frames, echoed back by the adapter
+	echoes:   int = 0
+	# frames that could not be parsed
+	errors:   int = 0
+	# frames sent again after a NAK
+	resent:   int = 0
+
+class FoconFrameSizeTuner:
+	# Finds the frame size with the best goodput towards a peer: every candidate size is tried for a number
+	# of acknowledged frames, after which the fastest one is used until it is time to measure again.
+	# Frames that are NAK'ed cost time without delivering any data, so noisy links favour smaller frames.
+	# up to FoconBus.MAX_FRAME_SIZE
+	SIZES = (64, 128, 256, 512)
+
+	def __init__(self, sizes: Sequence[int] = SIZES, samples: int = 8, retune_after: int = 1024) -> None:
+		self.sizes = tuple(sizes)
+		self.samples = samples
+		self.retune_after = retune_after
+		self.reset()
+
+	def reset(self) -> None:
+		# size -> [frames, failed frames, delivered bytes, time spent]
+		self.measurements = {size: [0, 0, 0, 0.0] for size in self.sizes}
+		self.best: int | None = None
+		self.settled_frames = 0
+
+	@property
+	def size(self) -> int:
+		if self.best is not None:
+			return self.best
+		for size, (frames, _, _, _) in self.measurements.items():
+			if frames < self.samples:
+				return size
+		return self.settle()
+
+	def goodput(self, size: int) -> float:
+		_, _, nbytes, elapsed = self.measurements[size]
+		return nbytes / elapsed if elapsed else 0.0
+
+	def error_rate(self, size: int) -> float:
+		frames, failed, _, _ = self.measurements[size]
+		return failed / frames if frames else 0.0
+
+	def settle(self) -> int:
+		self.best = max(self.sizes, key=self.goodput)
+		LOG.info('settled on frame size %d (%.0f B/s, %.1f%% errors)', self.best, self.goodput(self.best), self.error_rate(self.best) * 100)
+		return self.best
+
+	def record(self, size: int, nbytes: int, elapsed: float, ok: bool) -> None:
+		if size not in self.measurements:
+			return
+		m = self.measurements[size]
+		m[0] += 1
+		m[1] += not ok
+		m[2] += nbytes if ok else 0
+		m[3] += elapsed
+		if self.best is not None:
+			self.settled_frames += 1
+			if self.settled_frames >= self.retune_after:
+				self.reset()
 
 class FoconPeer:
+	__slots__ = ('frames', 'seq', 'awaiting', 'nak', 'reply', 'frame_size', 'tuner')
+
 	def __init__(self):
 		self.frames = []
 		self.seq = None
-		self.rx = False
+		# frames sent that were not answered yet: replies are only polled for once nothing is on its way
+		self.awaiting = 0
+		# whether the last message consumed from this peer was a NAK
+		self.nak = False
+		# a reply that came in while waiting for an acknowledgement
+		self.reply: bytes | None = None
+		self.frame_size: int | None = None
+		self.tuner: FoconFrameSizeTuner | None = None
 
 
 class FoconBus:
-	def __init__(self, transport: FoconTransport, src_id: int, debug: bool = False) -> None:
+	MAX_FRAME_SIZE = 512
+	# how often a NAK'ed frame is sent again before giving up
+	MAX_RETRIES = 3
+
+	def __init__(self, transport: FoconTransport, src_id: int, debug: bool = False, clock: Callable[[], float] = time.monotonic) -> None:
 		self.transport = transport
+		self.clock = clock
 		self.src_id = src_id
-		self.pending_data = b''
-		self.peers: dict[int, FoconPeer] = {}
+		self.pending_data = bytearray()
+		self.peers: dict[int | None, FoconPeer] = {}
 		self.debug = debug
+		self.stats = FoconBusStats()
+		# raw source and destination bytes, to filter frames before parsing them
+		self.own_id = FoconFrame.ID_MAP[src_id][0]
+		self.accepted_ids = (self.own_id, FoconFrame.ID_MAP[None][0])
+		self.tx_buffer = bytearray(FoconFrame.OVERHEAD + self.MAX_FRAME_SIZE)
+
+	def get_peer(self, peer_id: int | None) -> FoconPeer:
+		if peer_id not in self.peers:
+			self.peers[peer_id] = FoconPeer()
+		return self.peers[peer_id]
+
+	def check_frame_size(self, size: int) -> None:
+		if not 0 < size <= self.MAX_FRAME_SIZE:
+			raise ValueError(f'frame size {size} out of range, has to be 1 to {self.MAX_FRAME_SIZE}')
+
+	def set_frame_size(self, peer_id: int | None, size: int | None) -> None:
+		if size is not None:
+			self.check_frame_size(size)
+		peer = self.get_peer(peer_id)
+		peer.frame_size = size
+		peer.tuner = None
+
+	def tune_frame_size(self, peer_id: int | None, tuner: FoconFrameSizeTuner | None = None) -> FoconFrameSizeTuner:
+		tuner = tuner or FoconFrameSizeTuner()
+		for size in tuner.sizes:
+			self.check_frame_size(size)
+		peer = self.get_peer(peer_id)
+		peer.tuner = tuner
+		return peer.tuner
+
+	def frame_size_of(self, peer_id: int | None) -> int:
+		peer = self.peers.get(peer_id)
+		if peer is None:
+			return self.MAX_FRAME_SIZE
+		if peer.tuner:
+			return peer.tuner.size
+		return peer.frame_size or self.MAX_FRAME_SIZE
 
-	def send_message(self, dest_id: int | None, data: bytes) -> None:
-		max_frame_size = 512
-		nframes = ceil(len(data) / max_frame_size)
-		for i in range(nframes):
-			frame = FoconFrame(src_id=self.src_id, dest_id=dest_id, num=i + 1, total=nframes, data=data[i * max_frame_size:(i + 1) * max_frame_size])
+	def frame_size_for(self, dest_id: int | None, length: int) -> int:
+		# frames are numbered with a single byte
+		return max(self.frame_size_of(dest_id), ceil(length / 255))
+
+	def frame_count(self, dest_id: int | None, length: int) -> int:
+		return max(1, ceil(length / self.frame_size_for(dest_id, length)))
+
+	def send_message(self, dest_id: int | None, *parts: FoconBuffer) -> None:
+		# parts are concatenated on the wire, but only ever copied into the frame buffer
+		length = sum(len(p) for p in parts)
+		frame_size = self.frame_size_for(dest_id, length)
+		tuner = self.peers[dest_id].tuner if dest_id in self.peers else None
+		nframes = ceil(length / frame_size)
+		for i, chunk in enumerate(split_parts(parts, frame_size)):
 			if self.debug:
-				LOG.debug(' > frame: %s', frame)
-			self.send_frame(frame)
-			if (i + 1) < nframes:
-				assert dest_id is not None
-				self.recv_ack(dest_id)
+				LOG.debug(' > frame: %r', FoconFrame(src_id=self.src_id, dest_id=dest_id, num=i + 1, total=nframes, data=b''.join(chunk)))
+			if nframes == 1:
+				# a single frame is answered by the reply to the message itself, so it can't be timed here
+				self.send_frame_parts(dest_id, i + 1, nframes, chunk)
+				if tuner:
+					# still count it, so exploring a size that never splits messages doesn't stall
+					tuner.record(frame_size, 0, 0.0, True)
+				break
+
+			assert dest_id is not None
+			for attempt in range(self.MAX_RETRIES + 1):
+				start = self.clock()
+				self.send_frame_parts(dest_id, i + 1, nframes, chunk)
+				acked = self.recv_ack(dest_id) if (i + 1) < nframes else self.recv_final_ack(dest_id)
+				if tuner:
+					tuner.record(frame_size, sum(len(c) for c in chunk), self.clock() - start, acked)
+				if acked:
+					break
+				LOG.debug('frame %d/%d to %r was not acknowledged, resending', i + 1, nframes, dest_id)
+				self.stats.resent += 1
+			else:
+				raise IOError(f'frame {i + 1}/{nframes} to {dest_id} was not acknowledged after {self.MAX_RETRIES} retries')
 
 	def send_req(self, dest_id: int) -> None:
 		frame = FoconFrame(src_id=self.src_id, dest_id=dest_id, num=0, total=0, data=b'')
@@ -86,15 +251,26 @@ class FoconBus:
 		return self.send_frame(frame)
 
 	def send_frame(self, frame: FoconFrame) -> None:
-		self.transport.write(frame.pack())
-		if frame.dest_id not in self.peers:
-			self.peers[frame.dest_id] = FoconPeer()
-		self.peers[frame.dest_id].rx = True
-		self.peers[frame.dest_id].seq = frame.num
+		self.send_frame_parts(frame.dest_id, frame.num, frame.total, [frame.data])
+
+	def send_frame_parts(self, dest_id: int | None, num: int, total: int, parts: Sequence[FoconBuffer]) -> None:
+		size = FoconFrame.OVERHEAD + sum(len(p) for p in parts)
+		if len(self.tx_buffer) < size:
+			self.tx_buffer = bytearray(size)
+		self.transport.write(FoconFrame.pack_into(self.tx_buffer, self.src_id, dest_id, num, total, parts))
+		peer = self.get_peer(dest_id)
+		if dest_id is not None:
+			# broadcasts are never answered
+			peer.awaiting += 1
+		peer.seq = num
 
 	def recv_message(self, peer_id, checker: Callable[[bytes | None], bool] | None = None) -> bytes | None:
 		if peer_id not in self.peers:
 			self.peers[peer_id] = FoconPeer()
+		early = self.peers[peer_id].reply
+		if early is not None and (not checker or checker(early)):
+			self.peers[peer_id].reply = None
+			return early
 
 		while True:
 			found = False
@@ -112,40 +288,81 @@ class FoconBus:
 					break
 
 			if found:
+				self.peers[peer_id].nak = peer.frames[-1].is_nak
 				peer.frames = []
-				peer.seq = None
+				if not peer.awaiting:
+					# replies to pipelined messages still to come end on the same frame number
+					peer.seq = None
 				return frame_data
 
 			frame = None
 			while not frame:
-				if not self.peers[peer_id].rx:
+				if not self.peers[peer_id].awaiting:
 					self.send_req(peer_id)
-				frame = self.recv_frame()
+				try:
+					frame = self.recv_frame()
+				except TimeoutError:
+					# whatever was on its way is lost, the next exchange starts over with a poll
+					for peer in self.peers.values():
+						peer.awaiting = 0
+						peer.frames = []
+					raise
 
 			if frame.src_id not in self.peers:
 				self.peers[frame.src_id] = FoconPeer()
-			self.peers[frame.src_id].rx = False
+			sender = self.peers[frame.src_id]
+			sender.awaiting = max(sender.awaiting - 1, 0)
 			self.peers[frame.src_id].frames.append(frame)
 
 	def recv_frame(self) -> FoconFrame | None:
-		while True:
+		# frames can arrive together, only wait for more data if none is complete yet
+		try:
+			buffered = FoconFrame.scan(self.pending_data) is not None
+		except ValueError:
+			# garbage, to be discarded below
+			buffered = True
+		if not buffered:
 			self.pending_data += self.transport.read()
+		while True:
 			try:
-				frame, self.pending_data = FoconFrame.unpack(self.pending_data)
-				if frame.dest_id not in (self.src_id, None):
+				span = FoconFrame.scan(self.pending_data)
+				if not span:
+					return None
+				start, end = span
+
+				# drop frames that are not for us straight from the header, without checking them
+				if self.pending_data[start + 1] == self.own_id:
+					self.stats.echoes += 1
+					del self.pending_data[:end]
 					continue
+				if self.pending_data[start + 2] not in self.accepted_ids:
+					self.stats.foreign += 1
+					del self.pending_data[:end]
+					continue
+
+				frame, _ = FoconFrame.unpack(bytes(self.pending_data[start:end]))
+				del self.pending_data[:end]
+				self.stats.received += 1
 				if self.debug:
 					LOG.debug(' < frame: %r', frame)
 				return frame
-			except EOFError:
-				return None
 			except Exception as e:
 				LOG.warn('Error parsing frame data %s, discarding: %s', self.pending_data.hex(), e)
-				self.pending_data = b''
+				self.stats.errors += 1
+				self.pending_data.clear()
 				return None
 
-	def recv_ack(self, dest_id: int) -> None:
+	def recv_ack(self, dest_id: int) -> bool:
 		self.recv_message(dest_id, lambda data: data is None)
+		return not self.peers[dest_id].nak
+
+	def recv_final_ack(self, dest_id: int) -> bool:
+		# the last frame of a longer message is either acknowledged, with the reply to be polled for, or answered
+		# with the reply right away: keep that around for whoever asks for it next
+		data = self.recv_message(dest_id, lambda data: True)
+		if data is not None:
+			self.peers[dest_id].reply = data
+		return not self.peers[dest_id].nak
 
 	def recv_next_message(self, dest_id: int, checker: Callable[[bytes | None], bool] | None) -> bytes | None:
 		def inner_checker(data: bytes | None) -> bool:
@@ -0,0 +1,99 @@
+from typing import Any, List
+
+from dataclasses import dataclass
+
+from .bitmap import FoconBitmap
+from .devices.display import (
+	FoconDisplay, FoconDisplayConfiguration, FoconDisplayOutputConfiguration, FoconDisplayDrawSpec,
+	FoconDisplayDrawComposition, FoconDisplayDrawTransition, FoconDisplayDrawStatus, FoconDisplayDrawList,
+	ANONYMOUS_OBJECT_ID,
+)
+
+
+@dataclass
+class FoconCanvasRegion:
+	output: FoconDisplayOutputConfiguration
+	# position on the canvas
+	x: int
+	y: int
+	width: int
+	height: int
+	# position in output coordinates
+	x_start: int
+	y_start: int
+
+class FoconDisplayCanvas:
+	def __init__(self, display: FoconDisplay, config: FoconDisplayConfiguration | None = None, vertical: bool = False) -> None:
+		self.display = display
+		self.config = config or display.get_current_config()
+		self.vertical = vertical
+		self.regions = self.layout(self.config, vertical)
+
+	@staticmethod
+	def layout(config: FoconDisplayConfiguration, vertical: bool = False) -> List[FoconCanvasRegion]:
+		# outputs are chained in index order, side by side (or stacked, for vertical displays)
+		regions = []
+		offset = 0
+		for output in sorted(config.outputs, key=lambda o: o.index):
+			(x_start, x_end), (y_start, y_end) = config.area_of(output)
+			width = x_end - x_start + 1
+			height = y_end - y_start + 1
+			if vertical:
+				regions.append(FoconCanvasRegion(output, 0, offset, width, height, x_start, y_start))
+				offset += height
+			else:
+				regions.append(FoconCanvasRegion(output, offset, 0, width, height, x_start, y_start))
+				offset += width
+		return regions
+
+	@property
+	def width(self) -> int:
+		return max((r.x + r.width for r in self.regions), default=0)
+
+	@property
+	def height(self) -> int:
+		return max((r.y + r.height for r in self.regions), default=0)
+
+	def check_size(self, width: int, height: int) -> None:
+		if (width, height) != (self.width, self.height):
+			raise ValueError(f'image size {width}x{height} does not match canvas size {self.width}x{self.height}')
+
+	def slice(self, image: Any) -> List[tuple[FoconCanvasRegion, FoconBitmap]]:
+		if isinstance(image, FoconBitmap):
+			self.check_size(image.width, image.height)
+			if all(region.y == 0 and region.height == image.height for region in self.regions):
+				# full-height slices are plain column ranges of the packed data
+				stride = image.stride
+				return [
+					(region, FoconBitmap(width=region.width, height=region.height, data=image.data[region.x * stride:(region.x + region.width) * stride]))
+					for region in self.regions
+				]
+			image = image.to_image()
+		else:
+			self.check_size(*image.size)
+		return [
+			(region, FoconBitmap.from_image(image.crop((region.x, region.y, region.x + region.width, region.y + region.height))))
+			for region in self.regions
+		]
+
+	def specs(self, object_id: int = ANONYMOUS_OBJECT_ID, composition: FoconDisplayDrawComposition = FoconDisplayDrawComposition.Replace, transition: FoconDisplayDrawTransition = FoconDisplayDrawTransition.Appear, **kwargs: Any) -> List[FoconDisplayDrawSpec]:
+		return [
+			FoconDisplayDrawSpec(
+				object_id=object_id,
+				output_id=region.output.index,
+				composition=composition,
+				transition=transition,
+				x_start=region.x_start,
+				y_start=region.y_start,
+				x_end=region.x_start + region.width - 1,
+				y_end=region.y_start + region.height - 1,
+				**kwargs,
+			) for region in self.regions
+		]
+
+	def draw(self, image: Any, object_id: int = ANONYMOUS_OBJECT_ID, composition: FoconDisplayDrawComposition = FoconDisplayDrawComposition.Replace, transition: FoconDisplayDrawTransition = FoconDisplayDrawTransition.Appear, optimize: bool = True, **kwargs: Any) -> List[FoconDisplayDrawStatus | FoconDisplayDrawList | None]:
+		specs = self.specs(object_id=object_id, composition=composition, transition=transition, **kwargs)
+		batch = self.display.batch()
+		for (region, part), spec in zip(self.slice(image), specs):
+			batch.draw_bitmap(part, spec, optimize=optimize)
+		return batch.commit()
@@ -1,39 +1,97 @@
+import io
 import sys
+import json
+import shlex
 import argparse
+import contextlib
 import logging
 import time
-try:
-	import PIL.Image
-except ImportError:
-	# Not mandatory
-	PIL = None
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable
 
-from . import FoconFrame, FoconSerialTransport, FoconBus, FoconMessageBus, FoconDisplay
-from .devices.bootloader import FoconBootDevice, FoconBootHeader
-from .devices.display import *
+from .direction import DIRECTION_CONTROLS
 
+if TYPE_CHECKING:
+	from .message import FoconMessageBus
+	from .prepare import FoconImagePreparer
+	from .devices.display import FoconDisplay, FoconDisplayBatch, FoconDisplayDrawSpec
+
+# Everything else is imported by the commands that use it: the display schemas alone take
+# tens of milliseconds to build, which shouldn't slow down the commands that don't need them.
+
+
+def parse_batch_line(line: str) -> list[str] | None:
+	# a command line, a JSON list of arguments, or a JSON object with either; None for blank lines and comments
+	line = line.strip()
+	if not line or line.startswith('#'):
+		return None
+	if line[0] in '[{':
+		command = json.loads(line)
+		if isinstance(command, dict):
+			command = command['args'] if 'args' in command else shlex.split(command['command'])
+		return [str(arg) for arg in command]
+	return shlex.split(line)
 
 def main() -> None:
-	p = argparse.ArgumentParser()
-	p.add_argument('-d', '--device', default='/dev/ttyUSB0', help='bus device')
-	p.add_argument('-b', '--baudrate', type=int, help='bus baud rate')
-	p.add_argument('-x', '--crystal', type=float, help='crystal oscillator frequency')
-	p.add_argument('--flow-control', action='store_true', default=False, help='enable hardware flow control')
-	p.add_argument('-D', '--debug', action='count', default=0, help='debug log')
-	p.add_argument('-s', '--source-id', type=int, default=14, help='source device ID')
-	p.add_argument('-i', '--id', type=int, default=0, help='device ID')
+	options = argparse.ArgumentParser(add_help=False, exit_on_error=False)
+	options.add_argument('-d', '--device', default='/dev/ttyUSB0', help='bus device')
+	options.add_argument('-b', '--baudrate', type=int, help='bus baud rate')
+	options.add_argument('-x', '--crystal', type=float, help='crystal oscillator frequency')
+	options.add_argument('--flow-control', action='store_true', default=False, help='enable hardware flow control (not with a direction control that uses RTS)')
+	options.add_argument('--direction', choices=list(DIRECTION_CONTROLS), help='RS-485 direction control (default: rts with --flow-control, none otherwise)')
+	options.add_argument('--timeout', type=float, metavar='SECONDS', help='give up on a reply after this long without data (default: 2)')
+	options.add_argument('-D', '--debug', action='count', default=0, help='debug log')
+	options.add_argument('-s', '--source-id', type=int, default=14, help='source device ID')
+	options.add_argument('-i', '--id', type=int, default=0, help='device ID')
+	options.add_argument('--connect', action='store_true', default=False, help='talk to the device through a running `serve` daemon')
+	options.add_argument('--socket', metavar='PATH', help='Unix domain socket of the `serve` daemon (default: $XDG_RUNTIME_DIR/focon-util.sock)')
+
+	p = argparse.ArgumentParser(parents=[options])
 	p.set_defaults(_handler=None)
 
 	commands = p.add_subparsers(title='commands', metavar='COMMAND', required=True)
 
+	# only build the subcommand parsers of the command that is run, a batch can run anything
+	try:
+		_, rest = options.parse_known_args()
+		selected = rest[0] if rest else None
+	except argparse.ArgumentError:
+		# took a subcommand option for one of ours, don't guess
+		selected = None
+	def wanted(command: str) -> bool:
+		return selected in (None, command, 'batch')
+
+	# opened buses and targets, reused by every command of a batch
+	msg_buses: dict[str, 'FoconMessageBus'] = {}
+	targets: dict[tuple[Any, ...], Any] = {}
+
+	def open_msg_bus(args: argparse.Namespace, device_path: str) -> 'FoconMessageBus':
+		from .bus import FoconSerialTransport, FoconBus
+		from .message import FoconMessageBus
+
+		if device_path not in msg_buses:
+			transport = FoconSerialTransport(device_path, baudrate=args.baudrate, xtal=args.crystal, flow_control=args.flow_control, direction=args.direction, timeout=args.timeout, debug=args.debug > 2)
+			bus = FoconBus(transport, args.source_id, debug=args.debug > 1)
+			msg_buses[device_path] = FoconMessageBus(bus, args.source_id, debug=args.debug > 0)
+		return msg_buses[device_path]
+
+	def open_target(args: argparse.Namespace, kind: str) -> Any:
+		from .server import FoconRemoteTarget, TARGET_KINDS, default_socket_path
+		from .devices.device import FoconDevice
+
+		key = (kind, args.connect, args.socket, args.device, args.id)
+		if key not in targets:
+			if args.connect:
+				targets[key] = FoconRemoteTarget(args.socket or default_socket_path(), args.device, kind, args.id)
+			else:
+				targets[key] = TARGET_KINDS[kind](FoconDevice(open_msg_bus(args, args.device), args.id))
+		return targets[key]
+
 
 	# General commands
 
 	def do_info(args):
-		transport = FoconSerialTransport(args.device, baudrate=args.baudrate, xtal=args.crystal, flow_control=args.flow_control, debug=args.debug > 2)
-		bus = FoconBus(transport, args.source_id, debug=args.debug > 1)
-		msg_bus = FoconMessageBus(bus, args.source_id, debug=args.debug > 0)
-		device = FoconDevice(msg_bus, args.id)
+		device = open_target(args, 'device')
 		device_info = device.get_device_info()
 		print('boot:')
 		print('  mode:   ', device_info.mode.name.lower())
@@ -51,442 +109,909 @@ def main() -> None:
 	# Bootloader commands
 
 	def do_bootloader(args):
-		transport = FoconSerialTransport(args.device, baudrate=args.baudrate, xtal=args.crystal, flow_control=args.flow_control, debug=args.debug > 2)
-		bus = FoconBus(transport, args.source_id, debug=args.debug > 1)
-		msg_bus = FoconMessageBus(bus, args.source_id, debug=args.debug > 0)
-		device = FoconDevice(msg_bus, args.id)
-		bootloader = FoconBootDevice(device)
+		bootloader = open_target(args, 'boot')
 
 		args._bootloader_handler(bootloader, args)
 	bootloader_parser = commands.add_parser('boot', help='commands to interact with the bootloader of Focon devices')
 	bootloader_parser.set_defaults(_handler=do_bootloader, _bootloader_handler=None)
-	bootloader_subcommands = bootloader_parser.add_subparsers(title='boot loader subcommands', metavar='SUBCOMMAND', required=True)
+	if wanted('boot'):
+		bootloader_subcommands = bootloader_parser.add_subparsers(title='boot loader subcommands', metavar='SUBCOMMAND', required=True)
 
-	def do_flash_app(bootloader, args):
-		for offset in bootloader.write_app(args.APP.read()):
-			print('Flashing: {:08x}...'.format(offset))
+		def do_flash_app(bootloader, args):
+			for offset in bootloader.write_app(args.APP.read()):
+				print('Flashing: {:08x}...'.format(offset))
 
-	flash_app_parser = bootloader_subcommands.add_parser('flash', help='write new application to device flash')
-	flash_app_parser.add_argument('APP', type=argparse.FileType('rb'))
-	flash_app_parser.set_defaults(_bootloader_handler=do_flash_app)
+		flash_app_parser = bootloader_subcommands.add_parser('flash', help='write new application to device flash')
+		flash_app_parser.add_argument('APP', type=argparse.FileType('rb'))
+		flash_app_parser.set_defaults(_bootloader_handler=do_flash_app)
 
-	def do_flash_block(bootloader, args):
-		for offset in bootloader.write_flash(args.ADDRESS, args.DATA.read()):
-			print('Flashing: {:08x}...'.format(offset))
+		def do_flash_block(bootloader, args):
+			for offset in bootloader.write_flash(args.ADDRESS, args.DATA.read()):
+				print('Flashing: {:08x}...'.format(offset))
 
-	flash_block_parser = bootloader_subcommands.add_parser('flash-block', help='write chunk of device flash')
-	flash_block_parser.add_argument('ADDRESS', type=int, help='address to flash')
-	flash_block_parser.add_argument('DATA', type=argparse.FileType('rb'))
-	flash_block_parser.set_defaults(_bootloader_handler=do_flash_block)
+		flash_block_parser = bootloader_subcommands.add_parser('flash-block', help='write chunk of device flash')
+		flash_block_parser.add_argument('ADDRESS', type=int, help='address to flash')
+		flash_block_parser.add_argument('DATA', type=argparse.FileType('rb'))
+		flash_block_parser.set_defaults(_bootloader_handler=do_flash_block)
 
-	def do_launch(bootloader, args):
-		if not bootloader.launch():
-			return 1
+		def do_launch(bootloader, args):
+			if not bootloader.launch():
+				return 1
 
-	launch_parser = bootloader_subcommands.add_parser('launch', help='load and run application in device flash')
-	launch_parser.set_defaults(_bootloader_handler=do_launch)
+		launch_parser = bootloader_subcommands.add_parser('launch', help='load and run application in device flash')
+		launch_parser.set_defaults(_bootloader_handler=do_launch)
 
 	# Display commands
 
 	def do_display(args):
-		transport = FoconSerialTransport(args.device, baudrate=args.baudrate, xtal=args.crystal, flow_control=args.flow_control, debug=args.debug > 2)
-		bus = FoconBus(transport, args.source_id, debug=args.debug > 1)
-		msg_bus = FoconMessageBus(bus, args.source_id, debug=args.debug > 0)
-		device = FoconDevice(msg_bus, args.id)
-		display = FoconDisplay(device)
+		display = open_target(args, 'display')
+		if getattr(args, '_batch', None):
+			display = FoconBatchedDisplay(display, args._batch)
 
 		args._display_handler(display, args)
 	display_parser = commands.add_parser('display', help='commands to interact with Focon display devices')
 	display_parser.set_defaults(_handler=do_display, _display_handler=None)
-	display_subcommands = display_parser.add_subparsers(title='display subcommands', metavar='SUBCOMMAND', required=True)
-
-	def do_display_info(display, args):
-		device_info = display.get_display_info()
-		print('boot:')
-		print('  mode:   ', device_info.mode.name)
-		print('  type:   ', device_info.kind)
-		print('  version: {}.{:02}'.format(*device_info.boot_version))
-		print()
-
-		print('app:')
-		print('  version: {}.{:02}'.format(*device_info.app_version))
-		print()
-
-		print('display:')
-		if device_info.unk08:
-			print('  unk08:  ', device_info.unk08)
-		if device_info.part_id:
-			print('  part:   ', device_info.part_id)
-		if device_info.unk1E:
-			print('  unk1E:  ', device_info.unk1E)
-		if device_info.unk29:
-			print('  unk29:  ', device_info.unk29)
-		print()
-
-		if args.all or args.assets:
-			print('assets:')
-			asset_data = display.get_asset_data()
-			print('  part:   ', asset_data.part_id)
-			print('  name:   ', asset_data.name)
-			print('  version: {}.{:02}'.format(*asset_data.version))
-			print('  size:   ', asset_data.size)
-			print('  fonts:  ', asset_data.font_count)
+	if wanted('display'):
+		from .devices.display import (
+			FoconDisplayConfiguration, FoconDisplayDrawSpec, FoconDisplayDrawComposition, FoconDisplayDrawTransition,
+			FoconDisplayAlignment, FoconDisplayVerticalAlignment, FoconDisplayHorizontalAlignment,
+			FoconDisplaySelfTestKind, FoconDisplayDumpType,
+		)
+
+		display_subcommands = display_parser.add_subparsers(title='display subcommands', metavar='SUBCOMMAND', required=True)
+
+		def do_display_info(display, args):
+			device_info = display.get_display_info()
+			print('boot:')
+			print('  mode:   ', device_info.mode.name)
+			print('  type:   ', device_info.kind)
+			print('  version: {}.{:02}'.format(*device_info.boot_version))
 			print()
 
-		if args.all or args.stats:
-			print('stats:')
-			print('  memory: ', display.get_memory_stats())
-			print('  network:', display.get_network_stats())
-			print('  sensors:', display.get_sensor_stats())
+			print('app:')
+			print('  version: {}.{:02}'.format(*device_info.app_version))
 			print()
 
-		if args.all or args.tasks:
-			print('tasks:')
-			for t in display.get_task_stats():
-				print('  ' + t)
-
-	get_info_parser = display_subcommands.add_parser('info', help='query extended information from Focon display devices')
-	get_info_parser.add_argument('-a', '--all', action='store_true', default=False, help='show all extended information')
-	get_info_parser.add_argument('--assets', action='store_true', default=False, help='show extended asset information')
-	get_info_parser.add_argument('--stats',  action='store_true', default=False, help='show extended statistics')
-	get_info_parser.add_argument('--tasks',  action='store_true', default=False, help='show extended task information')
-	get_info_parser.set_defaults(_display_handler=do_display_info)
-
-	def do_display_status(display, args):
-		print(display.get_status())
-	get_status_parser = display_subcommands.add_parser('status', help='query status of Focon display device')
-	get_status_parser.set_defaults(_display_handler=do_display_status)
-
-	def do_display_get_config(display, args):
-		print(display.get_current_config())
-	get_config_parser = display_subcommands.add_parser('config', help='query factory configuration of Focon display device')
-	get_config_parser.set_defaults(_display_handler=do_display_get_config)
-
-	SELFTEST_TYPES = {
-		'info': FoconDisplaySelfTestKind.Info,
-		'flood': FoconDisplaySelfTestKind.Flood,
-		'abort': FoconDisplaySelfTestKind.Abort,
-	}
-	def do_display_selftest(display, args):
-		print(display.trigger_selftest(SELFTEST_TYPES[args.type]))
-	selftest_parser = display_subcommands.add_parser('selftest', help='enter or leave self-test mode')
-	selftest_parser.set_defaults(_display_handler=do_display_selftest)
-	selftest_parser.add_argument('type', choices=tuple(SELFTEST_TYPES))
-
-	def do_display_selfdestruct(display, args):
-		print(display.self_destruct())
-	selfdestruct_parser = display_subcommands.add_parser('selfdestruct', help='erase application from flash and enter bootloader mode')
-	selfdestruct_parser.set_defaults(_display_handler=do_display_selfdestruct)
-
-	# Display drawing commands
-
-	def do_display_draw_base(display, args):
-		# Obtain (and store) config if needed
-		config = None
-		if args.config:
-			args.config.seek(0)
-			try:
-				config = FoconDisplayConfiguration.unpack(args.config.read())
-			except:
-				print('display configuration was corrupted, re-reading')
+			print('display:')
+			if device_info.unk08:
+				print('  unk08:  ', device_info.unk08)
+			if device_info.part_id:
+				print('  part:   ', device_info.part_id)
+			if device_info.unk1E:
+				print('  unk1E:  ', device_info.unk1E)
+			if device_info.unk29:
+				print('  unk29:  ', device_info.unk29)
+			print()
 
-		if not config:
-			config = display.get_current_config()
+			if args.all or args.assets:
+				print('assets:')
+				asset_data = display.get_asset_data()
+				print('  part:   ', asset_data.part_id)
+				print('  name:   ', asset_data.name)
+				print('  version: {}.{:02}'.format(*asset_data.version))
+				print('  size:   ', asset_data.size)
+				print('  fonts:  ', asset_data.font_count)
+				print()
+
+			if args.all or args.stats:
+				print('stats:')
+				# shown as reported: other firmware versions may print statistics the parsers don't know
+				print('  memory: ', display.dump(FoconDisplayDumpType.MemoryStats))
+				print('  network:', display.dump(FoconDisplayDumpType.NetworkStats))
+				print('  sensors:', display.get_sensor_stats())
+				print()
+
+			if args.all or args.tasks:
+				print('tasks:')
+				for t in display.get_task_stats():
+					print('  ' + t)
+
+		get_info_parser = display_subcommands.add_parser('info', help='query extended information from Focon display devices')
+		get_info_parser.add_argument('-a', '--all', action='store_true', default=False, help='show all extended information')
+		get_info_parser.add_argument('--assets', action='store_true', default=False, help='show extended asset information')
+		get_info_parser.add_argument('--stats',  action='store_true', default=False, help='show extended statistics')
+		get_info_parser.add_argument('--tasks',  action='store_true', default=False, help='show extended task information')
+		get_info_parser.set_defaults(_display_handler=do_display_info)
+
+		def do_display_font(display, args):
+			from .fonts import FoconDeviceFontCache
+			cache = FoconDeviceFontCache(args.cache_dir)
+			data = cache.load(display, args.INDEX)
+			if args.output:
+				args.output.write(data)
+			else:
+				print(data.hex())
+		get_font_parser = display_subcommands.add_parser('font', help='download (and cache) raw font data from Focon display asset data (unconfirmed request layout, use with care)')
+		get_font_parser.add_argument('--cache-dir', metavar='DIR', help='font cache directory')
+		get_font_parser.add_argument('-o', '--output', type=argparse.FileType('wb'), help='file to write font data to')
+		get_font_parser.add_argument('INDEX', type=int, nargs='?', default=0, help='font index')
+		get_font_parser.set_defaults(_display_handler=do_display_font)
+
+		def do_display_status(display, args):
+			print(display.get_status())
+		get_status_parser = display_subcommands.add_parser('status', help='query status of Focon display device')
+		get_status_parser.set_defaults(_display_handler=do_display_status)
+
+		def do_display_get_config(display, args):
+			print(display.get_current_config())
+		get_config_parser = display_subcommands.add_parser('config', help='query factory configuration of Focon display device')
+		get_config_parser.set_defaults(_display_handler=do_display_get_config)
+
+		SELFTEST_TYPES = {
+			'info': FoconDisplaySelfTestKind.Info,
+			'flood': FoconDisplaySelfTestKind.Flood,
+			'abort': FoconDisplaySelfTestKind.Abort,
+		}
+		def do_display_selftest(display, args):
+			print(display.trigger_selftest(SELFTEST_TYPES[args.type]))
+		selftest_parser = display_subcommands.add_parser('selftest', help='enter or leave self-test mode')
+		selftest_parser.set_defaults(_display_handler=do_display_selftest)
+		selftest_parser.add_argument('type', choices=tuple(SELFTEST_TYPES))
+
+		def do_display_selfdestruct(display, args):
+			print(display.self_destruct())
+		selfdestruct_parser = display_subcommands.add_parser('selfdestruct', help='erase application from flash and enter bootloader mode')
+		selfdestruct_parser.set_defaults(_display_handler=do_display_selfdestruct)
+
+		# Display drawing commands
+
+		def do_display_draw_base(display, args):
+			# Obtain (and store) config if needed
+			config = None
 			if args.config:
-				args.config.truncate(0)
-				args.config.write(config.pack())
-
-		display.use_config(config)
-		return args._display_draw_handler(display, args)
-
-	def add_display_draw_args(parser):
-		parser.add_argument('-c', '--config', type=argparse.FileType('a+b'), metavar='FILE', help='path to file containing display configuration to use (will be written if specified but empty or invalid)')
-		parser.add_argument('-C', '--composition', type=FoconDisplayDrawComposition.parse, help='layer composition for drawing object') #choices=list(COMPOSITION_NAMES))
-		parser.add_argument('-T', '--transition', type=FoconDisplayDrawTransition.parse, help='effect for drawing object') #, choices=list(EFFECT_NAMES))
-		parser.set_defaults(_display_handler=do_display_draw_base, _display_draw_handler=None)
-
-	def do_display_draw_object(display, args):
-		config = display.get_current_config()
-
-		# build object spec
-		output_ids = args.output_id or [1]
-		x = args.x if args.x is not None else config.x_start
-		y = args.y if args.y is not None else config.y_start
-		width = args.width if args.width is not None else (config.x_end - x + 1)
-		height = args.height if args.height is not None else (config.y_end - y + 1)
-		for output_id in output_ids:
-			spec = FoconDisplayDrawSpec(
-				object_id=args.object_id,
-				output_id=output_id,
-				composition=args.composition or FoconDisplayDrawComposition.Replace,
-				transition=args.transition or FoconDisplayDrawTransition.Appear,
-				x_start=x,
-				y_start=y,
-				x_end=(x + width) - 1,
-				y_end=(y + height) - 1,
-				count=args.count or 1,
-				duration=args.duration or 10,
-			)
-			r = args._display_draw_object_handler(display, spec, args)
-			if r not in (None, 0):
-				sys.exit(r)
+				args.config.seek(0)
+				try:
+					config = FoconDisplayConfiguration.unpack(args.config.read())
+				except:
+					print('display configuration was corrupted, re-reading')
+
+			if not config:
+				config = display.get_current_config()
+				if args.config:
+					args.config.truncate(0)
+					args.config.write(config.pack())
+
+			display.use_config(config)
+			return args._display_draw_handler(display, args)
+
+		def add_display_draw_args(parser: argparse.ArgumentParser) -> None:
+			parser.add_argument('-c', '--config', type=argparse.FileType('a+b'), metavar='FILE', help='path to file containing display configuration to use (will be written if specified but empty or invalid)')
+			parser.add_argument('-C', '--composition', type=FoconDisplayDrawComposition.parse, help='layer composition for drawing object') #choices=list(COMPOSITION_NAMES))
+			parser.add_argument('-T', '--transition', type=FoconDisplayDrawTransition.parse, help='effect for drawing object') #, choices=list(EFFECT_NAMES))
+			parser.set_defaults(_display_handler=do_display_draw_base, _display_draw_handler=None)
+
+		def do_display_draw_object(display, args):
+			config = display.get_current_config()
 
-	def parse_range(s: str):
-		if ':' in s:
-			start, end = s.split(':', 1)
-			return (int(start), int(end))
-		else:
+			# build object spec
+			output_ids = args.output_id or [1]
+			x = args.x if args.x is not None else config.x_start
+			y = args.y if args.y is not None else config.y_start
+			width = args.width if args.width is not None else (config.x_end - x + 1)
+			height = args.height if args.height is not None else (config.y_end - y + 1)
+			object_id = args.object_id
+			if object_id is None:
+				from .objects import FoconDisplayObjectAllocator, SCROLL_TRANSITIONS
+
+				transition = args.transition or FoconDisplayDrawTransition.Appear
+				object_id = FoconDisplayObjectAllocator(display).lease(scroll=transition in SCROLL_TRANSITIONS)
+				print('object ID:', object_id)
+			for output_id in output_ids:
+				spec = FoconDisplayDrawSpec(
+					object_id=object_id,
+					output_id=output_id,
+					composition=args.composition or FoconDisplayDrawComposition.Replace,
+					transition=args.transition or FoconDisplayDrawTransition.Appear,
+					x_start=x,
+					y_start=y,
+					x_end=(x + width) - 1,
+					y_end=(y + height) - 1,
+					count=args.count or 1,
+					duration=args.duration or 10,
+				)
+				r = args._display_draw_object_handler(display, spec, args)
+				if r not in (None, 0):
+					sys.exit(r)
+
+		def parse_object_id(s: str):
+			if s == 'auto':
+				return None
 			return int(s)
 
-	def parse_alignment(s: str):
-		if '-' in s:
-			vs, hs = s.split('-', maxsplit=1)
-			va = FoconDisplayVerticalAlignment(vs)
-			ha = FoconDisplayHorizontalAlignment(hs)
-		elif s == 'center':
-			va = FoconDisplayVerticalAlignment(s)
-			ha = FoconDisplayHorizontalAlignment(s)
-		elif s in FoconDisplayVerticalAlignment:
-			va = FoconDisplayVerticalAlignment(s)
-			ha = FoconDisplayVerticalAlignment.Center
-		elif s in FoconDisplayHorizontalAlignment:
-			va = FoconDisplayVerticalAlignment.Center
-			ha = FoconDisplayHorizontalAlignment(s)
-		else:
-			raise ValueError('invalid alignment value: {}'.format(s))
-		return FoconDisplayAlignment(vertical=va, horizontal=ha)
-
-	def add_display_draw_object_args(parser):
-		add_display_draw_args(parser)
-		parser.add_argument('-n', '--count', type=int, metavar='N', help='repetitions of object effect')
-		parser.add_argument('-t', '--duration', type=int, metavar='TIME', help='time to display object for')
-		parser.add_argument('-i', '--object-id', type=int, default=0xFF, metavar='ID', help='object ID')
-		parser.add_argument('-o', '--output-id', action='append', type=int, metavar='ID', help='output ID(s)')
-		parser.add_argument('-x', '--x', type=int, help='X position')
-		parser.add_argument('-W', '--width', type=int, help='X size')
-		parser.add_argument('-y', '--y', type=int, help='Y position')
-		parser.add_argument('-H', '--height', type=int, help='Y size')
-		parser.set_defaults(_display_draw_handler=do_display_draw_object, _display_draw_object_handler=None)
-
-	def do_display_hide(display, args):
-		for output_id in args.OUTPUT or [None]:
-			print(display.hide(output_id or None, x=args.x, y=args.y))
-
-	hide_parser = display_subcommands.add_parser('hide', help='hide pixels in given area on display')
-	add_display_draw_args(hide_parser)
-	hide_parser.set_defaults(_display_draw_handler=do_display_hide)
-	hide_parser.add_argument('-x', '--x', type=parse_range, help='X area')
-	hide_parser.add_argument('-y', '--y', type=parse_range, help='Y area')
-	hide_parser.add_argument('OUTPUT', nargs='*')
-
-	def do_display_print(display, spec, args):
-		print(display.print(args.message, spec=spec, font_size=args.font_size, alignment=args.alignment))
-
-	print_parser = display_subcommands.add_parser('print', help='draw text object to display')
-	add_display_draw_object_args(print_parser)
-	print_parser.set_defaults(_display_draw_object_handler=do_display_print)
-	print_parser.add_argument('-a', '--alignment', type=parse_alignment, help='text alignment')
-	print_parser.add_argument('-s', '--font-size', type=int, metavar='SIZE', help='text size')
-	print_parser.add_argument('message')
-
-	def do_display_draw(display, spec, args):
-		image = PIL.Image.open(args.file)
-		n_frames = getattr(image, 'n_frames', 1)
-		loops = image.info.get('loop', 1)
-
-		n = 0
-		epoch = time.time()
-		frames = []
-		while loops == 0 or n < loops:
-			for frame_id in range(n_frames):
-				start = time.time()
-				image.seek(frame_id)
-				frame_duration = image.info.get('duration', 0) / 1000
-
-				if frame_id < len(frames):
-					frame = frames[frame_id]
+		def parse_range(s: str):
+			if ':' in s:
+				start, end = s.split(':', 1)
+				return (int(start), int(end))
+			else:
+				return int(s)
+
+		def parse_alignment(s: str):
+			if '-' in s:
+				vs, hs = s.split('-', maxsplit=1)
+				va = FoconDisplayVerticalAlignment(vs)
+				ha = FoconDisplayHorizontalAlignment(hs)
+			elif s == 'center':
+				va = FoconDisplayVerticalAlignment(s)
+				ha = FoconDisplayHorizontalAlignment(s)
+			elif s in FoconDisplayVerticalAlignment:
+				va = FoconDisplayVerticalAlignment(s)
+				ha = FoconDisplayVerticalAlignment.Center
+			elif s in FoconDisplayHorizontalAlignment:
+				va = FoconDisplayVerticalAlignment.Center
+				ha = FoconDisplayHorizontalAlignment(s)
+			else:
+				raise ValueError('invalid alignment value: {}'.format(s))
+			return FoconDisplayAlignment(vertical=va, horizontal=ha)
+
+		def parse_pitch(s: str):
+			x, y = s.split(':', 1)
+			return (float(x), float(y))
+
+		def add_prepare_args(parser: argparse.ArgumentParser, dithering: str) -> None:
+			from .prepare import FoconScaling, FoconDithering
+
+			parser.add_argument('--scale', type=FoconScaling, default=FoconScaling.Fit, metavar='MODE', help='how to scale images to the drawing area: {} (default: fit)'.format(', '.join(m.value for m in FoconScaling)))
+			parser.add_argument('--dither', type=FoconDithering, default=FoconDithering(dithering), metavar='METHOD', help='how to turn grayscale into on and off pixels: {} (default: {})'.format(', '.join(m.value for m in FoconDithering), dithering))
+			parser.add_argument('--threshold', type=int, default=128, help='minimum grayscale value of lit pixels, with threshold dithering')
+			parser.add_argument('--pitch', type=parse_pitch, default=(1.0, 1.0), metavar='X:Y', help='horizontal and vertical distance between LEDs, to keep aspect ratios when scaling')
+
+		def make_preparer(spec: FoconDisplayDrawSpec, args: argparse.Namespace) -> 'FoconImagePreparer':
+			from .prepare import FoconImagePreparer
+
+			return FoconImagePreparer(
+				width=spec.x_end - spec.x_start + 1,
+				height=spec.y_end - spec.y_start + 1,
+				scaling=args.scale,
+				dithering=args.dither,
+				threshold=args.threshold,
+				pitch=args.pitch,
+			)
+
+		def add_display_draw_object_args(parser: argparse.ArgumentParser) -> None:
+			add_display_draw_args(parser)
+			parser.add_argument('-n', '--count', type=int, metavar='N', help='repetitions of object effect')
+			parser.add_argument('-t', '--duration', type=int, metavar='TIME', help='time to display object for')
+			parser.add_argument('-i', '--object-id', type=parse_object_id, default=0xFF, metavar='ID', help='object ID, or "auto" to pick one that is free on the display')
+			parser.add_argument('-o', '--output-id', action='append', type=int, metavar='ID', help='output ID(s)')
+			parser.add_argument('-x', '--x', type=int, help='X position')
+			parser.add_argument('-W', '--width', type=int, help='X size')
+			parser.add_argument('-y', '--y', type=int, help='Y position')
+			parser.add_argument('-H', '--height', type=int, help='Y size')
+			parser.set_defaults(_display_draw_handler=do_display_draw_object, _display_draw_object_handler=None)
+
+		def do_display_hide(display, args):
+			display.hide(args.OUTPUT or None, x=args.x, y=args.y)
+
+		hide_parser = display_subcommands.add_parser('hide', help='hide pixels in given area on display')
+		add_display_draw_args(hide_parser)
+		hide_parser.set_defaults(_display_draw_handler=do_display_hide)
+		hide_parser.add_argument('-x', '--x', type=parse_range, help='X area')
+		hide_parser.add_argument('-y', '--y', type=parse_range, help='Y area')
+		hide_parser.add_argument('OUTPUT', type=int, nargs='*')
+
+		def do_display_print(display, spec, args):
+			print(display.print(args.message, spec=spec, font_size=args.font_size, alignment=args.alignment))
+
+		print_parser = display_subcommands.add_parser('print', help='draw text object to display')
+		add_display_draw_object_args(print_parser)
+		print_parser.set_defaults(_display_draw_object_handler=do_display_print)
+		print_parser.add_argument('-a', '--alignment', type=parse_alignment, help='text alignment')
+		print_parser.add_argument('-s', '--font-size', type=int, metavar='SIZE', help='text size')
+		print_parser.add_argument('message')
+
+		def do_display_draw(display, spec, args):
+			from .pipeline import FoconImagePipeline
+
+			pipeline = FoconImagePipeline(args.file, prepare=make_preparer(spec, args), workers=args.jobs, read_ahead=args.read_ahead, processes=args.processes)
+			n_frames = pipeline.n_frames
+			loops = pipeline.loops
+
+			n = 0
+			epoch = time.time()
+			frames = []
+			while loops == 0 or n < loops:
+				# converted ahead of time on the first loop, from memory afterwards
+				for frame_id, (frame, frame_duration) in enumerate(frames or pipeline):
+					start = time.time()
+					if n == 0 and loops != 1:
+						frames.append((frame, frame_duration))
+
+					display.draw_bitmap(frame, spec)
+					end = time.time()
+
+					elapsed = end - start
+					if elapsed < frame_duration:
+						time.sleep((frame_duration - elapsed) / 2)
+					if frame_id > 0 and args.connect:
+						print('\rFPS: {:4.2f}'.format((n * n_frames + frame_id + 1)  / (end - epoch)), end='')
+					elif frame_id > 0:
+						print('\rFPS: {:4.2f}, data rate: {:.2f} b/s'.format(
+							(n * n_frames + frame_id + 1)  / (end - epoch),
+							8 * display.device.bus.bus.transport.n / (end - epoch),
+						), end='')
+
+				n += 1
+
+		draw_parser = display_subcommands.add_parser('draw', help='draw bitmap to display')
+		add_display_draw_object_args(draw_parser)
+		draw_parser.set_defaults(_display_draw_object_handler=do_display_draw)
+		add_prepare_args(draw_parser, 'error-diffusion')
+		draw_parser.add_argument('-j', '--jobs', type=int, metavar='N', help='frames to convert in parallel (default: CPU count)')
+		draw_parser.add_argument('--read-ahead', type=int, default=8, metavar='N', help='maximum frames to decode and convert ahead of playback')
+		draw_parser.add_argument('--processes', action='store_true', help='convert frames in worker processes instead of threads')
+		draw_parser.add_argument('file', type=argparse.FileType('rb'))
+
+		def do_display_stream(display, spec, args):
+			from .stream import FoconRawFrameSource, FoconDisplayStream, raw_to_bitmap
+
+			width = spec.x_end - spec.x_start + 1
+			height = spec.y_end - spec.y_start + 1
+			if args.shm:
+				from .shm import FoconSharedFrameRing, FoconSharedFrameSender
+
+				ring = FoconSharedFrameRing.open(args.shm)
+				if (ring.width, ring.height) != (width, height):
+					print('error: frame ring is {}x{}, drawing area is {}x{}'.format(ring.width, ring.height, width, height), file=sys.stderr)
+					return 1
+				sender = FoconSharedFrameSender(display, spec, ring)
+				try:
+					sender.run(poll_interval=args.poll_interval)
+				except KeyboardInterrupt:
+					pass
+				print('frames: {} sent, {} skipped'.format(sender.sent, sender.skipped))
+				return
+
+			source = FoconRawFrameSource(args.file, width, height, depth=args.depth)
+			preparer = make_preparer(spec, args)
+			preparer.cache_size = 0
+			stream = FoconDisplayStream(display, spec, source, convert=lambda data: raw_to_bitmap(data, width, height, args.depth, prepare=preparer))
+			try:
+				stream.run()
+			except KeyboardInterrupt:
+				pass
+			stats = stream.stats
+			print('frames: {} received, {} sent, {} unchanged, {} dropped, {} failed'.format(stats.received, stats.sent, stats.unchanged, stats.dropped, stats.failed))
+
+		stream_parser = display_subcommands.add_parser('stream', help='draw raw frames from a pipe or FIFO as they come in')
+		add_display_draw_object_args(stream_parser)
+		stream_parser.set_defaults(_display_draw_object_handler=do_display_stream)
+		stream_parser.add_argument('--depth', type=int, choices=(1, 8), default=8, help='bits per pixel: 8 for grayscale bytes, 1 for rows of packed bits')
+		add_prepare_args(stream_parser, 'threshold')
+		stream_parser.add_argument('--shm', metavar='NAME', help='draw the latest frame of a shared memory frame ring (or memory-mapped file, if NAME is a path) instead')
+		stream_parser.add_argument('--poll-interval', type=float, default=0.001, metavar='SECONDS', help='time between checks for new frames in the frame ring')
+		stream_parser.add_argument('file', type=argparse.FileType('rb'), nargs='?', default='-', help='file or FIFO to read frames from (default: stdin)')
+
+		def do_display_fill(display, spec, args):
+			status = display.fill(spec, bool(args.VALUE))
+			if status is not None:
+				print(status)
+
+		fill_parser = display_subcommands.add_parser('fill', help='fill given area on display')
+		add_display_draw_object_args(fill_parser)
+		fill_parser.set_defaults(_display_draw_object_handler=do_display_fill)
+		fill_parser.add_argument('VALUE', type=int, nargs='?', default=1)
+
+		def do_display_redraw(display, args):
+			print(display.redraw(args.ID, composition=args.composition))
+
+		redraw_parser = display_subcommands.add_parser('redraw', help='redraw objects on display')
+		add_display_draw_args(redraw_parser)
+		redraw_parser.set_defaults(_display_draw_handler=do_display_redraw)
+		redraw_parser.add_argument('ID', default=[255], type=int, nargs='*')
+
+		def do_display_undraw(display, args):
+			print(display.undraw(args.ID, update_screen=args.update))
+
+		undraw_parser = display_subcommands.add_parser('undraw', help='remove objects from display')
+		add_display_draw_args(undraw_parser)
+		undraw_parser.set_defaults(_display_draw_handler=do_display_undraw)
+		undraw_parser.add_argument('ID', default=[255], type=int, nargs='*')
+		undraw_parser.add_argument('-N', '--no-update', action='store_false', dest='update', default=True)
+
+	# Batch commands
+
+	class FoconBatchedDisplay:
+		# Display that queues drawing operations into a batch, and passes everything else through
+		PIPELINED = ('hide', 'fill', 'print', 'undraw', 'redraw')
+
+		def __init__(self, display: 'FoconDisplay', batch: 'FoconDisplayBatch') -> None:
+			self.display = display
+			self.batch = batch
+
+		def __getattr__(self, name: str) -> Any:
+			if name in self.PIPELINED:
+				return getattr(self.batch, name)
+			return getattr(self.display, name)
+
+	@dataclass
+	class FoconBatchGroup:
+		# display batch and the commands waiting on it, with the batch calls each of them made
+		display: 'FoconDisplay'
+		batch:   'FoconDisplayBatch'
+		records: list[tuple[dict[str, Any], range]] = field(default_factory=list)
+
+	def do_batch(args):
+		pipelined_handlers = (do_display_print, do_display_fill, do_display_hide, do_display_undraw, do_display_redraw)
+		stdout = sys.stdout
+		failed = False
+		pending: FoconBatchGroup | None = None
+
+		def emit(record: dict[str, Any]) -> None:
+			nonlocal failed
+			failed = failed or not record['ok']
+			print(json.dumps(record), file=stdout, flush=True)
+
+		def flush() -> None:
+			nonlocal pending
+			group, pending = pending, None
+			if not group:
+				return
+			start = time.perf_counter()
+			results: list[Any]
+			try:
+				results = group.batch.commit()
+				error = None
+			except Exception as e:
+				results = [None] * group.batch.calls
+				error = str(e)
+			elapsed = time.perf_counter() - start
+			for record, calls in group.records:
+				record['elapsed'] += elapsed
+				if error:
+					record.update(ok=False, error=error)
 				else:
-					if image.mode != '1':
-						f = image.convert('1')
+					record['output'] = ''.join(str(results[i]) + '\n' for i in calls if results[i] is not None)
+				emit(record)
+
+		def run(n: int, argv: list[str]) -> None:
+			nonlocal pending
+			record = {'line': n, 'args': argv, 'ok': True, 'output': '', 'error': None, 'elapsed': 0.0, 'pipelined': False}
+			out, err = io.StringIO(), io.StringIO()
+			group = None
+			start = time.perf_counter()
+			try:
+				with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+					line_args = p.parse_args(argv, namespace=argparse.Namespace(**vars(args)))
+					pipelined = line_args._handler is do_display and (
+						getattr(line_args, '_display_draw_object_handler', None) in pipelined_handlers
+						or getattr(line_args, '_display_draw_handler', None) in pipelined_handlers
+					)
+					if not pipelined:
+						flush()
 					else:
-						f = image
-					frame = []
-					for x in range(f.width):
-						frame.append([bool(f.getpixel((x, y))) for y in range(f.height)])
-					if loops != 1:
-						frames.append(frame)
-
-				display.draw(frame, f.height, spec)
-				end = time.time()
-
-				elapsed = end - start
-				if elapsed < frame_duration:
-					time.sleep((frame_duration - elapsed) / 2)
-				if frame_id > 0:
-					print('\rFPS: {:4.2f}, data rate: {:.2f} b/s'.format(
-						(n * n_frames + frame_id + 1)  / (end - epoch),
-						8 * display.device.bus.bus.transport.n / (end - epoch),
-					), end='')
-
-			n += 1
-
-	draw_parser = display_subcommands.add_parser('draw', help='draw bitmap to display')
-	add_display_draw_object_args(draw_parser)
-	draw_parser.set_defaults(_display_draw_object_handler=do_display_draw)
-	draw_parser.add_argument('file', type=argparse.FileType('rb'))
-
-	def do_display_fill(display, spec, args):
-		print(display.fill(spec, bool(args.VALUE)))
-
-	fill_parser = display_subcommands.add_parser('fill', help='fill given area on display')
-	add_display_draw_object_args(fill_parser)
-	fill_parser.set_defaults(_display_draw_object_handler=do_display_fill)
-	fill_parser.add_argument('VALUE', type=int, nargs='?', default=1)
-
-	def do_display_redraw(display, args):
-		print(display.redraw(args.ID, composition=args.composition))
-
-	redraw_parser = display_subcommands.add_parser('redraw', help='redraw objects on display')
-	add_display_draw_args(redraw_parser)
-	redraw_parser.set_defaults(_display_draw_handler=do_display_redraw)
-	redraw_parser.add_argument('ID', default=[255], type=int, nargs='*')
-
-	def do_display_undraw(display, args):
-		print(display.undraw(args.ID, update_screen=args.update))
-
-	undraw_parser = display_subcommands.add_parser('undraw', help='remove objects from display')
-	add_display_draw_args(undraw_parser)
-	undraw_parser.set_defaults(_display_draw_handler=do_display_undraw)
-	undraw_parser.add_argument('ID', default=[255], type=int, nargs='*')
-	undraw_parser.add_argument('-N', '--no-update', action='store_false', dest='update', default=True)
+						display = open_target(line_args, 'display')
+						if pending is None or pending.display is not display:
+							flush()
+							pending = FoconBatchGroup(display=display, batch=display.batch())
+						group = pending
+						line_args._batch = group.batch
+						first_call = group.batch.calls
+					if failed and not args.keep_going:
+						# the commands queued before this one failed
+						return
+					line_args._handler(line_args)
+			except SystemExit as e:
+				if e.code not in (None, 0):
+					record.update(ok=False, error=err.getvalue().strip() or 'exit status {}'.format(e.code))
+			except Exception as e:
+				record.update(ok=False, error=str(e))
+			record['elapsed'] = time.perf_counter() - start
+
+			if record['ok'] and group is not None:
+				record['pipelined'] = True
+				group.records.append((record, range(first_call, group.batch.calls)))
+			else:
+				# keep the results in order
+				flush()
+				record['output'] = out.getvalue()
+				emit(record)
+
+		for n, line in enumerate(args.FILE, start=1):
+			try:
+				argv = parse_batch_line(line)
+			except (ValueError, KeyError) as e:
+				emit({'line': n, 'args': None, 'ok': False, 'output': '', 'error': 'invalid command: {}'.format(e), 'elapsed': 0.0, 'pipelined': False})
+				argv = None
+			if argv:
+				run(n, argv)
+			if failed and not args.keep_going:
+				break
+		flush()
+		if failed:
+			sys.exit(1)
 
-	# Debug commands
+	batch_parser = commands.add_parser('batch', help='run many commands over the same bus connection')
+	batch_parser.set_defaults(_handler=do_batch)
+	batch_parser.add_argument('-k', '--keep-going', action='store_true', help='continue after a command failed')
+	batch_parser.add_argument('FILE', type=argparse.FileType('r'), help='file with a command per line, as command line arguments or JSON (- for stdin)')
 
-	debug_parser = commands.add_parser('debug', help='commands for low-level tool debugging')
-	debug_subcommands = debug_parser.add_subparsers(title='debug subcommands', required=True)
+	# Server commands
 
-	def do_self_test(args):
-		class FoconMockBus(FoconBus):
-			def __init__(self, frames: list[FoconFrame]) -> None:
-				self.frames = frames
+	def do_serve(args):
+		from .server import FoconServer, default_socket_path
 
-			def send_message(self, dest_id: int | None, data: bytes) -> None:
-				pass
+		server = FoconServer(args.socket or default_socket_path(), lambda device_path: open_msg_bus(args, device_path), args.DEVICE or [args.device], allow_dangerous=args.allow_dangerous)
+		try:
+			server.serve_forever()
+		except KeyboardInterrupt:
+			pass
 
-			def recv_message(self, peer_id, checker=None) -> bytes:
-				while True:
-					found = False
-					for f in self.frames:
-						if not checker or checker(f.data):
-							found = True
-							break
-
-					if found:
-						self.frames.remove(f)
-						return f.data
-
-		rp, _ = FoconFrame.unpack(bytes.fromhex('ff ff ff 01 49 2a 01 01 00 12 49 30 00 00 49 30 00 08 00 41 46 41 31 30 31 31 33 30 8c 03 ff ff'))
-		rp.dest_id = args.source_id
-		bus = FoconMessageBus(FoconMockBus(frames=[rp]), src_id=0)
-		device = FoconDevice(bus, args.id)
-		display = FoconDisplay(device)
-		print(display.get_device_info())
-
-		print(FoconDisplayInfo.unpack(
-			bytes.fromhex('46 41 31 30 31 31 33 30') +
-			b'foo'.ljust(0x1d-0x12, b'\x00') +
-			str(42690).encode('ascii').ljust(0x28-0x1d, b'\x00') +
-			b'abcde'.ljust(0x33-0x28, b'\x00') +
-			b'lel'.ljust(0x44-0x33, b'\x00')
-		))
-	self_test_parser = debug_subcommands.add_parser('self-test', help='sanity-check own message bus implementation')
-	self_test_parser.set_defaults(_handler=do_self_test)
+	serve_parser = commands.add_parser('serve', help='keep bus devices open and run commands for clients using --connect')
+	serve_parser.set_defaults(_handler=do_serve)
+	serve_parser.add_argument('--allow-dangerous', action='store_true', help='let clients send raw commands, and run commands that can break devices or lose their data')
+	serve_parser.add_argument('DEVICE', nargs='*', help='bus device(s) to serve (default: -d)')
 
-	# Flash dump commands
-	flash_parser = commands.add_parser('flash', help='commands to process flash memory dumps of Focon devices')
-	flash_subcommands = flash_parser.add_subparsers(title='flash memory subcommands', required=True)
-
-	def do_flash_stitch(args):
-		while True:
-			for inp in args.CHUNK:
-				chunk = inp.read(args.word_size)
-				if not chunk:
-					return
-				args.OUTPUT.write(chunk)
-
-	stitch_parser = flash_subcommands.add_parser('stitch', help='combine multi-chip flash dumps into single flash image')
-	stitch_parser.set_defaults(_handler=do_flash_stitch)
-	stitch_parser.add_argument('-w', '--word-size', metavar='N', type=int, default=1, help='amount of bytes in each chunk')
-	stitch_parser.add_argument('OUTPUT', type=argparse.FileType('wb'), help='stitched file')
-	stitch_parser.add_argument('CHUNK', nargs='+', type=argparse.FileType('rb'), help='chunk file(s)')
-
-	def do_flash_unstitch(args):
-		while True:
-			for outp in args.CHUNK:
-				chunk = args.INPUT.read(args.word_size)
-				if not chunk:
-					return
-				outp.write(chunk)
-
-	unstitch_parser = flash_subcommands.add_parser('unstitch', help='seperate single flash image into multi-chip flash dumps')
-	unstitch_parser.set_defaults(_handler=do_flash_unstitch)
-	unstitch_parser.add_argument('-w', '--word-size', metavar='N', type=int, default=1, help='amount of bytes in each chunk')
-	unstitch_parser.add_argument('INPUT', type=argparse.FileType('wb'), help='stitched file')
-	unstitch_parser.add_argument('CHUNK', nargs='+', type=argparse.FileType('rb'), help='chunk file(s)')
-
-	def do_flash_pack(args):
-		args.OUTPUT.truncate(args.boot_offset)
-		args.OUTPUT.seek(args.boot_offset)
-
-		bootloader = args.BOOTFILE.read()
-		args.OUTPUT.write(bootloader)
-
-		app_header_data = args.APPFILE.read(FoconBootHeader.sizeof())
-		app_header = FoconBootHeader.unpack(app_header_data)
-		app = args.APPFILE.read(app_header.size)
-		if not app_header.verify(app):
-			print('error: app data is corrupt', file=sys.stderr)
-			sys.exit(1)
-
-		new_header = FoconBootHeader.generate(app, args.boot_offset + app_header.start_address)
-		args.OUTPUT.truncate(new_header.start_address - FoconBootHeader.sizeof())
-		args.OUTPUT.seek(new_header.start_address - FoconBootHeader.sizeof())
-		args.OUTPUT.write(new_header.pack())
-		args.OUTPUT.write(app)
-
-	pack_parser = flash_subcommands.add_parser('pack', description='pack bootloader and application into flash image')
-	pack_parser.set_defaults(_handler=do_flash_pack)
-	pack_parser.add_argument('--boot-offset', type=int, metavar='OFFSET', default=0x0, help='bootloader offset in dump')
-	pack_parser.add_argument('BOOTFILE', type=argparse.FileType('rb'))
-	pack_parser.add_argument('APPFILE', type=argparse.FileType('rb'))
-	pack_parser.add_argument('OUTPUT', type=argparse.FileType('wb'))
-
-	def do_flash_unpack(args):
-		args.INPUT.seek(args.boot_offset)
+	# Debug commands
 
-		bootloader = args.INPUT.read(args.app_offset - args.boot_offset)
-		args.BOOTOUT.write(bootloader)
+	debug_parser = commands.add_parser('debug', help='commands for low-level tool debugging')
+	if wanted('debug'):
+		debug_subcommands = debug_parser.add_subparsers(title='debug subcommands', required=True)
+
+		def do_self_test(args):
+			from .frame import FoconFrame
+			from .bus import FoconBus
+			from .message import FoconMessageBus
+			from .util import FoconBuffer
+			from .devices.device import FoconDevice
+			from .devices.display import FoconDisplay, FoconDisplayInfo
+
+			class FoconMockBus(FoconBus):
+				def __init__(self, frames: list[FoconFrame]) -> None:
+					self.frames = frames
+
+				def send_message(self, dest_id: int | None, *parts: FoconBuffer) -> None:
+					pass
+
+				def recv_message(self, peer_id, checker=None) -> bytes:
+					while True:
+						found = False
+						for f in self.frames:
+							if not checker or checker(f.data):
+								found = True
+								break
+
+						if found:
+							self.frames.remove(f)
+							return f.data
+
+			rp, _ = FoconFrame.unpack(bytes.fromhex('ff ff ff 01 49 2a 01 01 00 12 49 30 00 00 49 30 00 08 00 41 46 41 31 30 31 31 33 30 8c 03 ff ff'))
+			rp.dest_id = args.source_id
+			bus = FoconMessageBus(FoconMockBus(frames=[rp]), src_id=0)
+			device = FoconDevice(bus, args.id)
+			display = FoconDisplay(device)
+			print(display.get_device_info())
+
+			print(FoconDisplayInfo.unpack(
+				bytes.fromhex('46 41 31 30 31 31 33 30') +
+				b'foo'.ljust(0x13-0x08, b'\x00') +
+				str(42690).encode('ascii').ljust(0x1e-0x13, b'\x00') +
+				b'abcde'.ljust(0x29-0x1e, b'\x00') +
+				b'lel'.ljust(0x44-0x29, b'\x00')
+			))
+		self_test_parser = debug_subcommands.add_parser('self-test', help='sanity-check own message bus implementation')
+		self_test_parser.set_defaults(_handler=do_self_test)
+
+	# Fleet monitoring commands
+
+	def parse_poll_target(s: str):
+		if ':' in s:
+			device, addresses = s.rsplit(':', 1)
+		else:
+			device, addresses = s, '0'
+		return device, [int(a) for a in addresses.split(',')]
+
+	def do_poll(args):
+		import threading
+		from .bus import FoconSerialTransport, FoconBus
+		from .message import FoconMessageBus
+		from .poller import FoconFleetPoller, FoconPolledDisplay
+		from .devices.device import FoconDevice
+		from .devices.display import FoconDisplay
+
+		targets = []
+		for device_path, addresses in args.target or [(args.device, [args.id])]:
+			transport = FoconSerialTransport(device_path, baudrate=args.baudrate, xtal=args.crystal, flow_control=args.flow_control, direction=args.direction, timeout=args.timeout, debug=args.debug > 2)
+			bus = FoconBus(transport, args.source_id, debug=args.debug > 1)
+			msg_bus = FoconMessageBus(bus, args.source_id, debug=args.debug > 0)
+			for address in addresses:
+				display = FoconDisplay(FoconDevice(msg_bus, address))
+				targets.append(FoconPolledDisplay(name='{}:{}'.format(device_path, address), display=display))
+
+		lock = threading.Lock()
+		last_export = [0.0]
+
+		def export(target, sample):
+			with lock:
+				if args.jsonl:
+					poller.write_jsonl(args.jsonl, target, sample)
+				elif not args.prometheus:
+					print(target.name, sample if sample else 'down')
+				if args.prometheus and time.monotonic() - last_export[0] >= args.export_interval:
+					poller.write_prometheus(args.prometheus)
+					last_export[0] = time.monotonic()
+
+		poller = FoconFleetPoller(targets, min_interval=args.min_interval, max_interval=args.max_interval, budget=args.budget, callback=export)
+		try:
+			poller.run()
+		except KeyboardInterrupt:
+			poller.stop()
+
+	poll_parser = commands.add_parser('poll', help='continuously poll the status of many displays')
+	poll_parser.set_defaults(_handler=do_poll)
+	poll_parser.add_argument('-t', '--target', action='append', type=parse_poll_target, metavar='DEVICE[:ADDR,...]', help='bus device and display addresses to poll (default: -d and -i)')
+	poll_parser.add_argument('--min-interval', type=float, default=1.0, metavar='SECONDS', help='poll interval for displays that are changing')
+	poll_parser.add_argument('--max-interval', type=float, default=60.0, metavar='SECONDS', help='poll interval for steady displays')
+	poll_parser.add_argument('--budget', type=float, default=0.1, help='maximum fraction of bus time to spend polling')
+	poll_parser.add_argument('--prometheus', metavar='FILE', help='write metrics to Prometheus textfile')
+	poll_parser.add_argument('--export-interval', type=float, default=5.0, metavar='SECONDS', help='minimum time between Prometheus textfile writes')
+	poll_parser.add_argument('--jsonl', type=argparse.FileType('a'), metavar='FILE', help='append samples as JSON lines')
+
+	# Benchmark commands
+
+	bench_parser = commands.add_parser('bench', help='commands to benchmark performance-sensitive code')
+	if wanted('bench'):
+		from .bus import FoconFrameSizeTuner
+
+		bench_subcommands = bench_parser.add_subparsers(title='benchmark subcommands', required=True)
+
+		def do_bench_schema(args):
+			from .devices.display import (
+				FoconDisplayConfiguration, FoconDisplayStatus, FoconDisplayDrawSpec, FoconDisplayDrawComposition,
+				FoconDisplayTextObject, FoconDisplayHideSpecification, FoconDisplayOutputSelector,
+			)
 
-		app_header_data = args.INPUT.read(FoconBootHeader.sizeof())
-		app_header = FoconBootHeader.unpack(app_header_data)
+			config = FoconDisplayConfiguration.unpack(args.config.read())
+			spec = FoconDisplayDrawSpec(object_id=1, output_id=1, composition=FoconDisplayDrawComposition.Replace, x_end=config.width - 1, y_end=config.height - 1)
+			samples = [
+				config,
+				FoconDisplayStatus.unpack(bytes(FoconDisplayStatus.sizeof())),
+				spec,
+				FoconDisplayTextObject(spec, 'Beste reizigers'),
+				FoconDisplayHideSpecification(mode=FoconDisplayOutputSelector.SingleArea, output_id=1, x_end=10, y_end=10),
+			]
+			buffer = bytearray(1024)
+			for obj in samples:
+				cls = type(obj)
+				data = obj.pack()
+				start = time.perf_counter()
+				for _ in range(args.iterations):
+					obj.pack()
+				packed = time.perf_counter()
+				for _ in range(args.iterations):
+					cls.unpack(data)
+				unpacked = time.perf_counter()
+				for _ in range(args.iterations):
+					obj.pack_into(buffer, 0)
+				packed_into = time.perf_counter()
+				print('{:<36} {:>4} bytes  pack: {:>9.0f}/s  pack_into: {:>9.0f}/s  unpack: {:>9.0f}/s'.format(
+					cls.__name__, len(data),
+					args.iterations / (packed - start),
+					args.iterations / (packed_into - unpacked),
+					args.iterations / (unpacked - packed),
+				))
+
+		bench_schema_parser = bench_subcommands.add_parser('schema', help='measure encode/decode throughput of packet structures')
+		bench_schema_parser.set_defaults(_handler=do_bench_schema)
+		bench_schema_parser.add_argument('-n', '--iterations', type=int, default=10000, help='iterations per structure')
+		bench_schema_parser.add_argument('config', type=argparse.FileType('rb'), help='display configuration to use as sample')
+
+		def do_bench_frame_log(args):
+			import tracemalloc
+			import os
+			from .frame import FoconFrame, FoconFrameLog
+
+			def measure(name: str, fill: Callable[[], Any]) -> None:
+				tracemalloc.start()
+				container = fill()
+				current, peak = tracemalloc.get_traced_memory()
+				tracemalloc.stop()
+				print('{:<16} {:>8.1f} bytes/frame  {:>8.1f} MiB/million frames  (peak {:.1f} MiB/million frames)'.format(
+					name, current / args.frames,
+					current / args.frames * 1e6 / 2**20,
+					peak / args.frames * 1e6 / 2**20,
+				))
+				del container
+
+			def fill_list() -> list[FoconFrame]:
+				return [FoconFrame(src_id=1, dest_id=14, num=1, total=1, data=os.urandom(args.size)) for _ in range(args.frames)]
+
+			def fill_log() -> FoconFrameLog:
+				log = FoconFrameLog()
+				for _ in range(args.frames):
+					log.append_parts(1, 14, 1, 1, os.urandom(args.size))
+				return log
+
+			measure('list[FoconFrame]', fill_list)
+			measure('FoconFrameLog', fill_log)
+
+		bench_frame_log_parser = bench_subcommands.add_parser('frame-log', help='measure memory use of captured frames')
+		bench_frame_log_parser.set_defaults(_handler=do_bench_frame_log)
+		bench_frame_log_parser.add_argument('-n', '--frames', type=int, default=1000000, help='amount of frames to store')
+		bench_frame_log_parser.add_argument('-s', '--size', type=int, default=16, help='payload size per frame')
+
+		def do_bench_frames(args):
+			from .bitmap import FoconBitmap
+			from .bus import FoconTransport, FoconSerialTransport, FoconBus, FoconFrameSizeTuner
+			from .message import FoconMessageBus
+			from .devices.device import FoconDevice
+			from .devices.display import (
+				FoconDisplay, FoconDisplayDrawSpec, FoconDisplayDrawComposition, FoconDisplayDrawStatus, FoconDisplayBitmapObject,
+				ANONYMOUS_OBJECT_ID,
+			)
 
-		args.INPUT.seek(app_header.start_address)
-		app = args.INPUT.read(app_header.size)
-		if not app_header.verify(app):
-			print('error: app data is corrupt', file=sys.stderr)
-			sys.exit(1)
+			transport: FoconTransport
+			if args.simulate:
+				from .sim import FoconSimulatedTransport, FoconSimulatedDevice
+
+				status = FoconDisplayDrawStatus(object_id=ANONYMOUS_OBJECT_ID, status=0).pack()
+				device = FoconSimulatedDevice(args.id, handler=lambda command, payload: status)
+				transport = FoconSimulatedTransport([device], baudrate=args.baudrate or FoconSerialTransport.BAUDRATE, bit_error_rate=args.bit_error_rate, seed=0)
+				bus = FoconBus(transport, args.source_id, debug=args.debug > 1, clock=transport.time)
+			else:
+				transport = FoconSerialTransport(args.device, baudrate=args.baudrate, xtal=args.crystal, flow_control=args.flow_control, direction=args.direction, timeout=args.timeout, debug=args.debug > 2)
+				bus = FoconBus(transport, args.source_id, debug=args.debug > 1)
+			msg_bus = FoconMessageBus(bus, args.source_id, debug=args.debug > 0)
+			display = FoconDisplay(FoconDevice(msg_bus, args.id))
+
+			if args.simulate:
+				width, height = args.width or 256, args.height or 48
+			else:
+				config = display.get_current_config()
+				width, height = args.width or config.width, args.height or config.height
+			bitmap = FoconBitmap.blank(width, height)
+			spec = FoconDisplayDrawSpec(object_id=ANONYMOUS_OBJECT_ID, output_id=1, composition=FoconDisplayDrawComposition.Replace, x_end=width - 1, y_end=height - 1)
+			payload = len(FoconDisplayBitmapObject(spec, bitmap).pack())
+
+			def run(count: int) -> tuple[float, int, int]:
+				resent = bus.stats.resent
+				failed = 0
+				start = bus.clock()
+				for _ in range(count):
+					try:
+						display.draw_bitmap(bitmap, spec, optimize=False)
+					except IOError as e:
+						logging.debug('draw failed: %s', e)
+						failed += 1
+				return bus.clock() - start, bus.stats.resent - resent, failed
+
+			print('{} byte draws, {} per size'.format(payload, args.messages))
+			for size in args.sizes:
+				bus.set_frame_size(args.id, size)
+				elapsed, resent, failed = run(args.messages)
+				delivered = args.messages - failed
+				print('frame size {:>5}: {:>7.3f} s  {:>8.0f} B/s goodput  {:>4} resent  {:>3} failed'.format(size, elapsed, payload * delivered / elapsed, resent, failed))
+
+			tuner = bus.tune_frame_size(args.id, FoconFrameSizeTuner(sizes=args.sizes))
+			while tuner.best is None:
+				run(1)
+			print('auto-tuned frame size: {}'.format(tuner.best))
+
+		def do_bench_import(args):
+			import subprocess
+			import statistics
+
+			def measure(module: str) -> float:
+				code = 'import time; start = time.perf_counter(); import {}; print(time.perf_counter() - start)'.format(module)
+				# fresh interpreter every time, nothing may be imported already
+				return statistics.median(
+					float(subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True).stdout)
+					for _ in range(args.runs)
+				)
+
+			slow = False
+			for module in args.modules:
+				elapsed = measure(module)
+				print('{:<28} {:>7.1f} ms'.format(module, elapsed * 1000))
+				slow = slow or (args.max is not None and elapsed * 1000 > args.max)
+			if slow:
+				print('error: import took longer than {} ms'.format(args.max), file=sys.stderr)
+				sys.exit(1)
+
+		bench_import_parser = bench_subcommands.add_parser('import', help='measure import time of modules in a fresh interpreter')
+		bench_import_parser.set_defaults(_handler=do_bench_import)
+		bench_import_parser.add_argument('-n', '--runs', type=int, default=10, help='interpreter runs per module (median is reported)')
+		bench_import_parser.add_argument('--max', type=float, metavar='MS', help='fail if any module takes longer than this')
+		bench_import_parser.add_argument('modules', nargs='*', default=['foconutil', 'foconutil.cli', 'foconutil.devices.display'], help='modules to import')
+
+		bench_frames_parser = bench_subcommands.add_parser('frames', help='measure goodput of draws per frame size')
+		bench_frames_parser.set_defaults(_handler=do_bench_frames)
+		bench_frames_parser.add_argument('-S', '--simulate', action='store_true', help='use a simulated bus and display instead of the device')
+		bench_frames_parser.add_argument('-e', '--bit-error-rate', type=float, default=0.0, help='bit error rate of the simulated bus')
+		bench_frames_parser.add_argument('-n', '--messages', type=int, default=20, help='draws per frame size')
+		bench_frames_parser.add_argument('-W', '--width', type=int, help='width of the drawn bitmap (default: display width)')
+		bench_frames_parser.add_argument('-H', '--height', type=int, help='height of the drawn bitmap (default: display height)')
+		bench_frames_parser.add_argument('sizes', type=int, nargs='*', default=list(FoconFrameSizeTuner.SIZES), help='frame sizes to try')
 
-		new_header = FoconBootHeader.generate(app, args.app_offset + FoconBootHeader.sizeof())
-		args.APPOUT.write(new_header.pack())
-		args.APPOUT.write(app)
-
-	unpack_parser = flash_subcommands.add_parser('unpack', description='extract bootloader and application from flash image')
-	unpack_parser.set_defaults(_handler=do_flash_unpack)
-	unpack_parser.add_argument('--boot-offset', type=int, metavar='OFFSET', default=0x0, help='bootloader offset in dump')
-	unpack_parser.add_argument('-o', '--app-offset', type=int, metavar='OFFSET', default=0x7000, help='application offset in dump')
-	unpack_parser.add_argument('INPUT', type=argparse.FileType('rb'), help='stitched flash dump')
-	unpack_parser.add_argument('BOOTOUT', type=argparse.FileType('wb'), help='extracted bootloader')
-	unpack_parser.add_argument('APPOUT', type=argparse.FileType('wb'), help='extracted application')
+	# Flash dump commands
+	flash_parser = commands.add_parser('flash', help='commands to process flash memory dumps of Focon devices')
+	if wanted('flash'):
+		flash_subcommands = flash_parser.add_subparsers(title='flash memory subcommands', required=True)
+
+		def do_flash_stitch(args):
+			while True:
+				for inp in args.CHUNK:
+					chunk = inp.read(args.word_size)
+					if not chunk:
+						return
+					args.OUTPUT.write(chunk)
+
+		stitch_parser = flash_subcommands.add_parser('stitch', help='combine multi-chip flash dumps into single flash image')
+		stitch_parser.set_defaults(_handler=do_flash_stitch)
+		stitch_parser.add_argument('-w', '--word-size', metavar='N', type=int, default=1, help='amount of bytes in each chunk')
+		stitch_parser.add_argument('OUTPUT', type=argparse.FileType('wb'), help='stitched file')
+		stitch_parser.add_argument('CHUNK', nargs='+', type=argparse.FileType('rb'), help='chunk file(s)')
+
+		def do_flash_unstitch(args):
+			while True:
+				for outp in args.CHUNK:
+					chunk = args.INPUT.read(args.word_size)
+					if not chunk:
+						return
+					outp.write(chunk)
+
+		unstitch_parser = flash_subcommands.add_parser('unstitch', help='seperate single flash image into multi-chip flash dumps')
+		unstitch_parser.set_defaults(_handler=do_flash_unstitch)
+		unstitch_parser.add_argument('-w', '--word-size', metavar='N', type=int, default=1, help='amount of bytes in each chunk')
+		unstitch_parser.add_argument('INPUT', type=argparse.FileType('wb'), help='stitched file')
+		unstitch_parser.add_argument('CHUNK', nargs='+', type=argparse.FileType('rb'), help='chunk file(s)')
+
+		def do_flash_pack(args):
+			from .devices.bootloader import FoconBootHeader
+
+			args.OUTPUT.truncate(args.boot_offset)
+			args.OUTPUT.seek(args.boot_offset)
+
+			bootloader = args.BOOTFILE.read()
+			args.OUTPUT.write(bootloader)
+
+			app_header_data = args.APPFILE.read(FoconBootHeader.sizeof())
+			app_header = FoconBootHeader.unpack(app_header_data)
+			app = args.APPFILE.read(app_header.size)
+			if not app_header.verify(app):
+				print('error: app data is corrupt', file=sys.stderr)
+				sys.exit(1)
+
+			new_header = FoconBootHeader.generate(app, args.boot_offset + app_header.start_address)
+			args.OUTPUT.truncate(new_header.start_address - FoconBootHeader.sizeof())
+			args.OUTPUT.seek(new_header.start_address - FoconBootHeader.sizeof())
+			args.OUTPUT.write(new_header.pack())
+			args.OUTPUT.write(app)
+
+		pack_parser = flash_subcommands.add_parser('pack', description='pack bootloader and application into flash image')
+		pack_parser.set_defaults(_handler=do_flash_pack)
+		pack_parser.add_argument('--boot-offset', type=int, metavar='OFFSET', default=0x0, help='bootloader offset in dump')
+		pack_parser.add_argument('BOOTFILE', type=argparse.FileType('rb'))
+		pack_parser.add_argument('APPFILE', type=argparse.FileType('rb'))
+		pack_parser.add_argument('OUTPUT', type=argparse.FileType('wb'))
+
+		def do_flash_unpack(args):
+			from .devices.bootloader import FoconBootHeader
+
+			args.INPUT.seek(args.boot_offset)
+
+			bootloader = args.INPUT.read(args.app_offset - args.boot_offset)
+			args.BOOTOUT.write(bootloader)
+
+			app_header_data = args.INPUT.read(FoconBootHeader.sizeof())
+			app_header = FoconBootHeader.unpack(app_header_data)
+
+			args.INPUT.seek(app_header.start_address)
+			app = args.INPUT.read(app_header.size)
+			if not app_header.verify(app):
+				print('error: app data is corrupt', file=sys.stderr)
+				sys.exit(1)
+
+			new_header = FoconBootHeader.generate(app, args.app_offset + FoconBootHeader.sizeof())
+			args.APPOUT.write(new_header.pack())
+			args.APPOUT.write(app)
+
+		unpack_parser = flash_subcommands.add_parser('unpack', description='extract bootloader and application from flash image')
+		unpack_parser.set_defaults(_handler=do_flash_unpack)
+		unpack_parser.add_argument('--boot-offset', type=int, metavar='OFFSET', default=0x0, help='bootloader offset in dump')
+		unpack_parser.add_argument('-o', '--app-offset', type=int, metavar='OFFSET', default=0x7000, help='application offset in dump')
+		unpack_parser.add_argument('INPUT', type=argparse.FileType('rb'), help='stitched flash dump')
+		unpack_parser.add_argument('BOOTOUT', type=argparse.FileType('wb'), help='extracted bootloader')
+		unpack_parser.add_argument('APPOUT', type=argparse.FileType('wb'), help='extracted application')
 
 
 	args = p.parse_args()
@@ -1,35 +1,29 @@
 from enum import Enum
 from dataclasses import dataclass
-from struct import pack, unpack
 import crcmod
 
+from ..schema import FoconStruct, Layout, U16, U32, Tail
 from .device import FoconDevice, FoconDeviceInfo, dangerous
 
 CRC = crcmod.mkCrcFun(0x18005, 0x0, False)
 
 
 @dataclass
-class FoconBootHeader:
+class FoconBootHeader(FoconStruct):
 	checksum: int
 	start_address: int
 	end_address: int
 
+	LAYOUT = Layout([
+		('checksum', U16),
+		('start_address', U32),
+		('end_address', U32),
+	])
+
 	@property
 	def size(self):
 		return self.end_address - self.start_address + 1
 
-	@classmethod
-	def sizeof(cls) -> int:
-		return 10
-
-	def pack(self) -> bytes:
-		return pack('>HII', self.checksum, self.start_address, self.end_address)
-
-	@classmethod
-	def unpack(cls, data: bytes) -> 'Self':
-		crc, start, end = unpack('>HII', data[:10])
-		return cls(checksum=crc, start_address=start, end_address=end)
-
 	@classmethod
 	def generate(cls, data: bytes, start_address: int) -> 'Self':
 		return cls(
@@ -46,12 +40,15 @@ class FoconBootCommand(Enum):
 	LaunchApp  = 0x00F1
 
 @dataclass
-class FoconBootFlashBlock:
+class FoconBootFlashBlock(FoconStruct):
 	address: int
 	data: bytes
 
-	def pack(self) -> bytes:
-		return pack('>HI', len(self.data), self.address) + self.data
+	LAYOUT = Layout([
+		('_length', U16),
+		('address', U32),
+		('data', Tail()),
+	], encode_hook=lambda block: {'_length': len(block.data)})
 
 class FoconBootDevice:
 	APP_ADDRESS = 0x7000
@@ -1,19 +1,17 @@
-from typing import Callable, Any
+from typing import Callable, Any, TypeVar
 
-from struct import unpack
 from dataclasses import dataclass
 from enum import Enum
 
 from ..message import FoconMessageBus
+from ..schema import FoconStruct, Layout, Char, CharEnum, Version
 
 
 def decode_version(data: bytes) -> tuple[int, int]:
 	return int(data[0:1].decode('ascii'), 10), int(data[1:3].decode('ascii'), 10)
 
 def encode_version(ver: tuple[int, int]) -> bytes:
-	major = str(ver[0]).encode('ascii')
-	minor = str(ver[1]).encode('ascii')
-	return major + minor
+	return '{}{:02}'.format(*ver).encode('ascii')
 
 class FoconDeviceCommand(Enum):
 	BootInfo          = 0x0041
@@ -23,35 +21,21 @@ class FoconBootMode(Enum):
 	Application = 'A'
 
 @dataclass
-class FoconDeviceInfo:
+class FoconDeviceInfo(FoconStruct):
 	kind: str
 	mode: FoconBootMode
 	boot_version: tuple[int, int]
 	app_version: tuple[int, int] | None
 
-	def pack(self) -> bytes:
-		b = b''
-
+	LAYOUT = Layout([
 		# 0x00..0x02
-		b += bytes([
-			ord(self.kind),
-			ord(self.mode.value)]
-		)
+		('kind', Char()),
+		('mode', CharEnum(FoconBootMode)),
 		# 0x02..0x05
-		b += encode_version(self.boot_version)
+		('boot_version', Version()),
 		# 0x05..0x08
-		b += encode_version(self.app_version) if self.app_version else b'???'
-
-		return b
-
-	@classmethod
-	def unpack(cls, data: bytes) -> 'FoconDeviceInfo':
-		return cls(
-			kind=chr(data[0]),
-			mode=FoconBootMode(chr(data[1])),
-			boot_version=decode_version(data[2:5]),
-			app_version=decode_version(data[5:8]) if data[5:8] != b'???' else None,
-		)
+		('app_version', Version(optional=True)),
+	])
 
 	def __repr__(self) -> str:
 		s = f'{self.__class__.__name__} {{ {self.kind}, {self.mode.name.lower()}, boot: {self.boot_version[0]}.{self.boot_version[1]:02}'
@@ -72,9 +56,16 @@ def decode_str(data: bytes) -> str:
 		data = data[:data.index(b'\0')]
 	return data.decode('iso-8859-15')
 
-def dangerous(fn: Callable[..., Any]) -> Callable[..., Any]:
+DangerousFunction = TypeVar('DangerousFunction', bound=Callable[..., Any])
+
+def dangerous(fn: DangerousFunction) -> DangerousFunction:
+	# marks commands that can break a device or lose its data
+	setattr(fn, 'dangerous', True)
 	return fn
 
+def is_dangerous(fn: Callable[..., Any]) -> bool:
+	return bool(getattr(fn, 'dangerous', False))
+
 
 class FoconDevice:
 	def __init__(self, bus: FoconMessageBus, dest_id: int) -> None:
@@ -84,6 +75,9 @@ class FoconDevice:
 	def send_command(self, command: int, payload: bytes = b'') -> bytes:
 		return self.bus.send_command(self.dest_id, command, payload=payload)
 
+	def send_commands(self, commands: list[tuple[int, bytes]], window: int | None = None) -> list[bytes]:
+		return self.bus.send_commands(self.dest_id, commands, window=window)
+
 	def recv_message(self, cmd: int | None = None) -> bytes:
 		return self.bus.recv_message(self.dest_id, cmd=cmd)
 
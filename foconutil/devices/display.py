@@ -1,12 +1,21 @@
-from typing import Iterator, Optional, List, Tuple
+from typing import TYPE_CHECKING, Iterator, Optional, List, Tuple
 
+import re
 from codecs import Codec, CodecInfo, charmap_encode, charmap_decode, register as register_codec
-from struct import pack, unpack
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
+from functools import cache
 from enum import Enum, Flag
 
 from ..message import FoconMessageBus
-from .device import FoconDevice, FoconDeviceInfo, dangerous, encode_version, decode_version, encode_str, decode_str
+from ..bitmap import FoconBitmap
+from ..schema import (
+	FoconStruct, Layout, Field, U8, U16, U32, Bool, Scaled, EnumField, CharEnum, Str, IntStr, Version, Reserved,
+	Nested, Array, Counted, Tail, CountedTail, NestedTail,
+)
+from .device import FoconDevice, FoconDeviceInfo, dangerous, decode_str
+
+if TYPE_CHECKING:
+	from ..journal import FoconDisplayJournal
 
 
 class FoconDisplayCommand(Enum):
@@ -23,7 +32,6 @@ class FoconDisplayCommand(Enum):
 	# 0x4B is not defined
 	Undraw       = 0x004C
 	Redraw       = 0x004D
-	# 0x4E is not defined
 	GetAssetFont    = 0x004E
 	GetAssetData    = 0x004F
 	ResetAssetData  = 0x0050
@@ -42,33 +50,16 @@ class FoconDisplayInfo(FoconDeviceInfo):
 	unk1E: str
 	unk29: str
 
-	def pack(self) -> bytes:
-		b = super().pack()
-
+	LAYOUT = FoconDeviceInfo.LAYOUT.extend([
 		# 0x08..0x13
-		b += encode_str(self.unk08, 11)
+		('unk08', Str(11)),
 		# 0x13..0x1E
-		b += encode_str(str(self.part_id), 11)
+		('part_id', IntStr(11)),
 		# 0x1E..0x29
-		b += encode_str(self.unk1E, 11)
+		('unk1E', Str(11)),
 		# 0x29..0x44
-		b += encode_str(self.unk29, 27)
-
-		raise b
-
-	@classmethod
-	def unpack(cls, data: bytes) -> 'FoconDisplayInfo':
-		di = FoconDeviceInfo.unpack(data)
-		return cls(
-			kind=di.kind,
-			mode=di.mode,
-			boot_version=di.boot_version,
-			app_version=di.app_version,
-			unk08=decode_str(data[0x08:0x13]),
-			part_id=int(decode_str(data[0x13:0x1e])),
-			unk1E=decode_str(data[0x1e:0x29]),
-			unk29=decode_str(data[0x29:0x44]),
-		)
+		('unk29', Str(27)),
+	])
 
 	def __repr__(self) -> str:
 		return super().__repr__().rstrip('} ') + f', unk08: {self.unk08}, part ID: {self.part_id}, unk1E: {self.unk1E}, unk29: {self.unk29} }}'
@@ -110,35 +101,30 @@ class FoconDisplayOutputLayout(Enum):
 	WordMSB = 3
 
 @dataclass
-class FoconDisplayOutputConfiguration:
+class FoconDisplayOutputConfiguration(FoconStruct):
 	index: int
 	layout: FoconDisplayOutputLayout
 	row_num: int
 	col_num: int
 	row_major: bool
-	unk05: int
+	unk05: bool
 	row_blocks: int
 	pwm_cycle: int
 	total_blocks: int
 
-	def pack(self) -> bytes:
-		b = b''
-
+	LAYOUT = Layout([
 		# 0x00..0x08
-		b += bytes([
-			self.index,
-			self.layout.value,
-			self.row_num,
-			self.col_num,
-			1 if self.row_major else 0,
-			1 if self.unk05 else 0,
-			self.row_blocks,
-			self.pwm_cycle,
-		])
+		('index', U8),
+		('layout', EnumField(FoconDisplayOutputLayout)),
+		('row_num', U8),
+		('col_num', U8),
+		('row_major', Bool),
+		('unk05', Bool),
+		('row_blocks', U8),
+		('pwm_cycle', U8),
 		# 0x08..0x0A
-		b += pack('>H', self.total_blocks)
-
-		return b
+		('total_blocks', U16),
+	])
 
 	@classmethod
 	def unused(cls) -> 'FoconDisplayOutputConfiguration':
@@ -148,50 +134,31 @@ class FoconDisplayOutputConfiguration:
 			unk05=False, row_blocks=0, pwm_cycle=0, total_blocks=0,
 		)
 
-	@classmethod
-	def unpack(cls, data: bytes) -> 'FoconDisplayOutputConfiguration':
-		return cls(
-			index=data[0],
-			layout=FoconDisplayOutputLayout(data[1]),
-			row_num=data[2],
-			col_num=data[3],
-			row_major=bool(data[4]),
-			unk05=bool(data[5]),
-			row_blocks=data[6],
-			pwm_cycle=data[7],
-			total_blocks=unpack('>H', data[8:10])[0],
-		)
-
 	@property
 	def col_blocks(self) -> int:
 		return self.total_blocks // self.row_blocks
 
 @dataclass
-class FoconDisplayAdjustmentEntry:
+class FoconDisplayAdjustmentEntry(FoconStruct):
 	center: int
 	span: int
 	value: int
 
-	def pack(self) -> bytes:
-		return pack('>HBB', self.center, self.value, self.span)
+	LAYOUT = Layout([
+		('center', U16),
+		('value', U8),
+		('span', U8),
+	])
 
 	@classmethod
 	def unused(cls) -> 'FoconDisplayAdjustmentEntry':
 		return cls(center=0, value=0, span=0)
 
-	@classmethod
-	def unpack(cls, data: bytes) -> 'FoconDisplayAdjustmentEntry':
-		return cls(
-			center=unpack('>H', data[0:2])[0],
-			value=data[2],
-			span=data[3],
-		)
-
 MAX_OUTPUTS = 10
 ADJUSTMENT_ENTRIES = 10
 
 @dataclass
-class FoconDisplayConfiguration:
+class FoconDisplayConfiguration(FoconStruct):
 	led_unk1: int       # param 0
 	led_unk2: bool      # param 1
 	led_col_size: int   # param 2
@@ -216,93 +183,36 @@ class FoconDisplayConfiguration:
 	x_end: int
 	y_end: int
 
-	def pack(self) -> bytes:
-		b = b''
-
+	LAYOUT = Layout([
 		# 0x00..0x07
-		b += bytes([
-			self.unk00,
-			1 if self.hw_adjust_brightness_enable else 0,   # param3
-			1 if self.led_pwm_auto else 0,        # param4
-			self.led_unk1,                        # param0
-			self.led_col_size,                    # param2
-			1 if self.led_unk2 else 0,            # param1
-			self.led_pwm_cycle,                   # param6
-			len(self.outputs),
-		])
-		# 0x08..0x06C
-		for out in self.outputs:
-			b += out.pack()
-		for _ in range(MAX_OUTPUTS - len(self.outputs)):
-			b += FoconDisplayOutputConfiguration.unused().pack()
+		('unk00', U8),
+		('hw_adjust_brightness_enable', Bool),  # param3
+		('led_pwm_auto', Bool),                 # param4
+		('led_unk1', U8),                       # param0
+		('led_col_size', U8),                   # param2
+		('led_unk2', Bool),                     # param1
+		('led_pwm_cycle', U8),                  # param6
+		# 0x07..0x6C
+		('outputs', Counted(Nested(FoconDisplayOutputConfiguration.LAYOUT), MAX_OUTPUTS, fill=FoconDisplayOutputConfiguration.unused)),
 		# 0x6C..0x94
-		for entry in self.brightness_adjustments:
-			b += entry.pack()
-		for _ in range(ADJUSTMENT_ENTRIES - len(self.brightness_adjustments)):
-			b += FoconDisplayAdjustmentEntry.unused().pack()
+		('brightness_adjustments', Array(Nested(FoconDisplayAdjustmentEntry.LAYOUT), ADJUSTMENT_ENTRIES, fill=FoconDisplayAdjustmentEntry.unused)),
 		# 0x94..0xBC
-		for entry in self.temp_adjustments:
-			b += entry.pack()
-		for _ in range(ADJUSTMENT_ENTRIES - len(self.temp_adjustments)):
-			b += FoconDisplayAdjustmentEntry.unused().pack()
+		('temp_adjustments', Array(Nested(FoconDisplayAdjustmentEntry.LAYOUT), ADJUSTMENT_ENTRIES, fill=FoconDisplayAdjustmentEntry.unused)),
 		# 0xBC..0xBE
-		b += pack('>H', self.hw_adjust_temp_offset)
+		('hw_adjust_temp_offset', U16),
 		# 0xBE..0xC2
-		b += bytes([
-			1 if self.hw_adjust_temp_enable else 0,
-			self.message_response_timeout_10s,
-			self.x_start,
-			self.y_start,
-		])
-		# 0xC2..0xC4
-		b += pack('>H', self.x_end)
-		# 0xC4..0xC6
-		b += pack('>H', self.y_end)
+		('hw_adjust_temp_enable', Bool),
+		('message_response_timeout_10s', U8),
+		('x_start', U8),
+		('y_start', U8),
+		# 0xC2..0xC6
+		('x_end', U16),
+		('y_end', U16),
 		# 0xC6..0xC9
-		b += bytes([
-			self.hw_adjust_interval_ms,  # param7
-			self.hw_adjust_brightness_history_count,  # param8
-			self.hw_adjust_temp_history_count, # param9
-		])
-
-		return b
-
-	@classmethod
-	def unpack(cls, data: bytes) -> 'FoconDisplayConfiguration':
-		return cls(
-			led_unk1=data[0x03], # param0
-			led_unk2=bool(data[0x05]), # param1
-			led_col_size=data[0x04], # param2
-			hw_adjust_brightness_enable=bool(data[0x01]), # param3
-			led_pwm_auto=bool(data[0x02]), # param4
-			led_pwm_cycle=data[0x06], # param6
-			hw_adjust_interval_ms=data[0xC6], # param7
-			hw_adjust_brightness_history_count=data[0xC7], # param8
-			hw_adjust_temp_history_count=data[0xC8], # param9
-
-			outputs=[
-				FoconDisplayOutputConfiguration.unpack(data[8 + i * 10:8 + i * 10 + 10])
-				for i in range(data[7])
-			],
-			brightness_adjustments=[
-				FoconDisplayAdjustmentEntry.unpack(data[0x6C + i * 4:0x6C + i * 4 + 4])
-				for i in range(ADJUSTMENT_ENTRIES)
-			],
-			temp_adjustments=[
-				FoconDisplayAdjustmentEntry.unpack(data[0x94 + i * 4:0x94 + i * 4 + 4])
-				for i in range(ADJUSTMENT_ENTRIES)
-			],
-
-			hw_adjust_temp_offset=unpack('>H', data[0xBC:0xBE])[0],
-			hw_adjust_temp_enable=bool(data[0xBE]),
-			message_response_timeout_10s=data[0xBF],
-			x_start=data[0xC0],
-			y_start=data[0xC1],
-			x_end=unpack('>H', data[0xC2:0xC4])[0],
-			y_end=unpack('>H', data[0xC4:0xC6])[0],
-
-			unk00=data[0],
-		)
+		('hw_adjust_interval_ms', U8),               # param7
+		('hw_adjust_brightness_history_count', U8),  # param8
+		('hw_adjust_temp_history_count', U8),        # param9
+	])
 
 	@property
 	def leds_per_col_block(self) -> int:
@@ -332,6 +242,11 @@ class FoconDisplayConfiguration:
 		else:
 			return sum(self.height_of(output) for output in self.outputs)
 
+	def area_of(self, output: FoconDisplayOutputConfiguration) -> tuple[tuple[int, int], tuple[int, int]]:
+		if len(self.outputs) == 1 and (self.x_start, self.y_start, self.x_end, self.y_end) != (0, 0, 0, 0):
+			return (self.x_start, self.x_end), (self.y_start, self.y_end)
+		return (0, self.width_of(output) - 1), (0, self.height_of(output) - 1)
+
 class FoconDisplayDumpType(Enum):
 	MemoryStats = 0x01
 	NetworkStats = 0x02
@@ -341,25 +256,95 @@ class FoconDisplayDumpType(Enum):
 	TaskStats = 0x06
 
 @dataclass
-class FoconDisplayAssetData:
+class FoconDisplayMemoryStats:
+	# FreeBuffer: 8:20:4 [S:M:L]  RunTime: 0:0:1:18 [D:H:M:S]
+	FREE_BUFFERS = re.compile(r'FreeBuffer:\s*(\d+):(\d+):(\d+)')
+	RUNTIME = re.compile(r'RunTime:\s*(\d+):(\d+):(\d+):(\d+)')
+
+	free_small:  int
+	free_medium: int
+	free_large:  int
+	# in seconds
+	runtime:     int | None
+	text:        str
+
+	@classmethod
+	def parse(cls, text: str) -> 'FoconDisplayMemoryStats':
+		m = cls.FREE_BUFFERS.search(text)
+		if not m:
+			raise ValueError(f'invalid memory statistics: {text!r}')
+		small, medium, large = (int(x) for x in m.groups())
+
+		runtime = None
+		m = cls.RUNTIME.search(text)
+		if m:
+			days, hours, minutes, seconds = (int(x) for x in m.groups())
+			runtime = ((days * 24 + hours) * 60 + minutes) * 60 + seconds
+		return cls(free_small=small, free_medium=medium, free_large=large, runtime=runtime, text=text)
+
+	@property
+	def free_buffers(self) -> tuple[int, int, int]:
+		return self.free_small, self.free_medium, self.free_large
+
+	def __str__(self) -> str:
+		return self.text
+
+@dataclass
+class FoconDisplayNetworkStats:
+	# SnpInfo Tx=000002, Rx=000003 --- Error: Pkt=00, PktNo=00, TxBuf=04, NoAnswer=00, Chk=00
+	# Counters are zero-padded decimal, or hexadecimal when prefixed with 0x.
+	PATTERN = re.compile(r'(\w+)=(0x[0-9a-fA-F]+|\d+)')
+	FIELDS = {
+		'Tx': 'tx', 'Rx': 'rx',
+		'Pkt': 'packet_errors', 'PktNo': 'sequence_errors', 'TxBuf': 'tx_buffer_errors',
+		'NoAnswer': 'no_answer_errors', 'Chk': 'checksum_errors',
+	}
+
+	tx:               int
+	rx:               int
+	packet_errors:    int
+	sequence_errors:  int
+	tx_buffer_errors: int
+	no_answer_errors: int
+	checksum_errors:  int
+	text:             str
+
+	@classmethod
+	def parse(cls, text: str) -> 'FoconDisplayNetworkStats':
+		# int(v, 0) refuses leading zeros on decimals
+		values = {cls.FIELDS[k]: int(v, 16 if v.startswith('0x') else 10) for k, v in cls.PATTERN.findall(text) if k in cls.FIELDS}
+		missing = set(cls.FIELDS.values()) - set(values)
+		if missing:
+			raise ValueError(f'invalid network statistics, missing {", ".join(sorted(missing))}: {text!r}')
+		return cls(text=text, **values)
+
+	@property
+	def errors(self) -> int:
+		return self.packet_errors + self.sequence_errors + self.tx_buffer_errors + self.no_answer_errors + self.checksum_errors
+
+	def __str__(self) -> str:
+		return self.text
+
+@dataclass
+class FoconDisplayAssetData(FoconStruct):
 	version:    tuple[int, int]
 	part_id:    int
 	name:       str
 	font_count: int
 	size:       int
 
-	def pack(self) -> bytes:
-		raise NotImplementedError()
-
-	@classmethod
-	def unpack(cls, data: bytes) -> 'FoconDisplayAssetData':
-		return cls(
-			version=decode_version(data[0:3]),
-			part_id=int(decode_str(data[4:14])),
-			name=decode_str(data[14:64]),
-			font_count=data[64],
-			size=unpack('>I', data[66:70])[0],
-		)
+	LAYOUT = Layout([
+		# 0x00..0x04
+		('version', Version()),
+		(None, Reserved()),
+		# 0x04..0x40
+		('part_id', IntStr(10)),
+		('name', Str(50)),
+		# 0x40..0x46
+		('font_count', U8),
+		(None, Reserved()),
+		('size', U32),
+	])
 
 
 class FoconDisplaySelfTestKind(Enum):
@@ -385,13 +370,15 @@ class FoconDisplayError(Flag):
 	Option4       = (1 << 14)
 	Option5       = (1 << 15)
 
+MAX_STATUS_OBJECTS = 23
+
 @dataclass
-class FoconDisplayStatus:
+class FoconDisplayStatus(FoconStruct):
 	error_flags:              FoconDisplayError
 	temperature:              float
 	mode:                     int
 	general_adjust:           int
-	brightness_adjust:        int
+	brightness_adjust:        int | None
 	temp_adjust:              int
 	overall_adjust:           int
 	power10_value:            int
@@ -400,22 +387,33 @@ class FoconDisplayStatus:
 	visible_object_ids:       List[int]
 	used_object_ids:          List[int]
 
-	@classmethod
-	def unpack(cls, data: bytes) -> 'FoconDisplayStatus':
-		return cls(
-			error_flags=FoconDisplayError(unpack('>H', data[0:2])[0]),
-			temperature=unpack('>H', data[2:4])[0] / 10,
-			mode=data[4], # status0
-			power10_value=data[5], # status6
-			brightness_adjust=data[6] if bool(data[10]) else None, # status2, status1
-			general_adjust=data[7], # status4
-			temp_adjust=data[8], # status3
-			overall_adjust=data[9], # status5
-			available_still_objects=data[11], # status7
-			available_scroll_objects=data[12], # status8
-			visible_object_ids=[data[14 + i] for i in range(data[13])],
-			used_object_ids=[data[38 + i] for i in range(data[37])],
-		)
+	LAYOUT = Layout([
+		# 0x00..0x04
+		('error_flags', EnumField(FoconDisplayError, 'H')),
+		('temperature', Scaled('H', 10)),
+		# 0x04..0x0D
+		('mode', U8),                      # status0
+		('power10_value', U8),             # status6
+		('brightness_adjust', U8),         # status2
+		('general_adjust', U8),            # status4
+		('temp_adjust', U8),               # status3
+		('overall_adjust', U8),            # status5
+		('_brightness_adjust_enable', Bool),  # status1
+		('available_still_objects', U8),   # status7
+		('available_scroll_objects', U8),  # status8
+		# 0x0D..0x25
+		('visible_object_ids', Counted(U8, MAX_STATUS_OBJECTS)),
+		# 0x25..0x3D
+		('used_object_ids', Counted(U8, MAX_STATUS_OBJECTS)),
+	],
+		encode_hook=lambda status: {
+			'brightness_adjust': status.brightness_adjust or 0,
+			'_brightness_adjust_enable': status.brightness_adjust is not None,
+		},
+		decode_hook=lambda values: dict(values,
+			brightness_adjust=values['brightness_adjust'] if values['_brightness_adjust_enable'] else None,
+		),
+	)
 
 class FoconDisplayDrawComposition(Enum):
 	Replace = 'N'
@@ -458,21 +456,25 @@ TRANSITION_NAMES = {
 }
 
 
-REVERSE_CHARSET = {x: ord(bytes([x]).decode('cp850')) for x in range(256)}
-REVERSE_CHARSET[0xA7] = ord('✈')
-REVERSE_CHARSET[0xAE] = ord('←')
-REVERSE_CHARSET[0xAF] = ord('→')
-REVERSE_CHARSET[0xB0] = ord('º')
-CHARSET = {c: i for i, c in REVERSE_CHARSET.items()}
+@cache
+def charset_tables() -> tuple[dict[int, int], dict[int, int]]:
+	# built on first use of the codec, not at import
+	reverse_charset = {x: ord(bytes([x]).decode('cp850')) for x in range(256)}
+	reverse_charset[0xA7] = ord('✈')
+	reverse_charset[0xAE] = ord('←')
+	reverse_charset[0xAF] = ord('→')
+	reverse_charset[0xB0] = ord('º')
+	charset = {c: i for i, c in reverse_charset.items()}
+	return charset, reverse_charset
 
 class Focon850(Codec):
 	NAME = 'focon_train_cp850'
 
 	def encode(self, input: str, errors: str = 'strict') -> tuple[bytes, int]:
-		return charmap_encode(input, errors, CHARSET)
+		return charmap_encode(input, errors, charset_tables()[0])
 
 	def decode(self, input: bytes, errors: str = 'strict') -> tuple[str, int]:
-		return charmap_decode(input, errors, REVERSE_CHARSET)
+		return charmap_decode(input, errors, charset_tables()[1])
 
 	@classmethod
 	def lookup(cls, name: str) -> CodecInfo | None:
@@ -490,7 +492,7 @@ class FoconDisplayOutputSelector(Enum):
 	SingleArea = 2
 
 @dataclass
-class FoconDisplayHideSpecification:
+class FoconDisplayHideSpecification(FoconStruct):
 	mode: FoconDisplayOutputSelector
 	output_id: int
 	x_start: int = 0
@@ -498,73 +500,109 @@ class FoconDisplayHideSpecification:
 	y_start: int = 0
 	y_end: int = 0
 
-	def pack(self) -> bytes:
-		b = b''
-
-		b += bytes([
-			self.mode.value,
-			self.output_id,
-		])
-		b += pack('>HH', self.x_start, self.x_end)
-		b += pack('>HH', self.y_start, self.y_end)
-
-		return b
-
-	@classmethod
-	def unpack(cls, data: bytes) -> 'FoconDisplayHideSpecification':
-		return cls(
-			mode=FoconDisplayOutputSelector(data[0]),
-			output_id=data[1],
-			x_start=unpack('>H', data[2:4]),
-			x_end=unpack('>H', data[4:6]),
-			y_start=unpack('>H', data[6:8]),
-			y_end=unpack('>H', data[8:10]),
-		)
+	LAYOUT = Layout([
+		('mode', EnumField(FoconDisplayOutputSelector)),
+		('output_id', U8),
+		('x_start', U16),
+		('x_end', U16),
+		('y_start', U16),
+		('y_end', U16),
+	])
+
+def plan_clear(config: FoconDisplayConfiguration, output_ids: Optional[List[int]] = None, x: Optional[Tuple[int, int] | int] = None, y: Optional[Tuple[int, int] | int] = None) -> List[FoconDisplayHideSpecification]:
+	if x is not None and y is None:
+		y = (config.y_start, config.y_end)
+	if y is not None and x is None:
+		x = (config.x_start, config.x_end)
+	if isinstance(x, int):
+		x = (x, config.x_end)
+	if isinstance(y, int):
+		y = (y, config.y_end)
+
+	outputs = {output.index: output for output in config.outputs}
+	all_ids = sorted(outputs)
+	if output_ids is None:
+		requested = all_ids
+	else:
+		requested = sorted(set(output_ids))
+		unknown = [i for i in requested if i not in outputs]
+		if unknown:
+			raise ValueError(f'unknown output ID(s): {unknown}')
+
+	if x is not None and y is not None:
+		full_ids = []
+		specs = []
+		for output_id in requested:
+			(ox_start, ox_end), (oy_start, oy_end) = config.area_of(outputs[output_id])
+			ax = (max(x[0], ox_start), min(x[1], ox_end))
+			ay = (max(y[0], oy_start), min(y[1], oy_end))
+			if ax[0] > ax[1] or ay[0] > ay[1]:
+				continue
+			if (ax, ay) == ((ox_start, ox_end), (oy_start, oy_end)):
+				# areas covering an output completely can be merged with other whole-output clears
+				full_ids.append(output_id)
+				continue
+			specs.append(FoconDisplayHideSpecification(
+				mode=FoconDisplayOutputSelector.SingleArea,
+				output_id=output_id,
+				x_start=ax[0],
+				x_end=ax[1],
+				y_start=ay[0],
+				y_end=ay[1],
+			))
+		if requested and not full_ids and not specs:
+			raise ValueError(f'area x={x}, y={y} lies outside of output(s): {requested}')
+		return (plan_clear(config, full_ids) if full_ids else []) + specs
+
+	if not requested:
+		return []
+	if requested == all_ids:
+		return [FoconDisplayHideSpecification(mode=FoconDisplayOutputSelector.AllFrom, output_id=0)]
+
+	# the longest run of requested outputs up to the last one can be cleared with a single AllFrom
+	suffix_start = len(all_ids)
+	while suffix_start > 0 and all_ids[suffix_start - 1] in requested:
+		suffix_start -= 1
+	suffix = all_ids[suffix_start:] if len(all_ids) - suffix_start > 1 else []
+
+	specs = [
+		FoconDisplayHideSpecification(mode=FoconDisplayOutputSelector.Single, output_id=output_id)
+		for output_id in requested if output_id not in suffix
+	]
+	if suffix:
+		specs.append(FoconDisplayHideSpecification(mode=FoconDisplayOutputSelector.AllFrom, output_id=suffix[0]))
+	return specs
 
 @dataclass
-class FoconDisplayDrawList:
+class FoconDisplayDrawList(FoconStruct):
 	ids: List[int]
 
-	def pack(self) -> bytes:
-		return bytes([len(self.ids)] + self.ids)
-
-	@classmethod
-	def unpack(cls, data: bytes) -> 'FoconDisplayDrawList':
-		num_objects = data[0]
-		return cls(ids=[int(x) for x in data[1:1 + num_objects]])
+	LAYOUT = Layout([
+		('ids', CountedTail(U8)),
+	])
 
 @dataclass
-class FoconDisplayRedrawSpecification:
+class FoconDisplayRedrawSpecification(FoconStruct):
 	composition: FoconDisplayDrawComposition
 	objects: FoconDisplayDrawList
 
-	def pack(self) -> bytes:
-		return bytes([ord(self.composition.value)]) + self.objects.pack()
-
-	@classmethod
-	def unpack(cls, data: bytes) -> 'FoconDisplayRedrawSpecification':
-		return cls(
-			composition=FoconDisplayDrawComposition(data[0]),
-			objects=FoconDisplayDrawList.unpack(data[1:]),
-		)
+	LAYOUT = Layout([
+		('composition', CharEnum(FoconDisplayDrawComposition)),
+		('objects', NestedTail(FoconDisplayDrawList.LAYOUT)),
+	])
 
 @dataclass
-class FoconDisplayUndrawSpecification:
+class FoconDisplayUndrawSpecification(FoconStruct):
 	update: bool
 	objects: FoconDisplayDrawList
 
-	def pack(self) -> bytes:
-		return bytes([1 if self.update else 0]) + self.objects.pack()
-
-	@classmethod
-	def unpack(cls, data: bytes) -> 'FoconDisplayRedrawSpecification':
-		return cls(
-			update=bool(data[0]),
-			objects=FoconDisplayDrawList.unpack(data[1:]),
-		)
+	LAYOUT = Layout([
+		('update', Bool),
+		('objects', NestedTail(FoconDisplayDrawList.LAYOUT)),
+	])
 
 @dataclass
-class FoconDisplayDrawSpec:
+class FoconDisplayDrawSpec(FoconStruct):
 	object_id:     int
 	output_id:     int
 	composition:   FoconDisplayDrawComposition
@@ -578,101 +616,186 @@ class FoconDisplayDrawSpec:
 	duration_duty: int = 50
 	pwm_cycle:     int = 0
 
-	def pack(self) -> bytes:
-		return (bytes([self.object_id, ord(self.composition.value)]) +
-		        pack('>HHHH', self.x_start, self.y_start, self.x_end, self.y_end) +
-		        bytes([ord(self.transition.value), self.count, self.output_id, self.duration, self.duration_duty, self.pwm_cycle]))
-
-	@classmethod
-	def unpack(cls, data: bytes) -> 'FoconDisplayDrawSpec':
-		x_start, y_start, x_end, y_end = unpack('>HHHH', data[2:10])
-		return cls(
-			object_id=data[0],
-			composition=FoconDisplayDrawComposition(chr(data[1])),
-			x_start=x_start,
-			y_start=y_start,
-			x_end=x_end,
-			y_end=y_end,
-			transition=FoconDisplayDrawTransition(chr(data[10])),
-			count=data[11],
-			output_id=data[12],
-			duration=data[13],
-			duration_duty=data[14],
-			pwm_cycle=data[15],
-		)
+	LAYOUT = Layout([
+		# 0x00..0x02
+		('object_id', U8),
+		('composition', CharEnum(FoconDisplayDrawComposition)),
+		# 0x02..0x0A
+		('x_start', U16),
+		('y_start', U16),
+		('x_end', U16),
+		('y_end', U16),
+		# 0x0A..0x10
+		('transition', CharEnum(FoconDisplayDrawTransition)),
+		('count', U8),
+		('output_id', U8),
+		('duration', U8),
+		('duration_duty', U8),
+		('pwm_cycle', U8),
+	])
+
+Alignment = Field('B', encode=lambda a: a.pack()[0], decode=lambda v: FoconDisplayAlignment.unpack(bytes([v])))
 
 @dataclass
-class FoconDisplayTextObject:
+class FoconDisplayTextObject(FoconStruct):
 	spec: FoconDisplayDrawSpec
 	text: str
 	font_size: int = 16
 	alignment: FoconDisplayAlignment = FoconDisplayAlignment()
 
-	def pack(self) -> bytes:
-		b = self.spec.pack()
-		b += self.alignment.pack()
-		b += bytes([self.font_size])
-		b += self.text.encode(Focon850.NAME) + b'\x00'
-		return b
-
-	@classmethod
-	def unpack(cls, data: bytes) -> 'FoconDisplayTextObject':
-		return cls(
-			spec=FoconDisplayDrawSpec.unpack(data[:16]),
-			alignment=FoconDisplayAlignment.unpack(data[16:17]),
-			font_size=data[17],
-			text=data[18:].rstrip(b'\x00').decode(Focon850.NAME),
-		)
-
-def round_up(x, a):
-	return x + (a - (x % a)) % a
+	LAYOUT = Layout([
+		# 0x00..0x10
+		('spec', Nested(FoconDisplayDrawSpec.LAYOUT)),
+		# 0x10..0x12
+		('alignment', Alignment),
+		('font_size', U8),
+		# 0x12..
+		('text', Tail(
+			encode=lambda text: text.encode(Focon850.NAME) + b'\x00',
+			decode=lambda data: data.rstrip(b'\x00').decode(Focon850.NAME),
+		)),
+	])
 
 @dataclass
-class FoconDisplayPixelObject:
+class FoconDisplayPixelObject(FoconStruct):
 	spec: FoconDisplayDrawSpec
 	height: int
 	values: List[List[bool]]
 
+	LAYOUT = Layout([
+		# 0x00..0x10
+		('spec', Nested(FoconDisplayDrawSpec.LAYOUT)),
+		# 0x10..0x14
+		('_width', U16),
+		('height', U16),
+		# 0x14..
+		('_data', Tail()),
+	],
+		encode_hook=lambda obj: {'_width': obj.width, '_data': FoconBitmap.from_values(obj.values, obj.height).data},
+		decode_hook=lambda values: dict(values,
+			values=FoconBitmap(width=values['_width'], height=values['height'], data=values['_data']).to_values(),
+		),
+	)
+
 	@property
 	def width(self) -> int:
 		return len(self.values)
 
-	def pack(self) -> bytes:
-		b = bytearray(self.spec.pack())
-		b.extend(pack('>HH', self.width, self.height))
-		for col in self.values:
-			nrows = round_up(self.height, 16)
-			for row in range(0, nrows - 1, 8):
-				x = 0
-				for i in range(8):
-					if row + i < len(col):
-						x |= col[row + i] << (7 - i)
-					else:
-						break
-				b.append(x)
-		return b
+@dataclass
+class FoconDisplayBitmapObject(FoconStruct):
+	spec: FoconDisplayDrawSpec
+	bitmap: FoconBitmap
+
+	LAYOUT = Layout([
+		# 0x00..0x10
+		('spec', Nested(FoconDisplayDrawSpec.LAYOUT)),
+		# 0x10..0x14
+		('_width', U16),
+		('_height', U16),
+		# 0x14..
+		('_data', Tail()),
+	],
+		encode_hook=lambda obj: {'_width': obj.bitmap.width, '_height': obj.bitmap.height, '_data': obj.bitmap.data},
+		decode_hook=lambda values: dict(values,
+			bitmap=FoconBitmap(width=values['_width'], height=values['_height'], data=values['_data']),
+		),
+	)
 
-	@classmethod
-	def unpack(cls, data: bytes) -> 'FoconDisplayTextObject':
-		return cls(
-			spec=FoconDisplayDrawSpec.unpack(data[:16]),
-			width=unpack('>H', data[16:18]),
-			height=unpack('>H', data[18:20]),
-			values=[bool(x) for x in data[20:]],
-		)
+	@property
+	def size(self) -> int:
+		return self.LAYOUT.size + len(self.bitmap.data)
+
+ANONYMOUS_OBJECT_ID = 0xFF
+# message header + frame preamble, header, checksum and postamble
+COMMAND_OVERHEAD = 10 + 13
+CLEAR_SIZE = 10
+MAX_DRAW_PARTS = 4
+
+FoconDisplayDrawOperation = FoconDisplayHideSpecification | FoconDisplayBitmapObject
+
+def draw_cost(ops: List[FoconDisplayDrawOperation]) -> int:
+	return sum(COMMAND_OVERHEAD + (op.size if isinstance(op, FoconDisplayBitmapObject) else CLEAR_SIZE) for op in ops)
+
+def crop_object(bitmap: FoconBitmap, spec: FoconDisplayDrawSpec, x_start: int, x_end: int) -> FoconDisplayBitmapObject | None:
+	part = bitmap.crop(x_start, 0, x_end, bitmap.height - 1)
+	bbox = part.bbox()
+	if bbox is None:
+		return None
+	bx0, by0, bx1, by1 = bbox
+	return FoconDisplayBitmapObject(
+		spec=replace(spec,
+			x_start=spec.x_start + x_start + bx0,
+			y_start=spec.y_start + by0,
+			x_end=spec.x_start + x_start + bx1,
+			y_end=spec.y_start + by1,
+		),
+		bitmap=part.crop(bx0, by0, bx1, by1),
+	)
+
+def split_columns(bitmap: FoconBitmap, max_parts: int) -> List[tuple[int, int]]:
+	# Runs of occupied columns, merged over any gap that is cheaper to send than a new object
+	runs: List[List[int]] = []
+	for x, occupied in enumerate(bitmap.occupied_columns()):
+		if not occupied:
+			continue
+		if runs and (x - runs[-1][1] - 1) * bitmap.stride <= COMMAND_OVERHEAD + 20:
+			runs[-1][1] = x
+		else:
+			runs.append([x, x])
+	while len(runs) > max_parts:
+		i = min(range(len(runs) - 1), key=lambda i: runs[i + 1][0] - runs[i][1])
+		runs[i:i + 2] = [[runs[i][0], runs[i + 1][1]]]
+	return [(start, end) for start, end in runs]
+
+def plan_pixels(bitmap: FoconBitmap, spec: FoconDisplayDrawSpec, max_parts: int = MAX_DRAW_PARTS) -> List[FoconDisplayDrawOperation]:
+	full: List[FoconDisplayDrawOperation] = [FoconDisplayBitmapObject(spec, bitmap)]
+	if spec.transition != FoconDisplayDrawTransition.Appear:
+		return full
+
+	anonymous = spec.object_id == ANONYMOUS_OBJECT_ID
+	additive = spec.composition == FoconDisplayDrawComposition.Add
+	if not anonymous and not additive:
+		# named objects need to keep their full area to be redrawn or undrawn later on
+		return full
+
+	area = FoconDisplayHideSpecification(
+		mode=FoconDisplayOutputSelector.SingleArea,
+		output_id=spec.output_id,
+		x_start=spec.x_start,
+		x_end=spec.x_end,
+		y_start=spec.y_start,
+		y_end=spec.y_end,
+	)
+	prefix: List[FoconDisplayDrawOperation] = [] if additive else [area]
+
+	if bitmap.is_empty():
+		if not anonymous:
+			return full
+		return prefix
+
+	cropped = crop_object(bitmap, spec, 0, bitmap.width - 1)
+	assert cropped is not None
+	candidates = [full, prefix + [cropped]]
+	if anonymous:
+		parts = [crop_object(bitmap, spec, start, end) for start, end in split_columns(bitmap, max_parts)]
+		candidates.append(prefix + [p for p in parts if p])
+	return min(candidates, key=draw_cost)
 
 
 @dataclass
-class FoconDisplayDrawStatus:
+class FoconDisplayDrawStatus(FoconStruct):
 	object_id: int
 	status:    int
 
-	def pack(self) -> bytes:
-		return bytes([self.object_id, self.status])
+	LAYOUT = Layout([
+		('object_id', U8),
+		('status', U8),
+	])
 
-	@classmethod
-	def unpack(cls, data: bytes) -> 'FoconDisplayDrawStatus':
-		return cls(object_id=data[0], status=data[1])
+	@property
+	def accepted(self) -> bool:
+		# any non-zero status is taken as the display refusing the object
+		return self.status == 0
 
 
 class FoconDisplay:
@@ -682,6 +805,8 @@ class FoconDisplay:
 	def __init__(self, device: FoconDevice) -> None:
 		self.device = device
 		self.current_config = None
+		# told about every command that went through
+		self.journal: 'FoconDisplayJournal | None' = None
 
 	def get_current_config(self) -> FoconDisplayConfiguration:
 		if not self.current_config:
@@ -692,7 +817,25 @@ class FoconDisplay:
 		self.current_config = config
 
 	def send_command(self, command: FoconDisplayCommand, payload: bytes = b'') -> bytes:
-		return self.device.send_command(command.value, payload=payload)
+		if not self.journal:
+			return self.device.send_command(command.value, payload=payload)
+		# recorded in the order it went over the bus, and not while the journal is being replayed
+		with self.device.bus.lock:
+			reply = self.device.send_command(command.value, payload=payload)
+			self.journal.record(command, payload)
+		return reply
+
+	def send_commands(self, commands: List[tuple[FoconDisplayCommand, bytes]], window: int | None = None) -> List[bytes]:
+		if not self.journal:
+			return self.device.send_commands([(command.value, payload) for command, payload in commands], window=window)
+		with self.device.bus.lock:
+			replies = self.device.send_commands([(command.value, payload) for command, payload in commands], window=window)
+			for command, payload in commands:
+				self.journal.record(command, payload)
+		return replies
+
+	def batch(self) -> 'FoconDisplayBatch':
+		return FoconDisplayBatch(self)
 
 
 	## Commands
@@ -740,64 +883,40 @@ class FoconDisplay:
 		self.send_command(FoconDisplayCommand.SetUnk47, bytes([p1, p2]))
 
 	# 0048
+	def hide_specs(self, output_ids: Optional[List[int]] = None, x: Optional[Tuple[int, int]] = None, y: Optional[Tuple[int, int]] = None) -> List[FoconDisplayHideSpecification]:
+		return plan_clear(self.get_current_config(), output_ids, x=x, y=y)
+
 	def hide(self, output_ids: Optional[List[int]] = None, x: Optional[Tuple[int, int]] = None, y: Optional[Tuple[int, int]] = None) -> None:
-		config = self.get_current_config()
-
-		if x is not None and y is None:
-			y = (config.y_start, config.y_end)
-		if y is not None and x is None:
-			x = (config.x_start, config.x_end)
-		if x is not None and isinstance(x, int):
-			x = (x, config.x_end)
-		if y is not None and isinstance(y, int):
-			y = (y, config.y_end)
-
-		if output_ids is None and x is None and y is None:
-			spec = FoconDisplayHideSpecification(
-				mode=FoconDisplayOutputSelector.AllFrom,
-				output_id=0,
-			)
-			self.send_command(FoconDisplayCommand.Clear, spec.pack())
-		else:
-			range_ids = []
-			for i in range(len(config.outputs)):
-				range_ids.append(i + 1)
-				if output_ids is None or i not in output_ids or x or y:
-					for output_id in range_ids:
-						if x and y:
-							spec = FoconDisplayHideSpecification(
-								mode=FoconDisplayOutputSelector.SingleArea,
-								output_id=output_id,
-								x_start=x[0],
-								x_end=x[1],
-								y_start=y[0],
-								y_end=y[1],
-							)
-						else:
-							spec = FoconDisplayHideSpecification(
-								mode=FoconDisplayOutputSelector.Single,
-								output_id=output_id,
-							)
-						self.send_command(FoconDisplayCommand.Clear, spec.pack())
-					range_ids = []
-			if range_ids:
-				spec = FoconDisplayHideSpecification(
-					mode=FoconDisplayOutputSelector.AllFrom,
-					output_ids=range_ids[0]
-				)
-				self.send_command(FoconDisplayCommand.Clear, spec.pack())
+		specs = self.hide_specs(output_ids, x=x, y=y)
+		self.send_commands([(FoconDisplayCommand.Clear, spec.pack()) for spec in specs])
 
 	# 0049
-	def draw(self, values: List[int], height: int, spec: FoconDisplayDrawSpec) -> FoconDisplayDrawStatus:
-		obj = FoconDisplayPixelObject(spec, height, values)
-		response = self.send_command(FoconDisplayCommand.DrawPixels, obj.pack())
-		return FoconDisplayDrawStatus.unpack(response)
-
-	def fill(self, spec: FoconDisplayDrawSpec, on: bool = True) -> FoconDisplayDrawStatus:
+	def draw(self, values: List[List[bool]], height: int, spec: FoconDisplayDrawSpec, optimize: bool = True) -> FoconDisplayDrawStatus | None:
+		# values are columns of pixels from the top, see draw_bitmap for the status
+		return self.draw_bitmap(FoconBitmap.from_values(values, height), spec, optimize=optimize)
+
+	def draw_bitmap(self, bitmap: FoconBitmap, spec: FoconDisplayDrawSpec, optimize: bool = True) -> FoconDisplayDrawStatus | None:
+		# Returns the status of the last DrawPixels sent. A blank anonymous area is only cleared, there is no
+		# object to report on then and None is returned: callers reading `.status` have to check for that.
+		if optimize:
+			ops = plan_pixels(bitmap, spec)
+		else:
+			ops = [FoconDisplayBitmapObject(spec, bitmap)]
+
+		status = None
+		for op in ops:
+			if isinstance(op, FoconDisplayHideSpecification):
+				self.send_command(FoconDisplayCommand.Clear, op.pack())
+			else:
+				response = self.send_command(FoconDisplayCommand.DrawPixels, op.pack())
+				status = FoconDisplayDrawStatus.unpack(response)
+		return status
+
+	def fill(self, spec: FoconDisplayDrawSpec, on: bool = True, optimize: bool = True) -> FoconDisplayDrawStatus | None:
 		width = spec.x_end - spec.x_start + 1
 		height = spec.y_end - spec.y_start + 1
-		values = [[on] * height] * width
-		return self.draw(values, height, spec)
+		bitmap = FoconBitmap.filled(width, height) if on else FoconBitmap.blank(width, height)
+		return self.draw_bitmap(bitmap, spec, optimize=optimize)
 
 	# 004A
 	def print(self, message: str, spec: FoconDisplayDrawSpec, alignment: FoconDisplayAlignment | None = None, font_size: int | None = None) -> FoconDisplayDrawStatus:
@@ -806,10 +925,10 @@ class FoconDisplay:
 		return FoconDisplayDrawStatus.unpack(response)
 
 	# 004C
-	def undraw(self, object_ids: List[int], update_screen: bool = True) -> None:
+	def undraw(self, object_ids: List[int], update_screen: bool = True) -> FoconDisplayDrawList:
 		spec = FoconDisplayUndrawSpecification(
 			update=update_screen,
-			objects=FoconDisplayDrawList(object_ids),
+			objects=FoconDisplayDrawList(list(object_ids)),
 		)
 		response = self.send_command(FoconDisplayCommand.Undraw, spec.pack())
 		return FoconDisplayDrawList.unpack(response)
@@ -818,11 +937,17 @@ class FoconDisplay:
 	def redraw(self, object_ids: List[int], composition: FoconDisplayDrawComposition = None) -> FoconDisplayDrawList:
 		spec = FoconDisplayRedrawSpecification(
 			composition=composition or FoconDisplayDrawTransition.Appear,
-			objects=FoconDisplayDrawList(object_ids),
+			objects=FoconDisplayDrawList(list(object_ids)),
 		)
 		response = self.send_command(FoconDisplayCommand.Redraw, spec.pack())
 		return FoconDisplayDrawList.unpack(response)
 
+	# 004E
+	@dangerous
+	def get_asset_font(self, index: int) -> bytes:
+		# the request layout is assumed to follow SelfTest and Dump, it has not been confirmed on a device
+		return self.send_command(FoconDisplayCommand.GetAssetFont, bytes([index, 0x00]))
+
 	# 004F
 	def get_asset_data(self) -> FoconDisplayAssetData:
 		response = self.send_command(FoconDisplayCommand.GetAssetData)
@@ -856,11 +981,11 @@ class FoconDisplay:
 		for msg in self.device.recv_messages(cmd=FoconDisplayCommand.Dump.value):
 			yield self.parse_dump_response(type, msg.value)
 
-	def get_memory_stats(self) -> str:
-		return self.dump(FoconDisplayDumpType.MemoryStats)
+	def get_memory_stats(self) -> FoconDisplayMemoryStats:
+		return FoconDisplayMemoryStats.parse(self.dump(FoconDisplayDumpType.MemoryStats))
 
-	def get_network_stats(self) -> str:
-		return self.dump(FoconDisplayDumpType.NetworkStats)
+	def get_network_stats(self) -> FoconDisplayNetworkStats:
+		return FoconDisplayNetworkStats.parse(self.dump(FoconDisplayDumpType.NetworkStats))
 
 	def get_task_stats(self) -> Iterator[str]:
 		self.dump(FoconDisplayDumpType.TaskStats)
@@ -868,3 +993,159 @@ class FoconDisplay:
 
 	def get_sensor_stats(self) -> str:
 		return self.dump(FoconDisplayDumpType.EnvironmentBrightness)
+
+
+FoconDisplayBatchSpec = FoconDisplayHideSpecification | FoconDisplayBitmapObject | FoconDisplayTextObject | FoconDisplayUndrawSpecification | FoconDisplayRedrawSpecification
+
+@dataclass
+class FoconDisplayBatchOperation:
+	call:    int
+	command: FoconDisplayCommand
+	spec:    FoconDisplayBatchSpec
+
+	@property
+	def draw_spec(self) -> FoconDisplayDrawSpec | None:
+		if isinstance(self.spec, (FoconDisplayBitmapObject, FoconDisplayTextObject)):
+			return self.spec.spec
+		return None
+
+	@property
+	def drawn_id(self) -> int | None:
+		spec = self.draw_spec
+		return spec.object_id if spec else None
+
+	@property
+	def referenced_ids(self) -> List[int]:
+		if isinstance(self.spec, (FoconDisplayUndrawSpecification, FoconDisplayRedrawSpecification)):
+			return self.spec.objects.ids
+		return []
+
+	def parse_response(self, response: bytes) -> FoconDisplayDrawStatus | FoconDisplayDrawList | None:
+		if self.command in (FoconDisplayCommand.DrawPixels, FoconDisplayCommand.DrawString):
+			return FoconDisplayDrawStatus.unpack(response)
+		if self.command in (FoconDisplayCommand.Undraw, FoconDisplayCommand.Redraw):
+			return FoconDisplayDrawList.unpack(response)
+		return None
+
+class FoconDisplayBatch:
+	def __init__(self, display: FoconDisplay, window: int | None = None) -> None:
+		self.display = display
+		self.window = window
+		self.operations: List[FoconDisplayBatchOperation] = []
+		self.calls = 0
+		self.results: List[FoconDisplayDrawStatus | FoconDisplayDrawList | None] = []
+
+	def __enter__(self) -> 'FoconDisplayBatch':
+		return self
+
+	def __exit__(self, exc_type: object, exc: object, tb: object) -> None:
+		if exc_type is None:
+			self.commit()
+
+	def add(self, command: FoconDisplayCommand, spec: FoconDisplayBatchSpec) -> int:
+		self.operations.append(FoconDisplayBatchOperation(call=self.calls, command=command, spec=spec))
+		return self.add_call()
+
+	def add_call(self) -> int:
+		self.calls += 1
+		return self.calls - 1
+
+	## Operations, mirroring FoconDisplay
+
+	def hide(self, output_ids: Optional[List[int]] = None, x: Optional[Tuple[int, int]] = None, y: Optional[Tuple[int, int]] = None) -> int:
+		call = self.calls
+		for spec in self.display.hide_specs(output_ids, x=x, y=y):
+			self.operations.append(FoconDisplayBatchOperation(call=call, command=FoconDisplayCommand.Clear, spec=spec))
+		return self.add_call()
+
+	def draw(self, values: List[List[bool]], height: int, spec: FoconDisplayDrawSpec, optimize: bool = True) -> int:
+		return self.draw_bitmap(FoconBitmap.from_values(values, height), spec, optimize=optimize)
+
+	def draw_bitmap(self, bitmap: FoconBitmap, spec: FoconDisplayDrawSpec, optimize: bool = True) -> int:
+		call = self.calls
+		ops = plan_pixels(bitmap, spec) if optimize else [FoconDisplayBitmapObject(spec, bitmap)]
+		for op in ops:
+			command = FoconDisplayCommand.Clear if isinstance(op, FoconDisplayHideSpecification) else FoconDisplayCommand.DrawPixels
+			self.operations.append(FoconDisplayBatchOperation(call=call, command=command, spec=op))
+		return self.add_call()
+
+	def fill(self, spec: FoconDisplayDrawSpec, on: bool = True, optimize: bool = True) -> int:
+		width = spec.x_end - spec.x_start + 1
+		height = spec.y_end - spec.y_start + 1
+		bitmap = FoconBitmap.filled(width, height) if on else FoconBitmap.blank(width, height)
+		return self.draw_bitmap(bitmap, spec, optimize=optimize)
+
+	def print(self, message: str, spec: FoconDisplayDrawSpec, alignment: FoconDisplayAlignment | None = None, font_size: int | None = None) -> int:
+		obj = FoconDisplayTextObject(spec, message, alignment=alignment or FoconDisplayAlignment(), font_size=font_size or 16)
+		return self.add(FoconDisplayCommand.DrawString, obj)
+
+	def undraw(self, object_ids: List[int], update_screen: bool = True) -> int:
+		spec = FoconDisplayUndrawSpecification(
+			update=update_screen,
+			objects=FoconDisplayDrawList(list(object_ids)),
+		)
+		return self.add(FoconDisplayCommand.Undraw, spec)
+
+	def redraw(self, object_ids: List[int], composition: FoconDisplayDrawComposition | None = None) -> int:
+		spec = FoconDisplayRedrawSpecification(
+			composition=composition or FoconDisplayDrawComposition.Add,
+			objects=FoconDisplayDrawList(list(object_ids)),
+		)
+		return self.add(FoconDisplayCommand.Redraw, spec)
+
+	## Submission
+
+	def collapse(self) -> List[FoconDisplayBatchOperation]:
+		ops = self.operations
+		keep = [True] * len(ops)
+		# operations that touched a given object ID, oldest first
+		touched: dict[int, List[int]] = {}
+
+		for i, op in enumerate(ops):
+			draw_spec = op.draw_spec
+			if draw_spec is not None:
+				if draw_spec.object_id == ANONYMOUS_OBJECT_ID:
+					continue
+				history = touched.setdefault(draw_spec.object_id, [])
+				for j in reversed(history):
+					earlier = ops[j].draw_spec
+					if earlier is None:
+						break
+					if earlier.output_id == draw_spec.output_id:
+						# last writer wins
+						keep[j] = False
+						history.remove(j)
+						break
+				history.append(i)
+				continue
+
+			if op.command not in (FoconDisplayCommand.Undraw, FoconDisplayCommand.Redraw):
+				continue
+			if not op.referenced_ids:
+				keep[i] = False
+				continue
+			if ANONYMOUS_OBJECT_ID in op.referenced_ids:
+				touched.clear()
+				continue
+			# only an undraw that updates the screen makes earlier draws invisible, without it their pixels stay up
+			drops = isinstance(op.spec, FoconDisplayUndrawSpecification) and op.spec.update
+			for object_id in op.referenced_ids:
+				history = touched.setdefault(object_id, [])
+				while drops and history and ops[history[-1]].draw_spec is not None:
+					keep[history.pop()] = False
+				history.append(i)
+
+		return [op for op, k in zip(ops, keep) if k]
+
+	def commit(self) -> List[FoconDisplayDrawStatus | FoconDisplayDrawList | None]:
+		ops = self.collapse()
+		responses = self.display.send_commands([(op.command, op.spec.pack()) for op in ops], window=self.window)
+
+		self.results = [None] * self.calls
+		for op, response in zip(ops, responses):
+			result = op.parse_response(response)
+			if result is not None:
+				self.results[op.call] = result
+		self.operations = []
+		self.calls = 0
+		return self.results
@@ -0,0 +1,103 @@
+from typing import Any, Callable
+from logging import getLogger
+
+LOG = getLogger(__name__)
+
+
+class FoconDirectionControl:
+	# Switches a half-duplex RS-485 transceiver between driving the bus and listening to it.
+	# The line state is tracked, so the hardware is only touched on actual TX/RX transitions.
+	# whether RTS is the direction line, which rules out RTS/CTS flow control
+	uses_rts = False
+
+	def __init__(self) -> None:
+		self.serial: Any = None
+		# None until the line state is known
+		self.transmitting: bool | None = None
+		self.switches = 0
+
+	def attach(self, serial: Any) -> None:
+		self.serial = serial
+		self.transmitting = None
+		self.receive()
+
+	def transmit(self) -> None:
+		if self.transmitting is not True:
+			self.set_transmit()
+			self.transmitting = True
+			self.switches += 1
+
+	def receive(self) -> None:
+		if self.transmitting is not False:
+			self.set_receive()
+			self.transmitting = False
+			self.switches += 1
+
+	def set_transmit(self) -> None:
+		pass
+
+	def set_receive(self) -> None:
+		pass
+
+	def drain(self) -> None:
+		# the tail of the last frame is still in the UART, don't cut it off by releasing the line early
+		if self.transmitting and self.serial is not None:
+			self.serial.flush()
+
+class FoconRTSDirectionControl(FoconDirectionControl):
+	uses_rts = True
+
+	def __init__(self, tx_level: bool = True) -> None:
+		super().__init__()
+		self.tx_level = tx_level
+
+	def set_transmit(self) -> None:
+		self.serial.rts = self.tx_level
+
+	def set_receive(self) -> None:
+		self.drain()
+		self.serial.rts = not self.tx_level
+
+class FoconKernelDirectionControl(FoconDirectionControl):
+	# Let the kernel driver toggle RTS around every transmission (TIOCSRS485 on Linux)
+	uses_rts = True
+
+	def __init__(self, tx_level: bool = True, delay_before_tx: float | None = None, delay_before_rx: float | None = None) -> None:
+		super().__init__()
+		self.tx_level = tx_level
+		self.delay_before_tx = delay_before_tx
+		self.delay_before_rx = delay_before_rx
+
+	def attach(self, serial: Any) -> None:
+		from serial.rs485 import RS485Settings
+
+		serial.rs485_mode = RS485Settings(
+			rts_level_for_tx=self.tx_level, rts_level_for_rx=not self.tx_level,
+			delay_before_tx=self.delay_before_tx, delay_before_rx=self.delay_before_rx,
+		)
+		super().attach(serial)
+
+class FoconCallbackDirectionControl(FoconDirectionControl):
+	# Hand the line state to user code, e.g. to drive a GPIO pin
+	def __init__(self, callback: Callable[[bool], None]) -> None:
+		super().__init__()
+		self.callback = callback
+
+	def set_transmit(self) -> None:
+		self.callback(True)
+
+	def set_receive(self) -> None:
+		self.drain()
+		self.callback(False)
+
+DIRECTION_CONTROLS: dict[str, Callable[[], FoconDirectionControl]] = {
+	'none': FoconDirectionControl,
+	'rts': FoconRTSDirectionControl,
+	'rts-inverted': lambda: FoconRTSDirectionControl(tx_level=False),
+	'rs485': FoconKernelDirectionControl,
+}
+
+def make_direction_control(name: str) -> FoconDirectionControl:
+	if name not in DIRECTION_CONTROLS:
+		raise ValueError(f'unknown direction control: {name}')
+	return DIRECTION_CONTROLS[name]()
@@ -0,0 +1,102 @@
+from typing import Callable, Hashable
+from logging import getLogger
+
+import os
+
+from .text import FoconGlyph, FoconTextLayout
+from .devices.display import (
+	FoconDisplay, FoconDisplayAssetData, FoconDisplayDrawSpec, FoconDisplayAlignment,
+	FoconDisplayTextObject, FoconDisplayBitmapObject, FoconDisplayDrawStatus, FoconDisplayCommand,
+	Focon850, plan_pixels, draw_cost, COMMAND_OVERHEAD,
+)
+
+LOG = getLogger(__name__)
+
+
+def default_cache_dir() -> str:
+	base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+	return os.path.join(base, 'foconutil', 'fonts')
+
+class FoconDeviceFontCache:
+	def __init__(self, directory: str | None = None) -> None:
+		self.directory = directory or default_cache_dir()
+
+	def path_of(self, asset: FoconDisplayAssetData, index: int) -> str:
+		version = '{}.{:02}'.format(*asset.version)
+		return os.path.join(self.directory, f'{asset.part_id}-{version}', f'font{index}.bin')
+
+	def load(self, display: FoconDisplay, index: int, asset: FoconDisplayAssetData | None = None) -> bytes:
+		asset = asset or display.get_asset_data()
+		if index >= asset.font_count:
+			raise ValueError(f'font {index} does not exist, asset data {asset.part_id} has {asset.font_count} font(s)')
+
+		path = self.path_of(asset, index)
+		try:
+			with open(path, 'rb') as f:
+				return f.read()
+		except FileNotFoundError:
+			pass
+
+		LOG.info('downloading font %d of asset data %s', index, asset.part_id)
+		data = display.get_asset_font(index)
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		with open(path + '.tmp', 'wb') as f:
+			f.write(data)
+		os.replace(path + '.tmp', path)
+		return data
+
+FoconDeviceFontDecoder = Callable[[bytes], dict[str, FoconGlyph]]
+
+class FoconDeviceFont:
+	# Glyph source shaped like FoconFont, backed by glyphs decoded from a device font dump.
+	# The GetAssetFont reply layout is not documented and no decoder ships with foconutil: the cache only keeps the
+	# raw dumps around for one to be written against. Until then, text layout can only approximate the device with
+	# a host font, and nothing here predicts DrawString output exactly.
+	def __init__(self, key: Hashable, glyphs: dict[str, FoconGlyph]) -> None:
+		self._key = key
+		self.glyphs = glyphs
+
+	@classmethod
+	def decode(cls, asset: FoconDisplayAssetData, index: int, data: bytes, decoder: FoconDeviceFontDecoder) -> 'FoconDeviceFont':
+		return cls(key=(asset.part_id, asset.version, index), glyphs=decoder(data))
+
+	@property
+	def key(self) -> Hashable:
+		return self._key
+
+	def render_glyph(self, char: str) -> FoconGlyph:
+		try:
+			return self.glyphs[char]
+		except KeyError:
+			raise ValueError(f'character {char!r} not in device font') from None
+
+def encodable(text: str) -> bool:
+	try:
+		text.encode(Focon850.NAME)
+	except UnicodeEncodeError:
+		return False
+	return True
+
+def plan_text(text: str, spec: FoconDisplayDrawSpec, host: FoconTextLayout, device: FoconTextLayout | None = None, alignment: FoconDisplayAlignment = FoconDisplayAlignment(), font_size: int = 16) -> FoconDisplayTextObject | FoconDisplayBitmapObject:
+	# Prefer the device's own DrawString when it can render the text within the area and is cheaper on the wire.
+	# Without a layout for the device font, the host font stands in for it: text that does not fit with that
+	# is drawn as the host-rendered pixels, so at least what gets cut off is known. Nothing is asked of the
+	# device here: a device layout has to be built by the caller, see FoconDeviceFont.
+	string = FoconDisplayTextObject(spec, text, alignment=alignment, font_size=font_size)
+	pixels = FoconDisplayBitmapObject(spec, host.preview(text, spec, alignment))
+
+	usable = encodable(text)
+	if usable:
+		try:
+			usable = (device or host).fits(text, spec)
+		except ValueError:
+			usable = False
+	if usable and COMMAND_OVERHEAD + len(string.pack()) <= draw_cost(plan_pixels(pixels.bitmap, spec)):
+		return string
+	return pixels
+
+def draw_text(display: FoconDisplay, text: str, spec: FoconDisplayDrawSpec, host: FoconTextLayout, device: FoconTextLayout | None = None, alignment: FoconDisplayAlignment = FoconDisplayAlignment(), font_size: int = 16) -> FoconDisplayDrawStatus | None:
+	obj = plan_text(text, spec, host, device=device, alignment=alignment, font_size=font_size)
+	if isinstance(obj, FoconDisplayTextObject):
+		return FoconDisplayDrawStatus.unpack(display.send_command(FoconDisplayCommand.DrawString, obj.pack()))
+	return display.draw_bitmap(obj.bitmap, spec)
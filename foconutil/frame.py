@@ -1,23 +1,29 @@
-from typing import ClassVar
+from typing import ClassVar, Iterable, Iterator, Sequence
 from logging import getLogger
 
-from struct import pack
+from array import array
+from struct import Struct
 from dataclasses import dataclass
 import crcmod
 
-from .util import take, take_unpack
+from .util import FoconBuffer, take, take_unpack
 
 LOG = getLogger(__name__)
 
 CRC = crcmod.mkCrcFun(0x18005, 0xffff, False)
 
-@dataclass
+@dataclass(slots=True)
 class FoconFrame:
 	PREAMBLE = b'\xFF\xFF\xFF\x01'
 	POSTAMBLE = b'\xFF'
 	ID_MAP: ClassVar[dict[int | None, bytes]] = {i: bytes([x]) for i, x in enumerate(b'IJKLMNOpqrstuvwx')}
 	ID_MAP[None] = b'*'
 	REVERSE_ID_MAP = {v: k for k, v in ID_MAP.items()}
+	# preamble, source, destination, total, number, data length
+	HEADER: ClassVar[Struct] = Struct('>4sccBBH')
+	# checksum, postamble
+	TRAILER: ClassVar[Struct] = Struct('>Hc')
+	OVERHEAD: ClassVar[int] = HEADER.size + TRAILER.size
 
 	src_id:  int
 	dest_id: int | None
@@ -26,19 +32,35 @@ class FoconFrame:
 	data:    bytes
 
 	def pack(self) -> bytes:
-		if self.src_id not in self.ID_MAP:
-			raise ValueError(f'invalid source ID: {self.src_id}')
-		src = self.ID_MAP[self.src_id]
-		if self.dest_id not in self.ID_MAP:
-			raise ValueError(f'invalid destination ID: {self.dest_id}')
-		dest = self.ID_MAP[self.dest_id]
+		buffer = bytearray(self.OVERHEAD + len(self.data))
+		return bytes(self.pack_into(buffer, self.src_id, self.dest_id, self.num, self.total, [self.data]))
 
-		cdata = pack('>ccBB', src, dest, self.total, self.num)
-		cdata += pack('>H', len(self.data)) + self.data
-
-		checksum = CRC(cdata)
-		data = self.PREAMBLE + cdata + pack('>H', checksum) + self.POSTAMBLE
-		return data
+	@classmethod
+	def pack_into(cls, buffer: bytearray, src_id: int, dest_id: int | None, num: int, total: int, parts: Sequence[FoconBuffer]) -> memoryview:
+		# Assemble a frame around the given payload parts in a preallocated buffer,
+		# copying every payload byte exactly once and checksumming it on the way.
+		if src_id not in cls.ID_MAP:
+			raise ValueError(f'invalid source ID: {src_id}')
+		if dest_id not in cls.ID_MAP:
+			raise ValueError(f'invalid destination ID: {dest_id}')
+
+		length = sum(len(p) for p in parts)
+		end = cls.OVERHEAD + length
+		if len(buffer) < end:
+			raise ValueError(f'frame buffer too small: {len(buffer)} < {end}')
+		view = memoryview(buffer)
+		cls.HEADER.pack_into(buffer, 0, cls.PREAMBLE, cls.ID_MAP[src_id], cls.ID_MAP[dest_id], total, num, length)
+
+		offset = len(cls.PREAMBLE)
+		checksum = CRC(view[offset:cls.HEADER.size])
+		offset = cls.HEADER.size
+		for part in parts:
+			view[offset:offset + len(part)] = part
+			checksum = CRC(part, checksum)
+			offset += len(part)
+
+		cls.TRAILER.pack_into(buffer, offset, checksum, cls.POSTAMBLE)
+		return view[:end]
 
 	@classmethod
 	def unpack(cls, data: bytes) -> tuple['FoconFrame', bytes]:
@@ -76,6 +98,25 @@ class FoconFrame:
 		assert src_id is not None
 		return cls(src_id=src_id, dest_id=dest_id, num=num, total=total, data=pdata), data
 
+	@classmethod
+	def scan(cls, data: FoconBuffer) -> tuple[int, int] | None:
+		# Locate the next frame without parsing or checksumming it.
+		# Returns the offsets of its start marker and of its end, or None if it has not been fully received yet.
+		start = 0
+		while start < len(data) and data[start] == 0xff:
+			start += 1
+		if start == len(data):
+			return None
+		if data[start] != 1:
+			raise ValueError(f'invalid preamble: {bytes(data[:start + 1])!r}')
+		# the length follows the start marker, source, destination, total and number
+		if len(data) < start + 7:
+			return None
+		end = start + 7 + (data[start + 5] << 8 | data[start + 6]) + cls.TRAILER.size
+		if len(data) < end:
+			return None
+		return start, end
+
 	@property
 	def is_ack(self):
 		return not self.data and self.total > 0
@@ -90,3 +131,72 @@ class FoconFrame:
 			s += f', data: {self.data.hex()}'
 		s += ' }'
 		return s
+
+class FoconFrameLog:
+	# Struct-of-arrays store for large amounts of frames: per-frame fields live in typed arrays
+	# and all payloads are appended to one shared buffer, instead of one object and bytes per frame.
+	# Indexing hands out regular FoconFrame objects, built on demand.
+	NO_ID = -1
+
+	def __init__(self, frames: Iterable[FoconFrame] = ()) -> None:
+		self.src_ids = array('b')
+		self.dest_ids = array('b')
+		self.nums = array('B')
+		self.totals = array('B')
+		self.offsets = array('Q')
+		self.lengths = array('H')
+		self.times = array('d')
+		self.payload = bytearray()
+		self.extend(frames)
+
+	def append(self, frame: FoconFrame, time: float = 0.0) -> None:
+		self.append_parts(frame.src_id, frame.dest_id, frame.num, frame.total, frame.data, time=time)
+
+	def append_parts(self, src_id: int, dest_id: int | None, num: int, total: int, data: FoconBuffer, time: float = 0.0) -> None:
+		self.src_ids.append(src_id)
+		self.dest_ids.append(self.NO_ID if dest_id is None else dest_id)
+		self.nums.append(num)
+		self.totals.append(total)
+		self.offsets.append(len(self.payload))
+		self.lengths.append(len(data))
+		self.times.append(time)
+		self.payload += data
+
+	def extend(self, frames: Iterable[FoconFrame]) -> None:
+		for frame in frames:
+			self.append(frame)
+
+	def clear(self) -> None:
+		for a in (self.src_ids, self.dest_ids, self.nums, self.totals, self.offsets, self.lengths, self.times):
+			del a[:]
+		self.payload = bytearray()
+
+	def __len__(self) -> int:
+		return len(self.nums)
+
+	def data_of(self, index: int) -> bytes:
+		# a copy: a view would keep the payload buffer from growing on the next append
+		offset = self.offsets[index]
+		return bytes(self.payload[offset:offset + self.lengths[index]])
+
+	def time_of(self, index: int) -> float:
+		return self.times[index]
+
+	def __getitem__(self, index: int) -> FoconFrame:
+		dest_id = self.dest_ids[index]
+		return FoconFrame(
+			src_id=self.src_ids[index],
+			dest_id=None if dest_id == self.NO_ID else dest_id,
+			num=self.nums[index],
+			total=self.totals[index],
+			data=self.data_of(index),
+		)
+
+	def __iter__(self) -> Iterator[FoconFrame]:
+		for i in range(len(self)):
+			yield self[i]
+
+	@property
+	def nbytes(self) -> int:
+		arrays = (self.src_ids, self.dest_ids, self.nums, self.totals, self.offsets, self.lengths, self.times)
+		return sum(a.itemsize * len(a) for a in arrays) + len(self.payload)
@@ -0,0 +1,130 @@
+from typing import Callable, List
+from logging import getLogger
+
+import time
+from collections import OrderedDict
+
+from .devices.display import (
+	FoconDisplay, FoconDisplayCommand, FoconDisplayStatus, FoconDisplayError, FoconDisplayDrawSpec,
+	FoconDisplayHideSpecification, FoconDisplayUndrawSpecification, FoconDisplayOutputSelector,
+	ANONYMOUS_OBJECT_ID,
+)
+
+LOG = getLogger(__name__)
+
+
+DRAW_COMMANDS = (FoconDisplayCommand.DrawPixels, FoconDisplayCommand.DrawString)
+
+# output and object ID, followed by the area for anonymous draws
+FoconJournalKey = tuple[int, ...]
+
+class FoconDisplayJournal:
+	# Remembers the encoded draw commands behind everything currently on a display, in drawing order,
+	# so its contents can be put back in one pipelined burst after the display lost them.
+	def __init__(self, display: FoconDisplay, window: int | None = None, clock: Callable[[], float] = time.monotonic) -> None:
+		self.display = display
+		self.window = window
+		self.clock = clock
+		self.entries: OrderedDict[FoconJournalKey, tuple[FoconDisplayCommand, bytes]] = OrderedDict()
+		self.last_mode: int | None = None
+		self.last_watchdog: bool | None = None
+		self.restores = 0
+		self.last_restore: float | None = None
+		self.replaying = False
+
+	def attach(self) -> 'FoconDisplayJournal':
+		self.display.journal = self
+		return self
+
+	def detach(self) -> None:
+		if self.display.journal is self:
+			self.display.journal = None
+
+	@staticmethod
+	def key_of(spec: FoconDisplayDrawSpec) -> FoconJournalKey:
+		if spec.object_id == ANONYMOUS_OBJECT_ID:
+			# anonymous draws only replace each other when they cover the same area
+			return (spec.output_id, spec.object_id, spec.x_start, spec.y_start, spec.x_end, spec.y_end)
+		return (spec.output_id, spec.object_id)
+
+	## Recording
+
+	def record(self, command: FoconDisplayCommand, payload: bytes) -> None:
+		if self.replaying:
+			return
+		if command in DRAW_COMMANDS:
+			spec = FoconDisplayDrawSpec.unpack_from(payload)
+			key = self.key_of(spec)
+			self.entries.pop(key, None)
+			self.entries[key] = (command, bytes(payload))
+		elif command == FoconDisplayCommand.Undraw:
+			object_ids = set(FoconDisplayUndrawSpecification.unpack(payload).objects.ids)
+			for key in [k for k in self.entries if k[1] in object_ids and k[1] != ANONYMOUS_OBJECT_ID]:
+				del self.entries[key]
+		elif command == FoconDisplayCommand.Clear:
+			self.record_clear(FoconDisplayHideSpecification.unpack(payload))
+
+	def record_clear(self, spec: FoconDisplayHideSpecification) -> None:
+		for key in list(self.entries):
+			output_id, object_id = key[0], key[1]
+			if spec.mode == FoconDisplayOutputSelector.AllFrom:
+				hit = output_id >= spec.output_id
+			else:
+				hit = output_id == spec.output_id
+			if not hit or object_id != ANONYMOUS_OBJECT_ID:
+				# clearing pixels doesn't remove named objects
+				continue
+			if spec.mode == FoconDisplayOutputSelector.SingleArea:
+				_, _, x_start, y_start, x_end, y_end = key
+				if not (spec.x_start <= x_start and x_end <= spec.x_end and spec.y_start <= y_start and y_end <= spec.y_end):
+					continue
+			del self.entries[key]
+
+	def clear(self) -> None:
+		self.entries.clear()
+
+	## Recovery
+
+	def lost_contents(self, status: FoconDisplayStatus) -> bool:
+		mode_changed = self.last_mode is not None and status.mode != self.last_mode
+		self.last_mode = status.mode
+		# the watchdog flag stays set after a reset, only it turning on says anything
+		watchdog = FoconDisplayError.Watchdog in status.error_flags
+		watchdog_reset = self.last_watchdog is False and watchdog
+		self.last_watchdog = watchdog
+		if watchdog_reset:
+			return True
+		named = any(key[1] != ANONYMOUS_OBJECT_ID for key in self.entries)
+		if named and not status.used_object_ids:
+			return True
+		return mode_changed and bool(self.entries)
+
+	def commands(self) -> List[tuple[FoconDisplayCommand, bytes]]:
+		return list(self.entries.values())
+
+	def restore(self) -> int:
+		commands = self.commands()
+		if not commands:
+			return 0
+		start = self.clock()
+		# one burst, whoever else uses the bus waits for it
+		with self.display.device.bus.lock:
+			self.replaying = True
+			try:
+				self.display.send_commands(commands, window=self.window)
+			finally:
+				self.replaying = False
+		self.restores += 1
+		self.last_restore = self.clock()
+		LOG.info('restored %d object(s) in %.3fs', len(commands), self.last_restore - start)
+		return len(commands)
+
+	def check(self, status: FoconDisplayStatus | None = None) -> bool:
+		# check a status (fetched if not given) for signs of a reboot, and put everything back if so
+		if status is None:
+			status = self.display.get_status()
+		if not self.lost_contents(status):
+			return False
+		LOG.warning('display appears to have lost its contents, restoring %d object(s)', len(self.entries))
+		self.restore()
+		return True
@@ -1,28 +1,38 @@
-from typing import ClassVar
+from typing import Callable, ClassVar
 from logging import getLogger
 
+import threading
 from functools import partial
+from collections import deque
 from dataclasses import dataclass
-from struct import pack
+from struct import Struct
 
-from .util import take, take_unpack
+from .util import FoconBuffer, take
 from .bus import FoconBus
 
 LOG = getLogger(__name__)
 
 
-@dataclass
+@dataclass(slots=True)
 class FoconMessage:
 	ID_MAP: ClassVar[dict[int | None, bytes]] = {i: 'I{:x}'.format(i).encode('ascii') for i in range(16)}
 	ID_MAP[None] = b'I*'
 	REVERSE_ID_MAP = {v: k for k, v in ID_MAP.items()}
+	HEADER: ClassVar[Struct] = Struct('>2sH2sHH')
 
 	src_id: int | None
 	dest_id: int | None
 	cmd: int
-	value: bytes
+	value: FoconBuffer
 
 	def pack(self) -> bytes:
+		return self.pack_header() + self.value
+
+	def parts(self) -> list[FoconBuffer]:
+		# header and value as a gather list, so the value does not need to be copied
+		return [self.pack_header(), memoryview(self.value)]
+
+	def pack_header(self) -> bytes:
 		if self.src_id not in self.ID_MAP:
 			raise ValueError(f'invalid source ID: {self.src_id}')
 		src = self.ID_MAP[self.src_id]
@@ -30,11 +40,12 @@ class FoconMessage:
 			raise ValueError(f'invalid destination ID: {self.dest_id}')
 		dest = self.ID_MAP[self.dest_id]
 
-		return pack('>2sH2sHH', src, 0x00, dest, len(self.value), self.cmd) + self.value
+		return self.HEADER.pack(src, 0x00, dest, len(self.value), self.cmd)
 
 	@classmethod
 	def unpack(cls, data: bytes) -> tuple['FoconMessage', bytes]:
-		(src, unk1, dest, vlength, cmd), data = take_unpack(data, '>2sH2sHH')
+		hdata, data = take(data, cls.HEADER.size)
+		src, unk1, dest, vlength, cmd = cls.HEADER.unpack(hdata)
 		value, data = take(data, vlength)
 		if data:
 			raise ValueError(f'trailing message data: {data!r}')
@@ -51,7 +62,7 @@ class FoconMessage:
 	def __repr__(self) -> str:
 		s = f'{self.__class__.__name__} {{ {self.src_id} -> {self.dest_id}, cmd {self.cmd}'
 		if self.value:
-			s += f', data: {self.value.hex()}'
+			s += f', data: {bytes(self.value).hex()}'
 		s += ' }'
 		return s
 
@@ -60,6 +71,9 @@ class FoconMessageBus:
 		self.bus = bus
 		self.src_id = src_id
 		self.debug = debug
+		# held for every exchange, so threads sharing the bus (e.g. a status poller) take turns; hold it yourself
+		# to keep a sequence of commands together
+		self.lock = threading.RLock()
 
 	def check_message(self, dest_id: int | None, cmd: int | None, data: bytes | None) -> bool:
 		if data is None:
@@ -74,7 +88,7 @@ class FoconMessageBus:
 	def send_message(self, dest_id: int | None, message: FoconMessage) -> None:
 		if self.debug:
 			LOG.debug('> msg: %r', message)
-		return self.bus.send_message(dest_id, message.pack())
+		return self.bus.send_message(dest_id, *message.parts())
 
 	def recv_message(self, dest_id: int | None, cmd: int | None = None) -> FoconMessage:
 		data = self.bus.recv_message(dest_id, partial(self.check_message, dest_id, cmd))
@@ -88,24 +102,66 @@ class FoconMessageBus:
 		return msg
 
 	def recv_messages(self, dest_id: int, cmd: int | None = None) -> list[FoconMessage]:
-		messages = []
-		checker = partial(self.check_message, dest_id, cmd)
-
-		while True:
-			data = self.bus.recv_next_message(dest_id, checker)
-			if not data:
-				break
-			msg, remainder_data = FoconMessage.unpack(data)
-			if self.debug:
-				LOG.debug('< msg: %r', msg)
-			if remainder_data:
-				raise ValueError(f'Remainder data: {remainder_data!r}')
-			messages.append(msg)
-
-		return messages
+		with self.lock:
+			messages = []
+			checker = partial(self.check_message, dest_id, cmd)
+
+			while True:
+				data = self.bus.recv_next_message(dest_id, checker)
+				if not data:
+					break
+				msg, remainder_data = FoconMessage.unpack(data)
+				if self.debug:
+					LOG.debug('< msg: %r', msg)
+				if remainder_data:
+					raise ValueError(f'Remainder data: {remainder_data!r}')
+				messages.append(msg)
+
+			return messages
+
+	def broadcast(self, command: int, payload: bytes = b'') -> None:
+		# broadcasts are not acknowledged, so there is no reply to wait for
+		with self.lock:
+			message = FoconMessage(src_id=self.src_id, dest_id=None, cmd=command, value=payload)
+			self.send_message(None, message)
+
+	def multicast(self, dest_ids: list[int], command: int, payload: bytes = b'', sent: Callable[[int], None] | None = None) -> list[bytes]:
+		# Send the same single-frame command to several devices back-to-back, then collect their replies.
+		# Unlike a broadcast, only the given devices act on it, and every one of them acknowledges it.
+		# `sent` is called with every destination as soon as its frame has been written.
+		with self.lock:
+			if self.bus.frame_count(None, FoconMessage.HEADER.size + len(payload)) > 1:
+				raise ValueError('multicast commands have to fit in a single frame')
+			for dest_id in dest_ids:
+				self.send_message(dest_id, FoconMessage(src_id=self.src_id, dest_id=dest_id, cmd=command, value=payload))
+				if sent:
+					sent(dest_id)
+			return [bytes(self.recv_message(dest_id, cmd=command).value) for dest_id in dest_ids]
+
+	def send_commands(self, dest_id: int | None, commands: list[tuple[int, bytes]], window: int | None = None) -> list[bytes]:
+		# Send commands back-to-back, collecting replies in order once the window of outstanding commands is full.
+		# Frame numbers and acknowledgements are tracked per peer, not per command, so only single-frame messages
+		# can overlap: longer ones wait for everything outstanding, and for their own reply before anything else goes out.
+		with self.lock:
+			replies = []
+			pending: deque[int] = deque()
+			for command, payload in commands:
+				alone = self.bus.frame_count(dest_id, FoconMessage.HEADER.size + len(payload)) > 1
+				while pending and (alone or (window and len(pending) >= window)):
+					replies.append(bytes(self.recv_message(dest_id, cmd=pending.popleft()).value))
+				message = FoconMessage(src_id=self.src_id, dest_id=dest_id, cmd=command, value=payload)
+				self.send_message(dest_id, message)
+				if alone:
+					replies.append(bytes(self.recv_message(dest_id, cmd=command).value))
+				else:
+					pending.append(command)
+			while pending:
+				replies.append(bytes(self.recv_message(dest_id, cmd=pending.popleft()).value))
+			return replies
 
 	def send_command(self, dest_id: int | None, command: int, payload: bytes=b'') -> bytes:
-		message = FoconMessage(src_id=self.src_id, dest_id=dest_id, cmd=command, value=payload)
-		self.send_message(dest_id, message)
-		reply_message = self.recv_message(dest_id, cmd=command)
-		return reply_message.value
+		with self.lock:
+			message = FoconMessage(src_id=self.src_id, dest_id=dest_id, cmd=command, value=payload)
+			self.send_message(dest_id, message)
+			reply_message = self.recv_message(dest_id, cmd=command)
+			return bytes(reply_message.value)
@@ -0,0 +1,160 @@
+from typing import Callable, Hashable, Iterable, TypeVar
+from logging import getLogger
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+
+from .bitmap import FoconBitmap
+from .devices.display import (
+	FoconDisplay, FoconDisplayDrawSpec, FoconDisplayDrawStatus, FoconDisplayDrawTransition, FoconDisplayAlignment,
+	ANONYMOUS_OBJECT_ID,
+)
+
+LOG = getLogger(__name__)
+
+
+S = TypeVar('S', bound=FoconDisplayDrawStatus | None)
+
+SCROLL_TRANSITIONS = (FoconDisplayDrawTransition.LeftScroll, FoconDisplayDrawTransition.RightScroll)
+
+def is_scroll(spec: FoconDisplayDrawSpec) -> bool:
+	return spec.transition in SCROLL_TRANSITIONS
+
+@dataclass
+class FoconDisplayObjectLease:
+	object_id:  int
+	scroll:     bool
+	key:        Hashable | None
+	last_shown: float
+
+class FoconDisplayObjectAllocator:
+	# Hands out object IDs and keeps the display's still and scroll object slots in check.
+	# Slot availability comes from the display status, and is tracked locally in between;
+	# when a kind of slot runs out, the object that was shown least recently is undrawn to make room.
+	def __init__(self, display: FoconDisplay, object_ids: Iterable[int] = range(1, ANONYMOUS_OBJECT_ID), clock: Callable[[], float] = time.monotonic) -> None:
+		self.display = display
+		self.object_ids = list(object_ids)
+		self.clock = clock
+		# in order of last use
+		self.leases: OrderedDict[int, FoconDisplayObjectLease] = OrderedDict()
+		self.keys: dict[Hashable, int] = {}
+		# IDs in use on the display by someone else
+		self.foreign_ids: set[int] = set()
+		self.available = {False: 0, True: 0}
+		self.synced = False
+
+	def sync(self) -> None:
+		status = self.display.get_status()
+		self.available = {False: status.available_still_objects, True: status.available_scroll_objects}
+		used = set(status.used_object_ids)
+		for object_id in [i for i in self.leases if i not in used]:
+			# gone from the display, e.g. after a reboot or an undraw by someone else
+			self.forget(object_id)
+		self.foreign_ids = used - set(self.leases)
+		self.synced = True
+
+	def forget(self, object_id: int) -> FoconDisplayObjectLease:
+		lease = self.leases.pop(object_id)
+		if lease.key is not None:
+			self.keys.pop(lease.key, None)
+		return lease
+
+	def touch(self, object_id: int) -> None:
+		if object_id in self.leases:
+			self.leases[object_id].last_shown = self.clock()
+			self.leases.move_to_end(object_id)
+
+	def free_id(self) -> int | None:
+		for object_id in self.object_ids:
+			if object_id not in self.leases and object_id not in self.foreign_ids:
+				return object_id
+		return None
+
+	def evict(self, scroll: bool | None = None) -> bool:
+		for object_id, lease in self.leases.items():
+			if scroll is None or lease.scroll == scroll:
+				LOG.debug('evicting object %d, last shown %.1fs ago', object_id, self.clock() - lease.last_shown)
+				self.release(object_id)
+				return True
+		return False
+
+	def lease(self, scroll: bool = False, key: Hashable | None = None) -> int:
+		if key is not None and key in self.keys:
+			object_id = self.keys[key]
+			lease = self.leases[object_id]
+			if lease.scroll != scroll:
+				# Moving to the other kind of slot: take the new one before giving back the old one,
+				# so a sync in between sees the old one still in use and can't lose or double the credit.
+				self.reserve_slot(scroll)
+				if object_id in self.leases:
+					self.available[lease.scroll] += 1
+				else:
+					# gone from the display, the sync already counted its old slot as free
+					self.leases[object_id] = lease
+					self.keys[key] = object_id
+				lease.scroll = scroll
+			self.touch(object_id)
+			return object_id
+
+		if not self.synced:
+			self.sync()
+		self.reserve_slot(scroll)
+		free_id = self.free_id()
+		while free_id is None:
+			if not self.evict():
+				self.available[scroll] += 1
+				raise RuntimeError('no object IDs left to allocate')
+			free_id = self.free_id()
+
+		self.leases[free_id] = FoconDisplayObjectLease(object_id=free_id, scroll=scroll, key=key, last_shown=self.clock())
+		if key is not None:
+			self.keys[key] = free_id
+		return free_id
+
+	def reserve_slot(self, scroll: bool) -> None:
+		if self.available[scroll] <= 0:
+			# our own bookkeeping may be stale, ask the display before throwing anything out
+			self.sync()
+		while self.available[scroll] <= 0:
+			if not self.evict(scroll):
+				raise RuntimeError('no {} object slots left'.format('scroll' if scroll else 'still'))
+		self.available[scroll] -= 1
+
+	def release(self, object_id: int, undraw: bool = True, update_screen: bool = True) -> None:
+		if undraw:
+			self.display.undraw([object_id], update_screen=update_screen)
+		if object_id in self.leases:
+			lease = self.forget(object_id)
+			self.available[lease.scroll] += 1
+
+	def undraw(self, object_ids: list[int], update_screen: bool = True) -> None:
+		self.display.undraw(object_ids, update_screen=update_screen)
+		for object_id in object_ids:
+			self.release(object_id, undraw=False)
+
+	## Drawing
+
+	def spec_for(self, spec: FoconDisplayDrawSpec, key: Hashable | None = None) -> FoconDisplayDrawSpec:
+		return replace(spec, object_id=self.lease(scroll=is_scroll(spec), key=key))
+
+	def draw_with(self, draw: Callable[[FoconDisplayDrawSpec], S], spec: FoconDisplayDrawSpec, key: Hashable | None = None) -> S:
+		# a keyed object that is already on the display keeps its lease whatever happens to the new drawing
+		new = key is None or key not in self.keys
+		spec = self.spec_for(spec, key=key)
+		try:
+			status = draw(spec)
+			if status is not None and not status.accepted:
+				raise RuntimeError(f'display refused object {spec.object_id}: status {status.status}')
+		except:
+			if new:
+				# the object never made it to the display
+				self.release(spec.object_id, undraw=False)
+			raise
+		return status
+
+	def draw_bitmap(self, bitmap: FoconBitmap, spec: FoconDisplayDrawSpec, key: Hashable | None = None, optimize: bool = True) -> FoconDisplayDrawStatus | None:
+		return self.draw_with(lambda spec: self.display.draw_bitmap(bitmap, spec, optimize=optimize), spec, key=key)
+
+	def print(self, message: str, spec: FoconDisplayDrawSpec, key: Hashable | None = None, alignment: FoconDisplayAlignment | None = None, font_size: int | None = None) -> FoconDisplayDrawStatus:
+		return self.draw_with(lambda spec: self.display.print(message, spec, alignment=alignment, font_size=font_size), spec, key=key)
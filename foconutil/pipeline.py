@@ -0,0 +1,91 @@
+from typing import Any, BinaryIO, Callable, Iterator
+from logging import getLogger
+
+import os
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, ProcessPoolExecutor
+
+from .bitmap import FoconBitmap
+
+LOG = getLogger(__name__)
+
+
+FoconFramePreparer = Callable[[Any], FoconBitmap]
+
+def prepare_frame(image: Any) -> FoconBitmap:
+	return FoconBitmap.from_image(image)
+
+class FoconImagePipeline:
+	# Turns the frames of an (animated) image into bitmaps ahead of playback.
+	# Frames are decoded in order on a background thread, since most formats can only seek forward cheaply;
+	# converting them into bitmaps is spread over a thread or process pool. At most `read_ahead` frames are in flight,
+	# so memory stays bounded however long the animation is, and the first frame is out as soon as it is converted.
+	#
+	# With processes, `prepare` has to be picklable, e.g. a module-level function or a functools.partial of one.
+	def __init__(self, file: BinaryIO | str, prepare: FoconFramePreparer = prepare_frame, workers: int | None = None,
+	             read_ahead: int = 8, processes: bool = False) -> None:
+		import PIL.Image
+
+		self.image = PIL.Image.open(file)
+		self.n_frames: int = getattr(self.image, 'n_frames', 1)
+		self.loops: int = self.image.info.get('loop', 1)
+		self.prepare = prepare
+		self.workers = workers or os.cpu_count() or 1
+		self.read_ahead = max(read_ahead, 1)
+		self.processes = processes
+		self.stopped = threading.Event()
+
+	def make_executor(self) -> Executor:
+		if not self.processes:
+			return ThreadPoolExecutor(self.workers, thread_name_prefix='focon-prepare')
+		# workers are started by the first submit on the decoder thread, and forking a process with threads is not safe
+		method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+		return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context(method))
+
+	def put(self, pending: 'queue.Queue[Any]', item: Any) -> None:
+		# blocks while the read-ahead is full, unless playback stopped
+		while not self.stopped.is_set():
+			try:
+				pending.put(item, timeout=0.1)
+				break
+			except queue.Full:
+				pass
+
+	def decode(self, executor: Executor, pending: 'queue.Queue[tuple[Future[FoconBitmap], float] | BaseException | None]') -> None:
+		try:
+			for frame_id in range(self.n_frames):
+				if self.stopped.is_set():
+					return
+				self.image.seek(frame_id)
+				duration = self.image.info.get('duration', 0) / 1000
+				# a detached copy, the next seek reuses the decoder's buffers
+				frame = self.image.copy()
+				self.put(pending, (executor.submit(self.prepare, frame), duration))
+		except BaseException as e:
+			self.put(pending, e)
+		else:
+			self.put(pending, None)
+
+	def __iter__(self) -> Iterator[tuple[FoconBitmap, float]]:
+		# frames that were decoded but not played yet, whether converted already or not
+		pending: queue.Queue[tuple[Future[FoconBitmap], float] | BaseException | None] = queue.Queue(maxsize=self.read_ahead)
+		executor = self.make_executor()
+		decoder = threading.Thread(target=self.decode, args=(executor, pending), name='focon-decode', daemon=True)
+		self.stopped.clear()
+		decoder.start()
+		try:
+			while True:
+				item = pending.get()
+				if item is None:
+					break
+				if isinstance(item, BaseException):
+					raise item
+				future, duration = item
+				yield future.result(), duration
+		finally:
+			self.stopped.set()
+			decoder.join()
+			# queued conversions are dropped, the running ones are waited for: process pools left running fail at exit
+			executor.shutdown(cancel_futures=True)
@@ -0,0 +1,268 @@
+from typing import Any, Callable, Iterator, List, TextIO
+from logging import getLogger
+
+import os
+import json
+import time
+import threading
+from array import array
+from dataclasses import dataclass, field
+
+from .devices.display import FoconDisplay, FoconDisplayStatus, FoconDisplayError
+from .journal import FoconDisplayJournal
+
+LOG = getLogger(__name__)
+
+
+@dataclass(slots=True)
+class FoconStatusSample:
+	time:                     float
+	error_flags:              int
+	temperature:              float
+	brightness_adjust:        int | None
+	general_adjust:           int
+	temp_adjust:              int
+	overall_adjust:           int
+	available_still_objects:  int
+	available_scroll_objects: int
+	visible_objects:          int
+
+	@classmethod
+	def from_status(cls, time: float, status: FoconDisplayStatus) -> 'FoconStatusSample':
+		return cls(
+			time=time,
+			error_flags=status.error_flags.value,
+			temperature=status.temperature,
+			brightness_adjust=status.brightness_adjust,
+			general_adjust=status.general_adjust,
+			temp_adjust=status.temp_adjust,
+			overall_adjust=status.overall_adjust,
+			available_still_objects=status.available_still_objects,
+			available_scroll_objects=status.available_scroll_objects,
+			visible_objects=len(status.visible_object_ids),
+		)
+
+	@property
+	def errors(self) -> FoconDisplayError:
+		return FoconDisplayError(self.error_flags)
+
+	def to_json(self) -> dict[str, Any]:
+		return {name: getattr(self, name) for name in self.__slots__}
+
+class FoconStatusRing:
+	# Fixed-size history of status samples, stored column-wise in typed arrays
+	NO_BRIGHTNESS = -1
+	COLUMNS = {
+		'time': 'd', 'error_flags': 'H', 'temperature': 'd', 'brightness_adjust': 'h',
+		'general_adjust': 'B', 'temp_adjust': 'B', 'overall_adjust': 'B',
+		'available_still_objects': 'B', 'available_scroll_objects': 'B', 'visible_objects': 'B',
+	}
+
+	def __init__(self, capacity: int = 1024) -> None:
+		self.capacity = capacity
+		self.columns = {name: array(code, bytes(array(code).itemsize * capacity)) for name, code in self.COLUMNS.items()}
+		self.start = 0
+		self.count = 0
+
+	def __len__(self) -> int:
+		return self.count
+
+	def append(self, sample: FoconStatusSample) -> None:
+		index = (self.start + self.count) % self.capacity
+		if self.count < self.capacity:
+			self.count += 1
+		else:
+			self.start = (self.start + 1) % self.capacity
+		for name, column in self.columns.items():
+			value = getattr(sample, name)
+			if name == 'brightness_adjust' and value is None:
+				value = self.NO_BRIGHTNESS
+			column[index] = value
+
+	def __getitem__(self, i: int) -> FoconStatusSample:
+		if i < 0:
+			i += self.count
+		if not 0 <= i < self.count:
+			raise IndexError(i)
+		index = (self.start + i) % self.capacity
+		values: dict[str, Any] = {name: column[index] for name, column in self.columns.items()}
+		if values['brightness_adjust'] == self.NO_BRIGHTNESS:
+			values['brightness_adjust'] = None
+		return FoconStatusSample(**values)
+
+	def __iter__(self) -> Iterator[FoconStatusSample]:
+		for i in range(self.count):
+			yield self[i]
+
+	def latest(self) -> FoconStatusSample | None:
+		return self[-1] if self.count else None
+
+@dataclass
+class FoconPolledDisplay:
+	name:     str
+	display:  FoconDisplay
+	interval: float = 0.0
+	next_due: float = 0.0
+	polls:    int = 0
+	failures: int = 0
+	up:       bool = False
+	history:  FoconStatusRing = field(default_factory=FoconStatusRing, repr=False)
+	# restores the display contents when a poll shows they were lost
+	journal:  FoconDisplayJournal | None = field(default=None, repr=False)
+
+	@property
+	def bus_key(self) -> int:
+		return id(self.display.device.bus.bus)
+
+	@property
+	def address(self) -> int | None:
+		return self.display.device.dest_id
+
+class FoconFleetPoller:
+	# Polls the status of many displays, one thread per bus.
+	# Devices that look unsettled (error flags, temperature or adjustments changing) are polled at the minimum
+	# interval, steady ones back off towards the maximum. Polling never takes more than `budget` of bus time.
+	def __init__(self, targets: List[FoconPolledDisplay], min_interval: float = 1.0, max_interval: float = 60.0,
+	             backoff: float = 1.5, temperature_delta: float = 1.0, budget: float = 0.1,
+	             callback: Callable[[FoconPolledDisplay, FoconStatusSample | None], None] | None = None,
+	             clock: Callable[[], float] = time.monotonic) -> None:
+		self.targets = targets
+		self.min_interval = min_interval
+		self.max_interval = max_interval
+		self.backoff = backoff
+		self.temperature_delta = temperature_delta
+		self.budget = budget
+		self.callback = callback
+		self.clock = clock
+		self.stopped = threading.Event()
+		self.lock = threading.Lock()
+		self.groups: dict[int, List[FoconPolledDisplay]] = {}
+		for target in targets:
+			self.groups.setdefault(target.bus_key, []).append(target)
+
+	def unsettled(self, previous: FoconStatusSample | None, sample: FoconStatusSample) -> bool:
+		if sample.error_flags:
+			return True
+		if previous is None:
+			return False
+		return (
+			previous.error_flags != sample.error_flags
+			or abs(previous.temperature - sample.temperature) >= self.temperature_delta
+			or (previous.brightness_adjust, previous.general_adjust, previous.temp_adjust, previous.overall_adjust)
+			!= (sample.brightness_adjust, sample.general_adjust, sample.temp_adjust, sample.overall_adjust)
+		)
+
+	def poll(self, target: FoconPolledDisplay) -> FoconStatusSample | None:
+		# the bus may be shared with whoever draws on the display, keep them from talking in between
+		with target.display.device.bus.lock:
+			try:
+				status = target.display.get_status()
+			except Exception as e:
+				LOG.warning('could not poll %s: %s', target.name, e)
+				with self.lock:
+					target.failures += 1
+					target.up = False
+					target.interval = min(self.max_interval, max(target.interval * self.backoff, self.min_interval))
+				return None
+
+			if target.journal:
+				try:
+					target.journal.check(status)
+				except Exception as e:
+					LOG.warning('could not restore %s: %s', target.name, e)
+
+		sample = FoconStatusSample.from_status(time.time(), status)
+		with self.lock:
+			previous = target.history.latest()
+			target.history.append(sample)
+			target.polls += 1
+			target.up = True
+			if self.unsettled(previous, sample):
+				target.interval = self.min_interval
+			else:
+				target.interval = min(self.max_interval, max(target.interval * self.backoff, self.min_interval))
+		return sample
+
+	def drive(self, targets: List[FoconPolledDisplay]) -> None:
+		while not self.stopped.is_set():
+			target = min(targets, key=lambda t: t.next_due)
+			delay = target.next_due - self.clock()
+			if delay > 0 and self.stopped.wait(delay):
+				break
+
+			start = self.clock()
+			sample = self.poll(target)
+			elapsed = self.clock() - start
+			# keep the bus free for everyone else for the rest of the budget
+			idle = elapsed * (1 - self.budget) / self.budget if self.budget < 1 else 0.0
+			target.next_due = start + max(target.interval, elapsed + idle)
+			for other in targets:
+				other.next_due = max(other.next_due, start + elapsed + idle)
+			if self.callback:
+				self.callback(target, sample)
+
+	def run(self) -> None:
+		threads = [threading.Thread(target=self.drive, args=(targets,), name='focon-poller', daemon=True) for targets in self.groups.values()]
+		for thread in threads:
+			thread.start()
+		try:
+			for thread in threads:
+				while thread.is_alive():
+					thread.join(0.5)
+		finally:
+			self.stop()
+
+	def stop(self) -> None:
+		self.stopped.set()
+
+	## Export
+
+	def prometheus(self) -> str:
+		metrics: list[tuple[str, str, str, Callable[[FoconPolledDisplay, FoconStatusSample | None], Any]]] = [
+			('focon_display_up', 'gauge', 'whether the last status poll succeeded', lambda t, s: int(t.up)),
+			('focon_display_polls_total', 'counter', 'successful status polls', lambda t, s: t.polls),
+			('focon_display_poll_failures_total', 'counter', 'failed status polls', lambda t, s: t.failures),
+			('focon_display_poll_interval_seconds', 'gauge', 'current status poll interval', lambda t, s: t.interval),
+			('focon_display_restores_total', 'counter', 'display contents restored from the journal', lambda t, s: t.journal and t.journal.restores),
+			('focon_display_error_flags', 'gauge', 'raw error flags', lambda t, s: s and s.error_flags),
+			('focon_display_temperature_celsius', 'gauge', 'display temperature', lambda t, s: s and s.temperature),
+			('focon_display_brightness_adjust', 'gauge', 'brightness adjustment', lambda t, s: s and s.brightness_adjust),
+			('focon_display_general_adjust', 'gauge', 'general adjustment', lambda t, s: s and s.general_adjust),
+			('focon_display_temperature_adjust', 'gauge', 'temperature adjustment', lambda t, s: s and s.temp_adjust),
+			('focon_display_overall_adjust', 'gauge', 'overall adjustment', lambda t, s: s and s.overall_adjust),
+			('focon_display_available_still_objects', 'gauge', 'free still object slots', lambda t, s: s and s.available_still_objects),
+			('focon_display_available_scroll_objects', 'gauge', 'free scroll object slots', lambda t, s: s and s.available_scroll_objects),
+		]
+		with self.lock:
+			latest = [(t, t.history.latest()) for t in self.targets]
+		lines = []
+		for name, kind, help, value_of in metrics:
+			lines.append(f'# HELP {name} {help}')
+			lines.append(f'# TYPE {name} {kind}')
+			for target, sample in latest:
+				value = value_of(target, sample)
+				if value is None:
+					continue
+				lines.append('{}{{display="{}",address="{}"}} {}'.format(name, target.name, target.address, value))
+		lines.append('# HELP focon_display_error whether an error flag is set')
+		lines.append('# TYPE focon_display_error gauge')
+		for target, sample in latest:
+			if not sample:
+				continue
+			for flag in FoconDisplayError:
+				lines.append('focon_display_error{{display="{}",address="{}",flag="{}"}} {}'.format(target.name, target.address, flag.name, int(flag in sample.errors)))
+		return '\n'.join(lines) + '\n'
+
+	def write_prometheus(self, path: str) -> None:
+		# write to a temporary file first, so the collector never reads half a file
+		with open(path + '.tmp', 'w') as f:
+			f.write(self.prometheus())
+		os.replace(path + '.tmp', path)
+
+	@staticmethod
+	def write_jsonl(f: TextIO, target: FoconPolledDisplay, sample: FoconStatusSample | None) -> None:
+		record = {'display': target.name, 'address': target.address, 'up': sample is not None}
+		if sample:
+			record.update(sample.to_json())
+		f.write(json.dumps(record) + '\n')
+		f.flush()
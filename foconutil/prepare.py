@@ -0,0 +1,172 @@
+from typing import Any
+from logging import getLogger
+
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from enum import Enum
+from functools import cache
+
+from .bitmap import FoconBitmap
+from .devices.display import FoconDisplayConfiguration
+
+LOG = getLogger(__name__)
+
+
+class FoconScaling(Enum):
+	# whole image visible, blank bars where the aspect ratio differs
+	Fit = 'fit'
+	# whole display covered, edges of the image cut off where the aspect ratio differs
+	Fill = 'fill'
+	# no scaling, one image pixel per LED, centered and cut to size
+	Crop = 'crop'
+	# whole image on the whole display, aspect ratio be damned
+	Stretch = 'stretch'
+
+class FoconDithering(Enum):
+	Threshold = 'threshold'
+	Bayer = 'bayer'
+	ErrorDiffusion = 'error-diffusion'
+
+def bayer_matrix(size: int) -> list[list[int]]:
+	if size == 1:
+		return [[0]]
+	half = size // 2
+	inner = bayer_matrix(half)
+	quadrants = ((0, 2), (3, 1))
+	return [[4 * inner[y % half][x % half] + quadrants[y // half][x // half] for x in range(size)] for y in range(size)]
+
+@cache
+def bayer_tile(size: int) -> Any:
+	import PIL.Image
+
+	matrix = bayer_matrix(size)
+	tile = PIL.Image.new('L', (size, size))
+	tile.putdata([int((v + 0.5) * 256 / (size * size)) for row in matrix for v in row])
+	return tile
+
+@cache
+def bayer_thresholds(size: int, width: int, height: int) -> Any:
+	import PIL.Image
+
+	tile = bayer_tile(size)
+	thresholds = PIL.Image.new('L', (width, height))
+	for y in range(0, height, size):
+		for x in range(0, width, size):
+			thresholds.paste(tile, (x, y))
+	return thresholds
+
+@dataclass
+class FoconImagePreparer:
+	# Turns images of any size and mode into bitmaps for a drawing area. All pixel work is done by PIL, in C.
+	# LED pitch is the horizontal and vertical distance between LEDs: on displays with non-square pixels,
+	# scaling keeps the physical aspect ratio of the image instead of the pixel one.
+	#
+	# Results are cached per source frame content and preparation settings, so showing the same content again
+	# costs a hash of its pixels. Preparers can be passed to worker processes; each gets its own cache.
+	width:      int
+	height:     int
+	scaling:    FoconScaling = FoconScaling.Fit
+	dithering:  FoconDithering = FoconDithering.ErrorDiffusion
+	threshold:  int = 128
+	bayer_size: int = 4
+	pitch:      tuple[float, float] = (1.0, 1.0)
+	cache_size: int = 64
+	cache:      OrderedDict[tuple[Any, ...], FoconBitmap] = field(default_factory=OrderedDict, init=False, repr=False, compare=False)
+	lock:       threading.Lock = field(default_factory=threading.Lock, init=False, repr=False, compare=False)
+
+	@classmethod
+	def for_config(cls, config: FoconDisplayConfiguration, **kwargs: Any) -> 'FoconImagePreparer':
+		return cls(width=config.width, height=config.height, **kwargs)
+
+	def __getstate__(self) -> dict[str, Any]:
+		state = dict(self.__dict__)
+		del state['cache'], state['lock']
+		return state
+
+	def __setstate__(self, state: dict[str, Any]) -> None:
+		self.__dict__.update(state, cache=OrderedDict(), lock=threading.Lock())
+
+	@property
+	def settings(self) -> tuple[Any, ...]:
+		return (self.width, self.height, self.scaling, self.dithering, self.threshold, self.bayer_size, self.pitch)
+
+	## Stages
+
+	@staticmethod
+	def grayscale(image: Any) -> Any:
+		import PIL.Image
+
+		if image.mode in ('L', '1'):
+			return image.convert('L') if image.mode == '1' else image
+		if 'A' in image.getbands() or 'transparency' in image.info:
+			# transparent areas are off
+			rgba = image.convert('RGBA')
+			background = PIL.Image.new('RGBA', rgba.size, (0, 0, 0, 255))
+			image = PIL.Image.alpha_composite(background, rgba)
+		return image.convert('L')
+
+	def scale(self, image: Any) -> Any:
+		import PIL.Image
+
+		if image.size == (self.width, self.height):
+			return image
+		if self.scaling == FoconScaling.Stretch:
+			return image.resize((self.width, self.height), PIL.Image.Resampling.LANCZOS)
+
+		if self.scaling != FoconScaling.Crop:
+			# work in physical units: one display pixel is `aspect` times as wide as it is high
+			aspect = self.pitch[0] / self.pitch[1]
+			factors = (self.width * aspect / image.width, self.height / image.height)
+			factor = min(factors) if self.scaling == FoconScaling.Fit else max(factors)
+			size = (max(1, round(image.width * factor / aspect)), max(1, round(image.height * factor)))
+			if size != image.size:
+				image = image.resize(size, PIL.Image.Resampling.LANCZOS)
+
+		canvas = PIL.Image.new('L', (self.width, self.height))
+		canvas.paste(image, ((self.width - image.width) // 2, (self.height - image.height) // 2))
+		return canvas
+
+	def dither(self, image: Any) -> Any:
+		import PIL.Image
+		import PIL.ImageChops
+
+		if self.dithering == FoconDithering.ErrorDiffusion:
+			return image.convert('1', dither=PIL.Image.Dither.FLOYDSTEINBERG)
+		if self.dithering == FoconDithering.Bayer:
+			# lit where the pixel is brighter than its spot in the tiled threshold matrix
+			image = PIL.ImageChops.subtract(image, bayer_thresholds(self.bayer_size, image.width, image.height))
+			return image.point([0] + [255] * 255, '1')
+		return image.point([255 if v >= self.threshold else 0 for v in range(256)], '1')
+
+	## Preparation
+
+	def key_of(self, image: Any) -> tuple[Any, ...]:
+		digest = hashlib.blake2b(image.tobytes(), digest_size=16)
+		digest.update(repr((image.mode, image.size, image.info.get('transparency'))).encode())
+		# palette images with the same indices can look entirely different
+		palette = image.getpalette()
+		if palette:
+			digest.update(bytes(palette))
+		return (digest.digest(),) + self.settings
+
+	def prepare(self, image: Any) -> FoconBitmap:
+		return FoconBitmap.from_image(self.dither(self.scale(self.grayscale(image))))
+
+	def __call__(self, image: Any) -> FoconBitmap:
+		if not self.cache_size:
+			return self.prepare(image)
+
+		key = self.key_of(image)
+		with self.lock:
+			bitmap = self.cache.get(key)
+			if bitmap is not None:
+				self.cache.move_to_end(key)
+				return bitmap
+		bitmap = self.prepare(image)
+		with self.lock:
+			self.cache[key] = bitmap
+			while len(self.cache) > self.cache_size:
+				self.cache.popitem(last=False)
+		return bitmap
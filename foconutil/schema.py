@@ -0,0 +1,570 @@
+from typing import Any, Callable, ClassVar, Iterable, Sequence, Type, TypeVar
+from enum import Enum
+from struct import Struct
+
+
+
+T = TypeVar('T')
+
+def identity(value: Any) -> Any:
+	return value
+
+
+class Field:
+	# A fixed-size field, made up of one or more struct items
+	variable = False
+
+	def __init__(self, fmt: str, encode: Callable[[Any], Any] = identity, decode: Callable[[Any], Any] = identity, default: Any = 0) -> None:
+		self.fmt = fmt
+		self.encoder = encode
+		self.decoder = decode
+		self.default = default
+		self.count = len(Struct('>' + fmt).unpack(bytes(Struct('>' + fmt).size)))
+
+	@property
+	def size(self) -> int:
+		return Struct('>' + self.fmt).size
+
+	def encode(self, value: Any) -> Sequence[Any]:
+		return (self.encoder(value),)
+
+	def decode(self, items: Sequence[Any]) -> Any:
+		return self.decoder(items[0])
+
+class VariableField:
+	# A field of variable size, which can only be the last field in a layout: by itself, the raw remaining data
+	variable = True
+	fmt = ''
+	count = 0
+	default: Any = b''
+
+	def encode_tail(self, value: Any) -> bytes:
+		return bytes(value)
+
+	def decode_tail(self, data: bytes) -> tuple[Any, bytes]:
+		return bytes(data), b''
+
+
+## Scalars
+
+U8  = Field('B')
+U16 = Field('H')
+U32 = Field('I')
+Bool = Field('B', encode=int, decode=bool)
+
+def Scaled(fmt: str, scale: float) -> Field:
+	return Field(fmt, encode=lambda v: round(v * scale), decode=lambda v: v / scale)
+
+def Char() -> Field:
+	return Field('c', encode=lambda v: v.encode('ascii'), decode=lambda v: v.decode('ascii'), default='\0')
+
+def EnumField(cls: Type[Enum], fmt: str = 'B') -> Field:
+	return Field(fmt, encode=lambda v: v.value, decode=cls)
+
+def CharEnum(cls: Type[Enum]) -> Field:
+	return Field('c', encode=lambda v: v.value.encode('ascii'), decode=lambda v: cls(v.decode('ascii')))
+
+def Bytes(size: int) -> Field:
+	return Field(f'{size}s', default=b'')
+
+def Str(size: int, encoding: str = 'iso-8859-15') -> Field:
+	def encode(s: str) -> bytes:
+		sb = s.encode(encoding)
+		if len(sb) > size:
+			raise ValueError('over-sized string: {} can not fit in {} bytes'.format(s, size))
+		return sb
+
+	def decode(data: bytes) -> str:
+		if b'\0' in data:
+			data = data[:data.index(b'\0')]
+		return data.decode(encoding)
+
+	return Field(f'{size}s', encode=encode, decode=decode, default='')
+
+def IntStr(size: int) -> Field:
+	s = Str(size, encoding='ascii')
+	return Field(f'{size}s', encode=lambda v: s.encoder(str(v)), decode=lambda v: int(s.decoder(v) or '0'))
+
+def Version(optional: bool = False) -> Field:
+	def encode(ver: tuple[int, int] | None) -> bytes:
+		if ver is None:
+			return b'???'
+		return '{}{:02}'.format(*ver).encode('ascii')
+
+	def decode(data: bytes) -> tuple[int, int] | None:
+		if optional and data == b'???':
+			return None
+		return int(data[0:1].decode('ascii'), 10), int(data[1:3].decode('ascii'), 10)
+
+	return Field('3s', encode=encode, decode=decode)
+
+def Reserved(fmt: str = 'B', value: Any = 0) -> Field:
+	return Field(fmt, default=value)
+
+
+## Compound fields
+
+class Nested(Field):
+	def __init__(self, layout: 'Layout') -> None:
+		self.layout = layout
+		self.fmt = layout.fmt
+		self.count = layout.count
+		self.default = None
+
+	def encode(self, value: Any) -> Sequence[Any]:
+		return self.layout.to_items(value)
+
+	def decode(self, items: Sequence[Any]) -> Any:
+		return self.layout.from_items(items)
+
+class Array(Field):
+	def __init__(self, field: Field, length: int, fill: Callable[[], Any] | None = None) -> None:
+		self.field = field
+		self.length = length
+		self.fill = fill
+		self.fmt = field.fmt * length
+		self.count = field.count * length
+		self.default: Any = []
+		# entries that are struct items as-is
+		self.plain = type(field) is Field and field.count == 1 and field.encoder is identity
+
+	def pad(self, values: list[Any]) -> list[Any]:
+		if self.fill is None:
+			raise ValueError(f'not enough entries: {len(values)} < {self.length}')
+		return values + [self.fill() for _ in range(self.length - len(values))]
+
+	def encode(self, value: Any) -> Sequence[Any]:
+		values = list(value)
+		if len(values) > self.length:
+			raise ValueError(f'too many entries: {len(values)} > {self.length}')
+		if len(values) < self.length:
+			values = self.pad(values)
+		if self.plain:
+			return values
+		items: list[Any] = []
+		for v in values:
+			items.extend(self.field.encode(v))
+		return items
+
+	def decode(self, items: Sequence[Any]) -> Any:
+		n = self.field.count
+		return [self.field.decode(items[i * n:(i + 1) * n]) for i in range(self.length)]
+
+class Counted(Array):
+	# Array prefixed with the amount of entries in use
+	def __init__(self, field: Field, length: int, fill: Callable[[], Any] | None = None, count_fmt: str = 'B') -> None:
+		super().__init__(field, length, fill=fill)
+		self.fmt = count_fmt + self.fmt
+		self.count += 1
+
+	def pad(self, values: list[Any]) -> list[Any]:
+		if self.fill is None:
+			# unused entries are never read back, any shared value will do
+			return values + [self.field.default] * (self.length - len(values))
+		return super().pad(values)
+
+	def encode(self, value: Any) -> Sequence[Any]:
+		items = list(super().encode(value))
+		items.insert(0, len(value))
+		return items
+
+	def decode(self, items: Sequence[Any]) -> Any:
+		return super().decode(items[1:])[:items[0]]
+
+class Tail(VariableField):
+	# Remaining data, optionally converted
+	def __init__(self, encode: Callable[[Any], bytes] = bytes, decode: Callable[[bytes], Any] = bytes, default: Any = b'') -> None:
+		self.encoder = encode
+		self.decoder = decode
+		self.default = default
+
+	def encode_tail(self, value: Any) -> bytes:
+		return self.encoder(value)
+
+	def decode_tail(self, data: bytes) -> tuple[Any, bytes]:
+		return self.decoder(data), b''
+
+class CountedTail(VariableField):
+	# Amount of entries, followed by exactly that many entries
+	def __init__(self, field: Field, count_fmt: str = 'B') -> None:
+		self.field = field
+		self.count_struct = Struct('>' + count_fmt)
+		self.entry_struct = Struct('>' + field.fmt)
+		self.default: Any = []
+
+	def encode_tail(self, value: Any) -> bytes:
+		b = bytearray(self.count_struct.pack(len(value)))
+		for v in value:
+			b += self.entry_struct.pack(*self.field.encode(v))
+		return bytes(b)
+
+	def decode_tail(self, data: bytes) -> tuple[Any, bytes]:
+		if len(data) < self.count_struct.size:
+			raise ValueError('truncated data: missing entry count')
+		(n,) = self.count_struct.unpack_from(data)
+		end = self.count_struct.size + n * self.entry_struct.size
+		if len(data) < end:
+			raise ValueError(f'truncated data: {len(data)} bytes, {n} entries need {end}')
+		return [self.field.decode(items) for items in self.entry_struct.iter_unpack(data[self.count_struct.size:end])], data[end:]
+
+class NestedTail(VariableField):
+	def __init__(self, layout: 'Layout') -> None:
+		self.layout = layout
+		self.default = None
+
+	def encode_tail(self, value: Any) -> bytes:
+		return self.layout.pack(value)
+
+	def decode_tail(self, data: bytes) -> tuple[Any, bytes]:
+		return self.layout.unpack_partial(data)
+
+
+## Layouts
+
+class Layout:
+	# Describes a packet structure once, for packing and unpacking to be derived from. Fixed-size fields map onto
+	# a single struct; once the class a layout belongs to is known, it is compiled into straight-line functions
+	# converting between that class and the struct's items, so it packs and unpacks as fast as hand-written code.
+	def __init__(self, fields: Iterable[tuple[str | None, Field | VariableField]], byte_order: str = '>',
+	             encode_hook: Callable[[Any], dict[str, Any]] | None = None,
+	             decode_hook: Callable[[dict[str, Any]], dict[str, Any]] | None = None) -> None:
+		self.fields = list(fields)
+		self.byte_order = byte_order
+		self.encode_hook = encode_hook
+		self.decode_hook = decode_hook
+		self.cls: type | None = None
+
+		self.tail: tuple[str | None, VariableField] | None = None
+		if self.fields and self.fields[-1][1].variable:
+			name, tail = self.fields.pop()
+			assert isinstance(tail, VariableField)
+			self.tail = (name, tail)
+		if any(f.variable for _, f in self.fields):
+			raise ValueError('only the last field can have a variable size')
+
+		self.fixed: list[tuple[str | None, Field]] = [(n, f) for n, f in self.fields if isinstance(f, Field)]
+		self.fmt = ''.join(f.fmt for _, f in self.fixed)
+		self.count = sum(f.count for _, f in self.fixed)
+		self.struct = Struct(byte_order + self.fmt)
+
+	def __set_name__(self, owner: type, name: str) -> None:
+		self.cls = owner
+		LayoutCompiler(self).install()
+
+	def extend(self, fields: Iterable[tuple[str | None, Field | VariableField]], **kwargs: Any) -> 'Layout':
+		base = self.fixed + ([self.tail] if self.tail else [])
+		return Layout(base + list(fields), byte_order=self.byte_order, **kwargs)
+
+	@property
+	def size(self) -> int:
+		return self.struct.size
+
+	def check_size(self, data: Any, offset: int = 0) -> None:
+		if len(data) - offset < self.struct.size:
+			raise ValueError(f'truncated data: {len(data) - offset} bytes, expected at least {self.struct.size}')
+
+	## Conversion between objects and struct items
+	# Generic versions, replaced by compiled ones on layouts that belong to a class
+
+	def values_of(self, obj: Any) -> dict[str, Any]:
+		values = {}
+		if self.encode_hook:
+			values.update(self.encode_hook(obj))
+		for name, field in self.fields + ([self.tail] if self.tail else []):
+			if name is None or name in values:
+				continue
+			values[name] = getattr(obj, name) if hasattr(obj, name) else field.default
+		return values
+
+	def to_items(self, obj: Any, values: dict[str, Any] | None = None) -> list[Any]:
+		if values is None:
+			values = self.values_of(obj)
+		items: list[Any] = []
+		for name, field in self.fixed:
+			items.extend(field.encode(field.default if name is None else values[name]))
+		return items
+
+	def build(self, values: dict[str, Any]) -> Any:
+		if self.decode_hook:
+			values = self.decode_hook(values)
+		values = {k: v for k, v in values.items() if not k.startswith('_')}
+		assert self.cls is not None
+		return self.cls(**values)
+
+	def decode_items(self, items: Sequence[Any]) -> dict[str, Any]:
+		values = {}
+		i = 0
+		for name, field in self.fixed:
+			value = field.decode(items[i:i + field.count])
+			i += field.count
+			if name is not None:
+				values[name] = value
+		return values
+
+	def from_items(self, items: Sequence[Any]) -> Any:
+		return self.build(self.decode_items(items))
+
+	## Binary encoding
+
+	def pack(self, obj: Any) -> bytes:
+		values = self.values_of(obj)
+		data = self.struct.pack(*self.to_items(obj, values))
+		if self.tail:
+			name, tail = self.tail
+			data += tail.encode_tail(tail.default if name is None else values[name])
+		return data
+
+	def pack_into(self, buffer: Any, offset: int, obj: Any) -> int:
+		values = self.values_of(obj)
+		self.struct.pack_into(buffer, offset, *self.to_items(obj, values))
+		offset += self.struct.size
+		if self.tail:
+			name, tail = self.tail
+			data = tail.encode_tail(tail.default if name is None else values[name])
+			buffer[offset:offset + len(data)] = data
+			offset += len(data)
+		return offset
+
+	def unpack_partial(self, data: bytes) -> tuple[Any, bytes]:
+		self.check_size(data)
+		values = self.decode_items(self.struct.unpack_from(data))
+		data = data[self.struct.size:]
+		if self.tail:
+			name, tail = self.tail
+			value, data = tail.decode_tail(data)
+			if name is not None:
+				values[name] = value
+		return self.build(values), data
+
+	def unpack_from(self, buffer: Any, offset: int = 0) -> Any:
+		self.check_size(buffer, offset)
+		values = self.decode_items(self.struct.unpack_from(buffer, offset))
+		if self.tail:
+			name, tail = self.tail
+			value, _ = tail.decode_tail(bytes(buffer[offset + self.struct.size:]))
+			if name is not None:
+				values[name] = value
+		return self.build(values)
+
+	def unpack(self, data: bytes) -> Any:
+		return self.unpack_from(data)
+
+def without(values: dict[str, Any], names: tuple[str, ...]) -> dict[str, Any]:
+	for name in names:
+		values.pop(name, None)
+	return values
+
+class LayoutCompiler:
+	# Generates the source of packing and unpacking functions for a layout bound to a class. Field conversions are
+	# inlined as expressions on the struct items, nested layouts and arrays of them included; only conversions that
+	# can't be expressed that way fall back to calling the field.
+	def __init__(self, layout: Layout) -> None:
+		self.layout = layout
+		self.env: dict[str, Any] = {}
+		self.names = 0
+		# struct items that can be sliced out of a tuple, by name
+		self.slices: dict[str, tuple[str, int]] = {}
+
+	def ref(self, value: Any) -> str:
+		# a name for a value the generated code needs
+		for name, v in self.env.items():
+			if v is value:
+				return name
+		name = f'_r{len(self.env)}'
+		self.env[name] = value
+		return name
+
+	def local(self) -> str:
+		self.names += 1
+		return f'_v{self.names}'
+
+	## Encoding
+
+	def encode_items(self, field: Field, value: str, lines: list[str]) -> list[str]:
+		# expressions for the struct items of a field, given an expression for its value
+		if isinstance(field, Nested) and not field.layout.encode_hook:
+			obj = self.local()
+			lines.append(f'{obj} = {value}')
+			return self.encode_fields(field.layout, obj, None, lines)
+		if isinstance(field, (Nested, Array)):
+			return [f'*{self.ref(field.encode)}({value})']
+		if field.encoder is identity:
+			return [value]
+		return [f'{self.ref(field.encoder)}({value})']
+
+	def value_of(self, name: str | None, field: Field | VariableField, obj: str, hooked: str | None) -> str:
+		if name is None:
+			return self.ref(field.default)
+		if name.startswith('_'):
+			# usually not an attribute of the object
+			fallback = f'getattr({obj}, {name!r}, {self.ref(field.default)})'
+		else:
+			fallback = f'{obj}.{name}'
+		if hooked is None:
+			return fallback
+		return f'({hooked}[{name!r}] if {name!r} in {hooked} else {fallback})'
+
+	def encode_fields(self, layout: Layout, obj: str, hooked: str | None, lines: list[str]) -> list[str]:
+		items = []
+		for name, field in layout.fixed:
+			value = self.value_of(name, field, obj, hooked)
+			if name is not None and hooked is not None:
+				local = self.local()
+				lines.append(f'{local} = {value}')
+				value = local
+			items += self.encode_items(field, value, lines)
+		return items
+
+	def encode_prologue(self) -> tuple[list[str], list[str], str | None]:
+		layout = self.layout
+		lines: list[str] = []
+		hooked = None
+		if layout.encode_hook:
+			hooked = '_hooked'
+			lines.append(f'{hooked} = {self.ref(layout.encode_hook)}(obj)')
+		items = self.encode_fields(layout, 'obj', hooked, lines)
+		tail = None
+		if layout.tail:
+			name, field = layout.tail
+			tail = f'{self.ref(field.encode_tail)}({self.value_of(name, field, "obj", hooked)})'
+		return lines, items, tail
+
+	def compile_pack(self) -> str:
+		lines, items, tail = self.encode_prologue()
+		packed = f'{self.ref(self.layout.struct.pack)}({", ".join(items)})'
+		if tail:
+			packed += f' + {tail}'
+		return self.function('pack', 'obj', lines + [f'return {packed}'])
+
+	def compile_pack_into(self) -> str:
+		lines, items, tail = self.encode_prologue()
+		lines.append(f'{self.ref(self.layout.struct.pack_into)}(buffer, offset, {"".join(i + ", " for i in items)})')
+		lines.append(f'offset += {self.layout.struct.size}')
+		if tail:
+			lines += [
+				f'_tail = {tail}',
+				'buffer[offset:offset + len(_tail)] = _tail',
+				'offset += len(_tail)',
+			]
+		return self.function('pack_into', 'buffer, offset, obj', lines + ['return offset'])
+
+	def compile_to_items(self) -> str:
+		lines, items, _ = self.encode_prologue()
+		return self.function('to_items', 'obj, values=None', lines + [f'return [{", ".join(items)}]'])
+
+	## Decoding
+
+	def decode_value(self, field: Field, items: list[str]) -> str:
+		# an expression for the value of a field, given the names of its struct items
+		if isinstance(field, Nested) and not field.layout.decode_hook:
+			return self.decode_object(field.layout, items, None)
+		if isinstance(field, Counted):
+			entries = self.decode_value(Array(field.field, field.length), items[1:])
+			return f'{entries}[:{items[0]}]'
+		if isinstance(field, Array) and self.decodes_plain(field.field) and items[0] in self.slices:
+			# straight from the unpacked tuple
+			source, start = self.slices[items[0]]
+			return f'list({source}[{start}:{start + len(items)}])'
+		if isinstance(field, Array):
+			n = field.field.count
+			return '[' + ', '.join(self.decode_value(field.field, items[i * n:(i + 1) * n]) for i in range(field.length)) + ']'
+		if isinstance(field, Nested):
+			return f'{self.ref(field.decode)}(({"".join(i + ", " for i in items)}))'
+		if field.decoder is identity:
+			return items[0]
+		return f'{self.ref(field.decoder)}({items[0]})'
+
+	@staticmethod
+	def decodes_plain(field: Field) -> bool:
+		return type(field) is Field and field.count == 1 and field.decoder is identity
+
+	def decode_values(self, layout: Layout, items: list[str], tail: str | None) -> list[tuple[str, str]]:
+		values = []
+		i = 0
+		for name, field in layout.fixed:
+			if name is not None:
+				values.append((name, self.decode_value(field, items[i:i + field.count])))
+			i += field.count
+		if layout.tail and tail and layout.tail[0] is not None:
+			values.append((layout.tail[0], tail))
+		return values
+
+	def decode_object(self, layout: Layout, items: list[str], tail: str | None) -> str:
+		assert layout.cls is not None
+		values = self.decode_values(layout, items, tail)
+		if layout.decode_hook:
+			hooked = f'{self.ref(layout.decode_hook)}({{{", ".join(f"{n!r}: {v}" for n, v in values)}}})'
+			private = tuple(n for n, _ in values if n.startswith('_'))
+			if private:
+				hooked = f'{self.ref(without)}({hooked}, {private!r})'
+			return f'{self.ref(layout.cls)}(**{hooked})'
+		return f'{self.ref(layout.cls)}({", ".join(f"{n}={v}" for n, v in values if not n.startswith("_"))})'
+
+	def compile_unpack(self, name: str, args: str, data: str, offset: str, partial: bool = False) -> str:
+		layout = self.layout
+		size = layout.struct.size
+		items = [f'_t[{i}]' for i in range(layout.count)]
+		self.slices = {item: ('_t', i) for i, item in enumerate(items)}
+		lines = [
+			f'if len({data}) - {offset} < {size}:',
+			f'	raise ValueError(f"truncated data: {{len({data}) - {offset}}} bytes, expected at least {size}")',
+		]
+		if items:
+			lines.append(f'_t = {self.ref(layout.struct.unpack_from)}({data}, {offset})')
+		tail = None
+		if layout.tail:
+			tail = '_tail'
+			lines.append(f'_tail, _rest = {self.ref(layout.tail[1].decode_tail)}(bytes({data}[{offset} + {size}:]))')
+		elif partial:
+			lines.append(f'_rest = {data}[{offset} + {size}:]')
+		result = self.decode_object(layout, items, tail)
+		return self.function(name, args, lines + [f'return {result}, _rest' if partial else f'return {result}'])
+
+	def compile_from_items(self) -> str:
+		items = [f'items[{i}]' for i in range(self.layout.count)]
+		self.slices = {item: ('items', i) for i, item in enumerate(items)}
+		return self.function('from_items', 'items', [f'return {self.decode_object(self.layout, items, None)}'])
+
+	## Assembly
+
+	def function(self, name: str, args: str, lines: list[str]) -> str:
+		return f'def {name}({args}):\n' + ''.join(f'\t{line}\n' for line in lines)
+
+	def install(self) -> None:
+		sources = [
+			self.compile_pack(),
+			self.compile_pack_into(),
+			self.compile_to_items(),
+			self.compile_from_items(),
+			self.compile_unpack('unpack', 'data', 'data', '0'),
+			self.compile_unpack('unpack_from', 'buffer, offset=0', 'buffer', 'offset'),
+			self.compile_unpack('unpack_partial', 'data', 'data', '0', partial=True),
+		]
+		namespace = dict(self.env)
+		cls = self.layout.cls
+		assert cls is not None
+		exec(compile('\n'.join(sources), f'<layout of {cls.__module__}.{cls.__qualname__}>', 'exec'), namespace)
+		for name in ('pack', 'pack_into', 'to_items', 'from_items', 'unpack', 'unpack_from', 'unpack_partial'):
+			setattr(self.layout, name, namespace[name])
+
+
+class FoconStruct:
+	LAYOUT: ClassVar[Layout]
+
+	def pack(self) -> bytes:
+		return self.LAYOUT.pack(self)
+
+	def pack_into(self, buffer: Any, offset: int = 0) -> int:
+		return self.LAYOUT.pack_into(buffer, offset, self)
+
+	@classmethod
+	def unpack(cls: Type[T], data: bytes) -> T:
+		return cls.LAYOUT.unpack(data)  # type: ignore[attr-defined, no-any-return]
+
+	@classmethod
+	def unpack_from(cls: Type[T], buffer: Any, offset: int = 0) -> T:
+		return cls.LAYOUT.unpack_from(buffer, offset)  # type: ignore[attr-defined, no-any-return]
+
+	@classmethod
+	def sizeof(cls) -> int:
+		return cls.LAYOUT.size
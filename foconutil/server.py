@@ -0,0 +1,211 @@
+from typing import Any, Callable, Iterator
+from logging import getLogger
+
+import os
+import types
+import pickle
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Listener, Client, Connection
+
+from .message import FoconMessageBus
+from .devices.device import FoconDevice, is_dangerous
+from .devices.display import FoconDisplay
+from .devices.bootloader import FoconBootDevice
+
+LOG = getLogger(__name__)
+
+
+TARGET_KINDS: dict[str, Callable[[FoconDevice], Any]] = {
+	'device': lambda device: device,
+	'display': FoconDisplay,
+	'boot': FoconBootDevice,
+}
+
+# Raw commands can do anything, so they count as dangerous just like the methods marked @dangerous.
+RAW_METHODS = frozenset({'send_command', 'send_commands'})
+# what clients may call on every kind of target
+TARGET_METHODS: dict[str, frozenset[str]] = {
+	'device': frozenset({'get_device_info'}) | RAW_METHODS,
+	'display': frozenset({
+		'get_device_info', 'get_display_info', 'get_status', 'get_current_config', 'use_config', 'get_config',
+		'trigger_selftest', 'hide', 'draw', 'draw_bitmap', 'fill', 'print', 'undraw', 'redraw',
+		'get_asset_data', 'verify_asset_data', 'dump', 'get_memory_stats', 'get_network_stats', 'get_task_stats', 'get_sensor_stats',
+		'self_destruct', 'set_config', 'set_unk47', 'get_asset_font', 'reset_asset_data', 'set_asset_data',
+	}) | RAW_METHODS,
+	'boot': frozenset({'get_device_info', 'launch', 'write_flash', 'write_app'}),
+}
+
+def default_socket_path() -> str:
+	runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+	if not runtime_dir:
+		# anywhere shared, like /tmp, someone else could be listening there first
+		raise RuntimeError('XDG_RUNTIME_DIR is not set, pass a socket path in a directory only you can write to')
+	return os.path.join(runtime_dir, 'focon-util.sock')
+
+class FoconClientGone(Exception):
+	pass
+
+class FoconServedBus:
+	# A bus kept open by the server. Requests for its devices run one at a time, in order of arrival.
+	def __init__(self, path: str, bus: FoconMessageBus) -> None:
+		self.path = path
+		self.bus = bus
+		self.queue = ThreadPoolExecutor(max_workers=1, thread_name_prefix='focon-bus')
+		self.targets: dict[tuple[str, int], Any] = {}
+
+	def target(self, kind: str, dest_id: int) -> Any:
+		key = (kind, dest_id)
+		if key not in self.targets:
+			# kept around, so e.g. the display configuration is only read once
+			self.targets[key] = TARGET_KINDS[kind](FoconDevice(self.bus, dest_id))
+		return self.targets[key]
+
+class FoconServer:
+	# Owns the serial ports, and runs display and bootloader operations for clients on a Unix domain socket.
+	# Requests and replies are pickled, so the socket is only accessible to the user running the server.
+	# Only the methods in TARGET_METHODS are run, and the dangerous ones only with `allow_dangerous`.
+	def __init__(self, path: str, open_bus: Callable[[str], FoconMessageBus], devices: list[str], allow_dangerous: bool = False) -> None:
+		self.path = path
+		self.open_bus = open_bus
+		self.devices = devices
+		self.allow_dangerous = allow_dangerous
+		self.buses: dict[str, FoconServedBus] = {}
+		self.lock = threading.Lock()
+		self.listener: Listener | None = None
+
+	def get_bus(self, device: str) -> FoconServedBus:
+		if device not in self.devices:
+			raise ValueError(f'device not served: {device}')
+		with self.lock:
+			if device not in self.buses:
+				self.buses[device] = FoconServedBus(device, self.open_bus(device))
+			return self.buses[device]
+
+	@staticmethod
+	def send(conn: Connection, kind: str, value: Any) -> None:
+		# tells losing the client apart from errors of the request itself
+		try:
+			conn.send((kind, value))
+		except (EOFError, OSError) as e:
+			raise FoconClientGone(e) from e
+
+	def call(self, conn: Connection, bus: FoconServedBus, kind: str, dest_id: int, method: str, args: tuple[Any, ...], kwargs: dict[str, Any]) -> None:
+		if method not in TARGET_METHODS.get(kind, ()):
+			raise AttributeError(f'{kind} method not served: {method}')
+		function = getattr(bus.target(kind, dest_id), method)
+		if not self.allow_dangerous and (method in RAW_METHODS or is_dangerous(function)):
+			raise PermissionError(f'{kind} method {method} is dangerous, and not allowed by this server')
+		result = function(*args, **kwargs)
+		if isinstance(result, types.GeneratorType):
+			# progress is passed on as it happens, the bus stays ours until the generator is done
+			self.send(conn, 'iterate', None)
+			for value in result:
+				self.send(conn, 'yield', value)
+			result = None
+		self.send(conn, 'return', result)
+
+	def handle(self, conn: Connection) -> None:
+		with conn:
+			while True:
+				try:
+					device, kind, dest_id, method, args, kwargs = conn.recv()
+				except (EOFError, OSError):
+					break
+				try:
+					bus = self.get_bus(device)
+					bus.queue.submit(self.call, conn, bus, kind, dest_id, method, args, kwargs).result()
+				except FoconClientGone as e:
+					LOG.debug('lost client: %s', e)
+					break
+				except Exception as e:
+					# bus errors (IOError and the like) included, they are the client's to handle
+					LOG.debug('request %s.%s failed: %s', kind, method, e)
+					try:
+						pickle.dumps(e)
+					except Exception:
+						e = RuntimeError(repr(e))
+					try:
+						self.send(conn, 'raise', e)
+					except FoconClientGone as gone:
+						LOG.debug('lost client: %s', gone)
+						break
+
+	def remove_stale_socket(self) -> None:
+		if not os.path.exists(self.path):
+			return
+		try:
+			Client(self.path, family='AF_UNIX').close()
+		except ConnectionRefusedError:
+			os.unlink(self.path)
+		else:
+			raise RuntimeError(f'server already running on {self.path}')
+
+	def serve_forever(self) -> None:
+		self.remove_stale_socket()
+		umask = os.umask(0o177)
+		try:
+			self.listener = Listener(self.path, family='AF_UNIX')
+		finally:
+			os.umask(umask)
+		LOG.info('serving %s on %s', ', '.join(self.devices), self.path)
+		try:
+			while True:
+				conn = self.listener.accept()
+				threading.Thread(target=self.handle, args=(conn,), name='focon-client', daemon=True).start()
+		finally:
+			self.close()
+
+	def close(self) -> None:
+		if self.listener:
+			self.listener.close()
+			self.listener = None
+		for bus in self.buses.values():
+			bus.queue.shutdown(wait=False, cancel_futures=True)
+
+class FoconRemoteTarget:
+	# Stand-in for a FoconDevice, FoconDisplay or FoconBootDevice held by a server: method calls are run remotely
+	def __init__(self, path: str, device: str, kind: str, dest_id: int) -> None:
+		self._path = path
+		self._device = device
+		self._kind = kind
+		self._dest_id = dest_id
+		self._conn: Connection | None = None
+
+	def _connection(self) -> Connection:
+		if not self._conn:
+			# replies are unpickled, only trust a server run by ourselves
+			if os.stat(self._path).st_uid != os.getuid():
+				raise PermissionError(f'{self._path} belongs to another user')
+			self._conn = Client(self._path, family='AF_UNIX')
+		return self._conn
+
+	def _call(self, method: str, args: tuple[Any, ...], kwargs: dict[str, Any]) -> Any:
+		conn = self._connection()
+		conn.send((self._device, self._kind, self._dest_id, method, args, kwargs))
+		kind, value = conn.recv()
+		if kind == 'iterate':
+			return self._iterate()
+		if kind == 'raise':
+			raise value
+		return value
+
+	def _iterate(self) -> Iterator[Any]:
+		conn = self._connection()
+		while True:
+			kind, value = conn.recv()
+			if kind == 'raise':
+				raise value
+			if kind == 'return':
+				return
+			yield value
+
+	def __getattr__(self, name: str) -> Callable[..., Any]:
+		if name.startswith('_'):
+			raise AttributeError(name)
+		return lambda *args, **kwargs: self._call(name, args, kwargs)
+
+	def close(self) -> None:
+		if self._conn:
+			self._conn.close()
+			self._conn = None
@@ -0,0 +1,192 @@
+from typing import Any, Callable
+from logging import getLogger
+
+import os
+import sys
+import mmap
+import time
+from struct import Struct
+
+from .bitmap import FoconBitmap, column_stride
+from .util import FoconBuffer
+from .devices.display import FoconDisplay, FoconDisplayCommand, FoconDisplayDrawSpec, FoconDisplayDrawStatus, FoconDisplayBitmapObject
+
+LOG = getLogger(__name__)
+
+
+# magic, version, slots, width, height, sequence number of the latest complete frame
+HEADER = Struct('<4sHHHH4xQ')
+SEQUENCE = Struct('<Q')
+MAGIC = b'FCFR'
+VERSION = 1
+# a producer that died while writing leaves its slot marked odd for good
+TORN_READ_LIMIT = 100
+
+def bitmap_size(width: int, height: int) -> int:
+	return width * column_stride(height)
+
+class FoconSharedFrameRing:
+	# Ring of 1-bit frames in shared memory, written by a single producer process and read by any number of others.
+	# Frames are stored in the exact layout of FoconBitmap.data, so they can be copied into a DrawPixels payload as-is.
+	#
+	# Every slot is guarded by a sequence lock: the producer marks a slot odd while writing it, and even once done,
+	# readers retry when the mark changed while they were copying.
+	def __init__(self, buffer: Any, closer: Callable[[], None] | None = None, unlinker: Callable[[], None] | None = None) -> None:
+		self.buf = memoryview(buffer)
+		self.closer = closer
+		self.unlinker = unlinker
+		magic, version, slots, width, height, _ = HEADER.unpack_from(self.buf)
+		if magic != MAGIC or version != VERSION:
+			raise ValueError('not a Focon frame ring')
+		self.slots: int = slots
+		self.width: int = width
+		self.height: int = height
+		self.frame_size = bitmap_size(self.width, self.height)
+		# sequence number and frame, 8-byte aligned
+		self.slot_size = (SEQUENCE.size + self.frame_size + 7) // 8 * 8
+
+	@staticmethod
+	def size_for(width: int, height: int, slots: int) -> int:
+		return HEADER.size + slots * ((SEQUENCE.size + bitmap_size(width, height) + 7) // 8 * 8)
+
+	@staticmethod
+	def init_buffer(buffer: Any, width: int, height: int, slots: int) -> None:
+		buffer[:] = bytes(len(buffer))
+		HEADER.pack_into(buffer, 0, MAGIC, VERSION, slots, width, height, 0)
+
+	## Backing storage
+
+	@classmethod
+	def create_shared(cls, name: str, width: int, height: int, slots: int = 3) -> 'FoconSharedFrameRing':
+		from multiprocessing.shared_memory import SharedMemory
+
+		shm = SharedMemory(name, create=True, size=cls.size_for(width, height, slots))
+		cls.init_buffer(shm.buf, width, height, slots)
+		return cls(shm.buf, closer=shm.close, unlinker=shm.unlink)
+
+	@classmethod
+	def open_shared(cls, name: str) -> 'FoconSharedFrameRing':
+		from multiprocessing.shared_memory import SharedMemory
+
+		# only the creator should get to remove it
+		if sys.version_info >= (3, 13):
+			shm = SharedMemory(name, track=False)
+		else:
+			from multiprocessing import resource_tracker
+
+			# before Python 3.13, opening registers the block to be removed when this process exits
+			shm = SharedMemory(name)
+			resource_tracker.unregister(shm._name, 'shared_memory')  # type: ignore[attr-defined]
+		return cls(shm.buf, closer=shm.close)
+
+	@classmethod
+	def create_file(cls, path: str, width: int, height: int, slots: int = 3) -> 'FoconSharedFrameRing':
+		with open(path, 'w+b') as f:
+			f.truncate(cls.size_for(width, height, slots))
+			mapping = mmap.mmap(f.fileno(), 0)
+		cls.init_buffer(mapping, width, height, slots)
+		return cls(mapping, closer=mapping.close, unlinker=lambda: os.unlink(path))
+
+	@classmethod
+	def open_file(cls, path: str) -> 'FoconSharedFrameRing':
+		with open(path, 'r+b') as f:
+			mapping = mmap.mmap(f.fileno(), 0)
+		return cls(mapping, closer=mapping.close)
+
+	@classmethod
+	def open(cls, name: str) -> 'FoconSharedFrameRing':
+		# paths are memory-mapped files, anything else names a shared memory block
+		if os.sep in name:
+			return cls.open_file(name)
+		return cls.open_shared(name)
+
+	def close(self) -> None:
+		self.buf.release()
+		if self.closer:
+			self.closer()
+
+	def unlink(self) -> None:
+		# remove the backing storage, for the producer that created it
+		if self.unlinker:
+			self.unlinker()
+
+	## Access
+
+	@property
+	def latest(self) -> int:
+		seq: int = SEQUENCE.unpack_from(self.buf, HEADER.size - SEQUENCE.size)[0]
+		return seq
+
+	def slot_offset(self, seq: int) -> int:
+		return HEADER.size + (seq % self.slots) * self.slot_size
+
+	def write(self, data: FoconBuffer) -> int:
+		if len(data) != self.frame_size:
+			raise ValueError(f'frame is {len(data)} bytes, expected {self.frame_size}')
+		seq = self.latest + 1
+		offset = self.slot_offset(seq)
+		SEQUENCE.pack_into(self.buf, offset, 2 * seq - 1)
+		self.buf[offset + SEQUENCE.size:offset + SEQUENCE.size + self.frame_size] = data
+		SEQUENCE.pack_into(self.buf, offset, 2 * seq)
+		SEQUENCE.pack_into(self.buf, HEADER.size - SEQUENCE.size, seq)
+		return seq
+
+	def write_bitmap(self, bitmap: FoconBitmap) -> int:
+		if (bitmap.width, bitmap.height) != (self.width, self.height):
+			raise ValueError(f'bitmap is {bitmap.width}x{bitmap.height}, expected {self.width}x{self.height}')
+		return self.write(bitmap.data)
+
+	def read_into(self, buffer: Any, offset: int = 0, after: int = 0, retries: int = TORN_READ_LIMIT) -> int | None:
+		# copy the latest frame if it is newer than `after`, and return its sequence number
+		for _ in range(retries):
+			seq = self.latest
+			if seq <= after:
+				return None
+			slot = self.slot_offset(seq)
+			mark = SEQUENCE.unpack_from(self.buf, slot)[0]
+			if mark == 2 * seq:
+				buffer[offset:offset + self.frame_size] = self.buf[slot + SEQUENCE.size:slot + SEQUENCE.size + self.frame_size]
+				if SEQUENCE.unpack_from(self.buf, slot)[0] == mark:
+					return seq
+			# the producer lapped us, let it finish and start over with whatever is latest then
+			time.sleep(0)
+		LOG.warning('frame %d was still being written after %d reads, is the producer gone?', seq, retries)
+		return None
+
+	def read_bitmap(self, after: int = 0) -> tuple[int, FoconBitmap] | None:
+		data = bytearray(self.frame_size)
+		seq = self.read_into(data, after=after)
+		if seq is None:
+			return None
+		return seq, FoconBitmap(width=self.width, height=self.height, data=bytes(data))
+
+class FoconSharedFrameSender:
+	# Sends the latest frame of a ring to a display. The DrawPixels payload is built once; every new frame is
+	# copied into it straight from shared memory and sent whole, frames that were already sent are skipped.
+	def __init__(self, display: FoconDisplay, spec: FoconDisplayDrawSpec, ring: FoconSharedFrameRing) -> None:
+		self.display = display
+		self.spec = spec
+		self.ring = ring
+		self.payload = bytearray(FoconDisplayBitmapObject(spec, FoconBitmap.blank(ring.width, ring.height)).pack())
+		self.data_offset = FoconDisplayBitmapObject.LAYOUT.size
+		self.last_seq = 0
+		self.sent = 0
+		self.skipped = 0
+
+	def send_latest(self) -> FoconDisplayDrawStatus | None:
+		seq = self.ring.read_into(self.payload, self.data_offset, after=self.last_seq)
+		if seq is None:
+			return None
+		# frames written in between were never seen, the ones from before we started don't count
+		if self.last_seq:
+			self.skipped += seq - self.last_seq - 1
+		self.last_seq = seq
+		# the payload is overwritten by the next frame, a journal must not keep it
+		response = self.display.send_command(FoconDisplayCommand.DrawPixels, bytes(self.payload))
+		self.sent += 1
+		return FoconDisplayDrawStatus.unpack(response)
+
+	def run(self, poll_interval: float = 0.001, stop: Callable[[], bool] = lambda: False) -> None:
+		while not stop():
+			if self.send_latest() is None:
+				time.sleep(poll_interval)
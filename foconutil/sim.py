@@ -0,0 +1,147 @@
+from typing import Callable
+from logging import getLogger
+
+import random
+from collections import deque
+
+from .bus import FoconTransport
+from .frame import FoconFrame
+from .message import FoconMessage
+from .util import FoconBuffer
+from .devices.display import (
+	FoconDisplayCommand, FoconDisplayStatus, FoconDisplayDrawStatus, FoconDisplayUndrawSpecification,
+	FoconDisplayRedrawSpecification,
+)
+
+LOG = getLogger(__name__)
+
+
+FoconSimulatedHandler = Callable[[int, bytes], bytes]
+
+class FoconSimulatedDevice:
+	def __init__(self, id: int, handler: FoconSimulatedHandler | None = None, processing_time: float = 0.001) -> None:
+		self.id = id
+		# called with command and payload of every complete message, returns the reply payload
+		self.handler = handler or (lambda command, payload: b'')
+		self.processing_time = processing_time
+		self.frames: list[FoconFrame] = []
+		self.replies: deque[bytes] = deque()
+		self.messages = 0
+
+	def handle_message(self, message: FoconMessage) -> bytes:
+		self.messages += 1
+		return self.handler(message.cmd, bytes(message.value))
+
+class FoconSimulatedDisplay:
+	# Handler that answers like a display: Status with `status`, draws with the next of `draw_statuses`
+	# (accepted once they run out), undraws and redraws with the objects they were given. Every command is kept.
+	def __init__(self, status: FoconDisplayStatus) -> None:
+		self.status = status
+		self.draw_statuses: list[int] = []
+		self.commands: list[tuple[int, bytes]] = []
+
+	@property
+	def sent(self) -> list[FoconDisplayCommand]:
+		return [FoconDisplayCommand(command) for command, _ in self.commands]
+
+	def __call__(self, command: int, payload: bytes) -> bytes:
+		self.commands.append((command, payload))
+		if command == FoconDisplayCommand.Status.value:
+			return self.status.pack()
+		if command in (FoconDisplayCommand.DrawPixels.value, FoconDisplayCommand.DrawString.value):
+			status = self.draw_statuses.pop(0) if self.draw_statuses else 0
+			return FoconDisplayDrawStatus(object_id=payload[0], status=status).pack()
+		if command == FoconDisplayCommand.Undraw.value:
+			return FoconDisplayUndrawSpecification.unpack(payload).objects.pack()
+		if command == FoconDisplayCommand.Redraw.value:
+			return FoconDisplayRedrawSpecification.unpack(payload).objects.pack()
+		return b''
+
+class FoconSimulatedTransport(FoconTransport):
+	# In-process stand-in for a serial bus with Focon devices on it.
+	# Time is simulated: the clock advances with the bytes that would be on the wire at the given baud rate,
+	# so runs are fast and reproducible. Use `time` as the clock of the bus on top of it.
+	#
+	# Frames of multi-frame messages are corrupted at the given bit error rate, and NAK'ed by the devices they were for.
+	# A lost single-frame message is not signalled by the protocol, so those are always delivered intact.
+	def __init__(self, devices: list[FoconSimulatedDevice], baudrate: int = 57600, bit_error_rate: float = 0.0,
+	             turnaround: float = 0.0005, seed: int | None = None) -> None:
+		self.devices = {d.id: d for d in devices}
+		self.baudrate = baudrate
+		self.bit_error_rate = bit_error_rate
+		self.turnaround = turnaround
+		self.random = random.Random(seed)
+		self.clock = 0.0
+		self.rx_data: deque[bytes] = deque()
+		self.corrupted = 0
+		self.n = 0
+
+	def time(self) -> float:
+		return self.clock
+
+	def transfer(self, nbytes: int) -> None:
+		# start bit, 8 data bits, stop bit
+		self.clock += nbytes * 10 / self.baudrate
+		self.n += nbytes
+
+	def reply(self, device: FoconSimulatedDevice, dest_id: int, num: int, total: int, data: bytes = b'') -> None:
+		frame = FoconFrame(src_id=device.id, dest_id=dest_id, num=num, total=total, data=data)
+		self.rx_data.append(frame.pack())
+
+	def write(self, data: FoconBuffer) -> None:
+		self.transfer(len(data))
+		frame, _ = FoconFrame.unpack(bytes(data))
+		if frame.dest_id is None:
+			targets = list(self.devices.values())
+		elif frame.dest_id in self.devices:
+			targets = [self.devices[frame.dest_id]]
+		else:
+			return
+
+		for device in targets:
+			self.clock += self.turnaround
+			broadcast = frame.dest_id is None
+			if frame.num == 0:
+				# poll: hand out a pending reply, or NAK if there is none
+				if not broadcast:
+					if device.replies:
+						self.reply(device, frame.src_id, 1, 1, device.replies.popleft())
+					else:
+						self.reply(device, frame.src_id, 0, 0)
+				continue
+
+			if frame.total > 1 and self.random.random() >= (1 - self.bit_error_rate) ** (len(data) * 8):
+				self.corrupted += 1
+				if not broadcast:
+					self.reply(device, frame.src_id, 0, 0)
+				continue
+
+			if frame.num == 1:
+				# a new message, drop whatever is left of an abandoned one
+				device.frames = []
+			device.frames.append(frame)
+			if frame.num < frame.total:
+				if not broadcast:
+					self.reply(device, frame.src_id, frame.num, frame.total)
+				continue
+
+			message, _ = FoconMessage.unpack(b''.join(f.data for f in device.frames))
+			device.frames = []
+			self.clock += device.processing_time
+			value = device.handle_message(message)
+			if broadcast:
+				continue
+			reply = FoconMessage(src_id=device.id, dest_id=message.src_id, cmd=message.cmd, value=value).pack()
+			if frame.total == 1:
+				self.reply(device, frame.src_id, 1, 1, reply)
+			else:
+				# multi-frame messages get their last frame acknowledged, the reply has to be polled for
+				self.reply(device, frame.src_id, frame.num, frame.total)
+				device.replies.append(reply)
+
+	def read(self) -> bytes:
+		if not self.rx_data:
+			raise TimeoutError('no reply from simulated devices')
+		data = self.rx_data.popleft()
+		self.transfer(len(data))
+		return data
@@ -0,0 +1,113 @@
+from typing import Any, BinaryIO, Callable, cast
+from logging import getLogger
+
+import io
+from dataclasses import dataclass
+
+from .bitmap import FoconBitmap
+from .prepare import FoconImagePreparer, FoconDithering
+from .updates import FoconDisplayUpdateQueue, FoconDisplayRateController
+from .devices.display import FoconDisplay, FoconDisplayDrawSpec
+
+LOG = getLogger(__name__)
+
+
+DEPTHS = (1, 8)
+
+def raw_frame_size(width: int, height: int, depth: int) -> int:
+	if depth == 1:
+		# rows packed MSB first and padded to whole bytes, like PIL's '1' mode
+		return (width + 7) // 8 * height
+	return width * height
+
+def raw_to_image(data: bytes, width: int, height: int, depth: int = 8) -> Any:
+	import PIL.Image
+
+	return PIL.Image.frombytes('1' if depth == 1 else 'L', (width, height), data)
+
+def raw_to_bitmap(data: bytes, width: int, height: int, depth: int = 8, prepare: Callable[[Any], FoconBitmap] | None = None) -> FoconBitmap:
+	image = raw_to_image(data, width, height, depth)
+	if depth == 1:
+		return FoconBitmap.from_image(image)
+	if prepare is None:
+		# live frames rarely repeat, don't bother caching them
+		prepare = FoconImagePreparer(width, height, dithering=FoconDithering.Threshold, cache_size=0)
+	return prepare(image)
+
+class FoconRawFrameSource:
+	# Fixed-size raw frames from a file, pipe or FIFO
+	def __init__(self, f: BinaryIO, width: int, height: int, depth: int = 8) -> None:
+		if depth not in DEPTHS:
+			raise ValueError(f'unsupported depth: {depth}')
+		self.f = f
+		self.width = width
+		self.height = height
+		self.depth = depth
+		self.buffer = bytearray(raw_frame_size(width, height, depth))
+
+	def read(self) -> bytes | None:
+		view = memoryview(self.buffer)
+		# every binary file has readinto, BinaryIO just doesn't declare it
+		readinto = cast(io.BufferedIOBase, self.f).readinto
+		filled = 0
+		while filled < len(view):
+			n = readinto(view[filled:])
+			if not n:
+				if filled:
+					LOG.warning('dropping incomplete frame of %d bytes at end of input', filled)
+				return None
+			filled += n
+		return bytes(self.buffer)
+
+@dataclass
+class FoconDisplayStreamStats:
+	received:  int = 0
+	unchanged: int = 0
+	dropped:   int = 0
+	sent:      int = 0
+	failed:    int = 0
+
+class FoconDisplayStream:
+	# Shows frames from a source as they come in. Sending happens on the update queue's thread; a frame that is
+	# still waiting there when the next one arrives is replaced, so a slow bus drops frames instead of lagging behind.
+	# Frames are only converted right before they are sent, dropped frames cost nothing but their read.
+	def __init__(self, display: FoconDisplay, spec: FoconDisplayDrawSpec, source: FoconRawFrameSource,
+	             convert: Callable[[bytes], FoconBitmap] | None = None, rate: FoconDisplayRateController | None = None) -> None:
+		self.display = display
+		self.spec = spec
+		self.source = source
+		if convert is None:
+			preparer = FoconImagePreparer(source.width, source.height, dithering=FoconDithering.Threshold, cache_size=0)
+			convert = lambda data: raw_to_bitmap(data, source.width, source.height, source.depth, prepare=preparer)
+		self.convert = convert
+		self.queue = FoconDisplayUpdateQueue(display, max_batch=1, rate=rate)
+		self.received = 0
+		self.unchanged = 0
+		self.last: bytes | None = None
+
+	@property
+	def stats(self) -> FoconDisplayStreamStats:
+		return FoconDisplayStreamStats(
+			received=self.received,
+			unchanged=self.unchanged,
+			dropped=self.queue.stats.merged,
+			sent=self.queue.stats.sent,
+			failed=self.queue.stats.failed,
+		)
+
+	def submit(self, data: bytes) -> None:
+		self.received += 1
+		if data == self.last:
+			self.unchanged += 1
+			return
+		self.last = data
+		self.queue.submit(self.queue.key_of(self.spec), lambda batch: batch.draw_bitmap(self.convert(data), self.spec))
+
+	def run(self) -> FoconDisplayStreamStats:
+		with self.queue:
+			while True:
+				data = self.source.read()
+				if data is None:
+					break
+				self.submit(data)
+		return self.stats
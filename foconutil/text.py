@@ -0,0 +1,195 @@
+from typing import Any, Hashable, Iterable, Protocol
+from logging import getLogger
+
+import os
+import tempfile
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+
+from .bitmap import FoconBitmap
+from .devices.display import (
+	FoconDisplayDrawSpec, FoconDisplayAlignment,
+	FoconDisplayHorizontalAlignment, FoconDisplayVerticalAlignment,
+)
+
+LOG = getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def load_font(path: str, size: int) -> Any:
+	from PIL import ImageFont
+
+	ext = os.path.splitext(path)[1].lower()
+	if ext in ('.bdf', '.pcf'):
+		# bitmap fonts have a fixed size and need to be compiled to PIL's own format first
+		from PIL import BdfFontFile, PcfFontFile
+		cls = BdfFontFile.BdfFontFile if ext == '.bdf' else PcfFontFile.PcfFontFile
+		with open(path, 'rb') as f:
+			font_file = cls(f)
+		# the compiled font is read into memory whole, its files are not needed after loading
+		with tempfile.TemporaryDirectory(prefix='foconutil-font-') as directory:
+			target = os.path.join(directory, os.path.basename(path))
+			font_file.save(target)
+			return ImageFont.load(os.path.splitext(target)[0] + '.pil')
+	if ext == '.pil':
+		return ImageFont.load(path)
+	return ImageFont.truetype(path, size)
+
+@dataclass(frozen=True)
+class FoconGlyph:
+	bitmap:  FoconBitmap
+	ascent:  int
+
+	@property
+	def advance(self) -> int:
+		return self.bitmap.width
+
+	@property
+	def descent(self) -> int:
+		return self.bitmap.height - self.ascent
+
+class FoconGlyphSource(Protocol):
+	@property
+	def key(self) -> Hashable:
+		...
+
+	def render_glyph(self, char: str) -> 'FoconGlyph':
+		...
+
+class FoconFont:
+	def __init__(self, path: str, size: int = 16) -> None:
+		self.path = path
+		self.size = size
+
+	@property
+	def key(self) -> Hashable:
+		return (self.path, self.size)
+
+	def get_pil_font(self) -> Any:
+		return load_font(self.path, self.size)
+
+	def metrics(self) -> tuple[int, int]:
+		font = self.get_pil_font()
+		if hasattr(font, 'getmetrics'):
+			ascent, descent = font.getmetrics()
+			return ascent, descent
+		_, top, _, bottom = font.getbbox('Ag')
+		return bottom, 0
+
+	def render_glyph(self, char: str) -> FoconGlyph:
+		import PIL.Image
+		import PIL.ImageDraw
+
+		font = self.get_pil_font()
+		ascent, descent = self.metrics()
+		advance = max(0, round(font.getlength(char)))
+		if not advance:
+			return FoconGlyph(bitmap=FoconBitmap.blank(0, ascent + descent), ascent=ascent)
+		image = PIL.Image.new('1', (advance, ascent + descent))
+		draw = PIL.ImageDraw.Draw(image)
+		draw.fontmode = '1'
+		draw.text((0, 0), char, font=font, fill=1)
+		return FoconGlyph(bitmap=FoconBitmap.from_image(image), ascent=ascent)
+
+class FoconGlyphCache:
+	def __init__(self, max_glyphs: int = 4096, max_strings: int = 256) -> None:
+		self.glyphs: OrderedDict[Hashable, FoconGlyph] = OrderedDict()
+		self.strings: OrderedDict[Hashable, FoconBitmap] = OrderedDict()
+		self.max_glyphs = max_glyphs
+		self.max_strings = max_strings
+		self.pictograms: dict[tuple[Hashable, str], FoconGlyph] = {}
+		self.hits = 0
+		self.misses = 0
+
+	@staticmethod
+	def lookup(cache: 'OrderedDict[Hashable, Any]', key: Hashable) -> Any:
+		value = cache.get(key)
+		if value is not None:
+			cache.move_to_end(key)
+		return value
+
+	@staticmethod
+	def store(cache: 'OrderedDict[Hashable, Any]', key: Hashable, value: Any, limit: int) -> None:
+		cache[key] = value
+		while len(cache) > limit:
+			cache.popitem(last=False)
+
+	def add_pictogram(self, font: FoconGlyphSource, char: str, bitmap: FoconBitmap, ascent: int | None = None) -> None:
+		self.pictograms[font.key, char] = FoconGlyph(bitmap=bitmap, ascent=bitmap.height if ascent is None else ascent)
+		# rendered strings may contain the old glyph
+		self.strings.clear()
+
+	def glyph(self, font: FoconGlyphSource, char: str) -> FoconGlyph:
+		key = (font.key, char)
+		glyph = self.pictograms.get(key) or self.lookup(self.glyphs, key)
+		if glyph is None:
+			self.misses += 1
+			glyph = font.render_glyph(char)
+			self.store(self.glyphs, key, glyph, self.max_glyphs)
+		else:
+			self.hits += 1
+		return glyph
+
+	def render(self, text: str, font: FoconGlyphSource) -> FoconBitmap:
+		return self.render_runs([(text, font)])
+
+	def render_runs(self, runs: Iterable[tuple[str, FoconGlyphSource]]) -> FoconBitmap:
+		runs = tuple(runs)
+		key = tuple((text, font.key) for text, font in runs)
+		cached: FoconBitmap | None = self.lookup(self.strings, key)
+		if cached is not None:
+			return cached
+
+		glyphs = [self.glyph(font, char) for text, font in runs for char in text]
+		ascent = max((g.ascent for g in glyphs), default=0)
+		height = ascent + max((g.descent for g in glyphs), default=0)
+		parts = []
+		for glyph in glyphs:
+			if glyph.bitmap.height == height and glyph.ascent == ascent:
+				parts.append(glyph.bitmap.data)
+			else:
+				# align mixed sizes on their baseline
+				top = ascent - glyph.ascent
+				parts.append(glyph.bitmap.crop(0, -top, glyph.advance - 1, height - top - 1).data)
+		# glyphs are stored column-major, so joining their data lines them up horizontally
+		bitmap = FoconBitmap(width=sum(g.advance for g in glyphs), height=height, data=b''.join(parts))
+		self.store(self.strings, key, bitmap, self.max_strings)
+		return bitmap
+
+DEFAULT_CACHE = FoconGlyphCache()
+
+def place(bitmap: FoconBitmap, width: int, height: int, alignment: FoconDisplayAlignment = FoconDisplayAlignment()) -> FoconBitmap:
+	x = {
+		FoconDisplayHorizontalAlignment.Left: 0,
+		FoconDisplayHorizontalAlignment.Center: (width - bitmap.width) // 2,
+		FoconDisplayHorizontalAlignment.Right: width - bitmap.width,
+	}[alignment.horizontal]
+	y = {
+		FoconDisplayVerticalAlignment.Top: 0,
+		FoconDisplayVerticalAlignment.Center: (height - bitmap.height) // 2,
+		FoconDisplayVerticalAlignment.Bottom: height - bitmap.height,
+	}[alignment.vertical]
+	return bitmap.crop(-x, -y, width - x - 1, height - y - 1)
+
+class FoconTextLayout:
+	# Text set in one font, measured and placed the way it will show up in a drawing area.
+	def __init__(self, font: FoconGlyphSource, cache: FoconGlyphCache = DEFAULT_CACHE) -> None:
+		self.font = font
+		self.cache = cache
+
+	def render(self, text: str) -> FoconBitmap:
+		return self.cache.render(text, self.font)
+
+	def measure(self, text: str) -> tuple[int, int]:
+		bitmap = self.render(text)
+		return bitmap.width, bitmap.height
+
+	def preview(self, text: str, spec: FoconDisplayDrawSpec, alignment: FoconDisplayAlignment = FoconDisplayAlignment()) -> FoconBitmap:
+		width = spec.x_end - spec.x_start + 1
+		height = spec.y_end - spec.y_start + 1
+		return place(self.render(text), width, height, alignment)
+
+	def fits(self, text: str, spec: FoconDisplayDrawSpec) -> bool:
+		width, height = self.measure(text)
+		return width <= spec.x_end - spec.x_start + 1 and height <= spec.y_end - spec.y_start + 1
@@ -0,0 +1,252 @@
+from typing import Callable, Hashable
+from logging import getLogger
+
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from .bitmap import FoconBitmap
+from .devices.display import (
+	FoconDisplay, FoconDisplayBatch, FoconDisplayDrawSpec, FoconDisplayAlignment,
+	FoconDisplayDrawStatus, FoconDisplayDrawList, FoconDisplayMemoryStats, FoconDisplayNetworkStats,
+	ANONYMOUS_OBJECT_ID,
+)
+
+LOG = getLogger(__name__)
+
+
+@dataclass
+class FoconDisplayUpdate:
+	key:       Hashable
+	apply:     Callable[[FoconDisplayBatch], int]
+	enqueued:  float
+	# enqueue time of the oldest update this one replaced
+	waiting:   float
+	merged:    int = 0
+
+@dataclass
+class FoconDisplayUpdateStats:
+	enqueued:     int = 0
+	sent:         int = 0
+	merged:       int = 0
+	failed:       int = 0
+	latency_last: float = 0.0
+	latency_avg:  float = 0.0
+	latency_max:  float = 0.0
+
+	def record_latency(self, latency: float) -> None:
+		self.latency_last = latency
+		self.latency_max = max(self.latency_max, latency)
+		self.latency_avg += (latency - self.latency_avg) / self.sent
+
+@dataclass
+class FoconDisplayUpdateResult:
+	key:     Hashable
+	result:  FoconDisplayDrawStatus | FoconDisplayDrawList | None
+	latency: float
+	merged:  int
+
+class FoconDisplayRateController:
+	# Paces submissions by the display's free buffers: the interval between sends grows multiplicatively
+	# when buffers run low or the display starts dropping packets, and shrinks additively when they recover.
+	# Buffer levels are judged relative to the most free buffers of each size seen so far.
+	def __init__(self, display: FoconDisplay, min_interval: float = 0.0, max_interval: float = 2.0,
+	             step: float = 0.01, backoff: float = 2.0, low_water: float = 0.25, high_water: float = 0.5,
+	             probe_every: int = 4, clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep) -> None:
+		self.display = display
+		self.min_interval = min_interval
+		self.max_interval = max_interval
+		self.step = step
+		self.backoff = backoff
+		self.low_water = low_water
+		self.high_water = high_water
+		self.probe_every = probe_every
+		self.clock = clock
+		self.sleep = sleep
+
+		self.interval = min_interval
+		self.last_send: float | None = None
+		self.sends = 0
+		self.peak_free = (0, 0, 0)
+		self.memory: FoconDisplayMemoryStats | None = None
+		self.network: FoconDisplayNetworkStats | None = None
+
+	def wait(self) -> None:
+		if self.last_send is None:
+			return
+		delay = self.last_send + self.interval - self.clock()
+		if delay > 0:
+			self.sleep(delay)
+
+	def slow_down(self) -> None:
+		self.interval = min(self.max_interval, max(self.interval * self.backoff, self.step))
+
+	def speed_up(self) -> None:
+		self.interval = max(self.min_interval, self.interval - self.step)
+
+	def sent(self, ok: bool = True) -> None:
+		self.last_send = self.clock()
+		self.sends += 1
+		if not ok:
+			self.slow_down()
+		elif self.sends % self.probe_every == 0:
+			self.probe()
+
+	@property
+	def free_ratio(self) -> float:
+		if not self.memory:
+			return 1.0
+		return min((free / peak for free, peak in zip(self.memory.free_buffers, self.peak_free) if peak), default=1.0)
+
+	def probe(self) -> None:
+		try:
+			memory = self.display.get_memory_stats()
+			network = self.display.get_network_stats()
+		except Exception:
+			LOG.exception('Could not read display statistics')
+			self.slow_down()
+			return
+
+		dropped = self.network is not None and (
+			network.tx_buffer_errors > self.network.tx_buffer_errors or network.no_answer_errors > self.network.no_answer_errors
+		)
+		self.memory = memory
+		self.network = network
+		self.peak_free = tuple(max(a, b) for a, b in zip(self.peak_free, memory.free_buffers))  # type: ignore[assignment]
+
+		if dropped or self.free_ratio < self.low_water:
+			self.slow_down()
+		elif self.free_ratio >= self.high_water:
+			self.speed_up()
+		LOG.debug('free buffers %s (%.0f%%), interval now %.3fs', memory.free_buffers, self.free_ratio * 100, self.interval)
+
+class FoconDisplayUpdateQueue:
+	def __init__(self, display: FoconDisplay, max_batch: int = 8, callback: Callable[[FoconDisplayUpdateResult], None] | None = None,
+	             rate: FoconDisplayRateController | None = None) -> None:
+		self.display = display
+		self.max_batch = max_batch
+		self.callback = callback
+		self.rate = rate
+		self.pending: OrderedDict[Hashable, FoconDisplayUpdate] = OrderedDict()
+		self.stats = FoconDisplayUpdateStats()
+		self.cond = threading.Condition()
+		self.thread: threading.Thread | None = None
+		self.running = False
+
+	@staticmethod
+	def key_of(spec: FoconDisplayDrawSpec) -> Hashable:
+		if spec.object_id == ANONYMOUS_OBJECT_ID:
+			# anonymous objects can only replace each other when they cover the same area
+			return (spec.output_id, spec.object_id, spec.x_start, spec.y_start, spec.x_end, spec.y_end)
+		return (spec.output_id, spec.object_id)
+
+	def submit(self, key: Hashable, apply: Callable[[FoconDisplayBatch], int]) -> None:
+		with self.cond:
+			self.stats.enqueued += 1
+			now = time.monotonic()
+			update = FoconDisplayUpdate(key=key, apply=apply, enqueued=now, waiting=now)
+			previous = self.pending.get(key)
+			if previous:
+				# last writer wins, but keeps the place in line (and the wait) of the update it replaces
+				update.merged = previous.merged + 1
+				update.waiting = previous.waiting
+				self.stats.merged += 1
+			self.pending[key] = update
+			self.cond.notify()
+
+	def print(self, message: str, spec: FoconDisplayDrawSpec, alignment: FoconDisplayAlignment | None = None, font_size: int | None = None) -> None:
+		self.submit(self.key_of(spec), lambda batch: batch.print(message, spec, alignment=alignment, font_size=font_size))
+
+	def draw_bitmap(self, bitmap: FoconBitmap, spec: FoconDisplayDrawSpec, optimize: bool = True) -> None:
+		self.submit(self.key_of(spec), lambda batch: batch.draw_bitmap(bitmap, spec, optimize=optimize))
+
+	def fill(self, spec: FoconDisplayDrawSpec, on: bool = True, optimize: bool = True) -> None:
+		self.submit(self.key_of(spec), lambda batch: batch.fill(spec, on=on, optimize=optimize))
+
+	def take(self) -> list[FoconDisplayUpdate]:
+		updates: list[FoconDisplayUpdate] = []
+		while self.pending and len(updates) < self.max_batch:
+			_, update = self.pending.popitem(last=False)
+			updates.append(update)
+		return updates
+
+	def send(self, updates: list[FoconDisplayUpdate]) -> None:
+		batch = self.display.batch()
+		calls = [update.apply(batch) for update in updates]
+		try:
+			results = batch.commit()
+		except Exception:
+			LOG.exception('Could not send %d display update(s)', len(updates))
+			with self.cond:
+				self.stats.failed += len(updates)
+			if self.rate:
+				self.rate.sent(ok=False)
+			return
+		if self.rate:
+			self.rate.sent()
+
+		done = time.monotonic()
+		with self.cond:
+			for update, call in zip(updates, calls):
+				result = results[call]
+				latency = done - update.waiting
+				if isinstance(result, FoconDisplayDrawStatus) and not result.accepted:
+					LOG.warning('Display refused update %r: %s', update.key, result)
+					self.stats.failed += 1
+				else:
+					self.stats.sent += 1
+					self.stats.record_latency(latency)
+				if self.callback:
+					self.callback(FoconDisplayUpdateResult(key=update.key, result=result, latency=latency, merged=update.merged))
+
+	def flush(self) -> None:
+		while True:
+			with self.cond:
+				updates = self.take()
+			if not updates:
+				break
+			self.send(updates)
+
+	## Background operation
+
+	def run(self) -> None:
+		while True:
+			with self.cond:
+				while self.running and not self.pending:
+					self.cond.wait()
+				if not self.running:
+					break
+			if self.rate:
+				# hold back while the display is short on buffers, newer updates keep replacing pending ones meanwhile
+				self.rate.wait()
+			with self.cond:
+				updates = self.take()
+			# anything submitted while this is on the wire gets merged into the next batch
+			if updates:
+				self.send(updates)
+
+	def start(self) -> None:
+		if self.thread:
+			return
+		self.running = True
+		self.thread = threading.Thread(target=self.run, name='focon-display-updates', daemon=True)
+		self.thread.start()
+
+	def stop(self, flush: bool = True) -> None:
+		if not self.thread:
+			return
+		with self.cond:
+			self.running = False
+			self.cond.notify()
+		self.thread.join()
+		self.thread = None
+		if flush:
+			self.flush()
+
+	def __enter__(self) -> 'FoconDisplayUpdateQueue':
+		self.start()
+		return self
+
+	def __exit__(self, exc_type: object, exc: object, tb: object) -> None:
+		self.stop(flush=exc_type is None)
@@ -1,7 +1,9 @@
 from struct import calcsize, unpack
-from typing import Any
+from typing import Any, Iterator, Sequence
 
 
+FoconBuffer = bytes | bytearray | memoryview
+
 def take(data: bytes, n: int) -> tuple[bytes, bytes]:
 	if len(data) < n:
 		raise EOFError(f'not enough data to read {n} bytes')
@@ -11,3 +13,20 @@ def take_unpack(data: bytes, fmt: str) -> tuple[tuple[Any, ...], bytes]:
 	n = calcsize(fmt)
 	b, data = take(data, n)
 	return unpack(fmt, b), data
+
+def split_parts(parts: Sequence[FoconBuffer], size: int) -> Iterator[list[memoryview]]:
+	# Split a gather list into chunks of at most `size` bytes, without copying any data
+	chunk: list[memoryview] = []
+	left = size
+	for part in parts:
+		view = memoryview(part)
+		while view:
+			piece, view = view[:left], view[left:]
+			chunk.append(piece)
+			left -= len(piece)
+			if not left:
+				yield chunk
+				chunk = []
+				left = size
+	if chunk:
+		yield chunk
@@ -0,0 +1,128 @@
+from typing import Any, List
+from logging import getLogger
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from .bitmap import FoconBitmap
+from .message import FoconMessageBus
+from .canvas import FoconDisplayCanvas
+from .devices.display import (
+	FoconDisplay, FoconDisplayCommand, FoconDisplayDrawComposition, FoconDisplayDrawList,
+	FoconDisplayRedrawSpecification,
+)
+
+LOG = getLogger(__name__)
+
+
+@dataclass
+class FoconWallTile:
+	display: FoconDisplay
+	# position of the display on the wall
+	x: int
+	y: int
+	vertical: bool = False
+	canvas: FoconDisplayCanvas | None = field(default=None, repr=False)
+
+	def get_canvas(self) -> FoconDisplayCanvas:
+		if not self.canvas:
+			self.canvas = FoconDisplayCanvas(self.display, vertical=self.vertical)
+		return self.canvas
+
+	@property
+	def bus(self) -> FoconMessageBus:
+		return self.display.device.bus
+
+@dataclass
+class FoconWallPresentation:
+	# on the clocks of the tiles' buses: upload times from the start, present times as read after every redraw
+	upload_times:  List[float]
+	present_times: List[float]
+
+	@property
+	def upload_time(self) -> float:
+		return max(self.upload_times, default=0.0)
+
+	@property
+	def skew(self) -> float:
+		if not self.present_times:
+			return 0.0
+		return max(self.present_times) - min(self.present_times)
+
+class FoconVideoWall:
+	def __init__(self, tiles: List[FoconWallTile], object_id: int = 1) -> None:
+		self.tiles = tiles
+		self.object_id = object_id
+		# tiles sharing a bus have to take turns, tiles on different buses can be driven in parallel
+		self.groups: dict[int, List[int]] = {}
+		for i, tile in enumerate(tiles):
+			self.groups.setdefault(id(tile.bus.bus), []).append(i)
+
+	@property
+	def width(self) -> int:
+		return max((t.x + t.get_canvas().width for t in self.tiles), default=0)
+
+	@property
+	def height(self) -> int:
+		return max((t.y + t.get_canvas().height for t in self.tiles), default=0)
+
+	def slice(self, image: Any) -> List[FoconBitmap]:
+		if isinstance(image, FoconBitmap):
+			bitmap = image
+		else:
+			bitmap = FoconBitmap.from_image(image)
+		tiles = []
+		for tile in self.tiles:
+			canvas = tile.get_canvas()
+			tiles.append(bitmap.crop(tile.x, tile.y, tile.x + canvas.width - 1, tile.y + canvas.height - 1))
+		return tiles
+
+	def upload(self, index: int, bitmap: FoconBitmap) -> None:
+		tile = self.tiles[index]
+		canvas = tile.get_canvas()
+		batch = tile.display.batch()
+		# remove the old object without touching the screen, so it stays visible until the redraw
+		batch.undraw([self.object_id], update_screen=False)
+		# and draw the new one without showing it: the redraw switches it over to Add
+		for (region, part), spec in zip(canvas.slice(bitmap), canvas.specs(object_id=self.object_id, composition=FoconDisplayDrawComposition.Remove)):
+			batch.draw_bitmap(part, spec)
+		batch.commit()
+
+	def present(self, image: Any) -> FoconWallPresentation:
+		bitmaps = self.slice(image)
+		upload_times = [0.0] * len(self.tiles)
+		present_times = [0.0] * len(self.tiles)
+		barrier = threading.Barrier(len(self.groups))
+		redraw = FoconDisplayRedrawSpecification(
+			composition=FoconDisplayDrawComposition.Add,
+			objects=FoconDisplayDrawList([self.object_id]),
+		).pack()
+
+		def drive(indices: List[int]) -> None:
+			bus = self.tiles[indices[0]].bus
+			clock = bus.bus.clock
+			start = clock()
+			try:
+				for i in indices:
+					self.upload(i, bitmaps[i])
+					upload_times[i] = clock() - start
+			except:
+				barrier.abort()
+				raise
+			# everyone waits for the slowest bus, then all buses send the redraw at once: back-to-back to the wall's
+			# displays only, as a broadcast would also redraw whatever uses the same object ID on other displays
+			barrier.wait()
+			# every tile switches over once its own redraw is through, so take the time right after each one
+			tiles = {self.tiles[i].display.device.dest_id: i for i in indices}
+			def sent(dest_id: int) -> None:
+				present_times[tiles[dest_id]] = clock()
+			bus.multicast(list(tiles), FoconDisplayCommand.Redraw.value, redraw, sent=sent)
+
+		with ThreadPoolExecutor(max_workers=len(self.groups)) as executor:
+			for future in [executor.submit(drive, indices) for indices in self.groups.values()]:
+				future.result()
+
+		presentation = FoconWallPresentation(upload_times=upload_times, present_times=present_times)
+		LOG.debug('presented wall: upload %.3fs, skew %.3fms', presentation.upload_time, presentation.skew * 1000)
+		return presentation
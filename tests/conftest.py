@@ -0,0 +1,67 @@
+from typing import Any, Callable
+
+import os
+
+import pytest
+
+from foconutil.sim import FoconSimulatedTransport, FoconSimulatedDevice, FoconSimulatedDisplay
+from foconutil.bus import FoconBus
+from foconutil.message import FoconMessageBus
+from foconutil.devices.device import FoconDevice
+from foconutil.devices.display import FoconDisplay, FoconDisplayConfiguration, FoconDisplayStatus, FoconDisplayError
+
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+DOCS = os.path.join(ROOT, 'docs')
+# configurations dumped from real displays
+CONFIGS = ('ns-icmm.esd', 'ns-sgmiii.ed', 'ns-sgmiii.id')
+
+@pytest.fixture
+def root() -> str:
+	return ROOT
+
+@pytest.fixture
+def load_config_data() -> Callable[[str], bytes]:
+	def load_config_data(name: str) -> bytes:
+		with open(os.path.join(DOCS, f'{name}.config.bin'), 'rb') as f:
+			return f.read()
+	return load_config_data
+
+@pytest.fixture
+def load_config(load_config_data: Callable[[str], bytes]) -> Callable[[str], FoconDisplayConfiguration]:
+	return lambda name: FoconDisplayConfiguration.unpack(load_config_data(name))
+
+@pytest.fixture(params=CONFIGS)
+def config_name(request: Any) -> str:
+	name: str = request.param
+	return name
+
+@pytest.fixture
+def config(config_name: str, load_config: Callable[[str], FoconDisplayConfiguration]) -> FoconDisplayConfiguration:
+	return load_config(config_name)
+
+@pytest.fixture
+def display_status() -> FoconDisplayStatus:
+	# a display that is fine and shows nothing
+	return FoconDisplayStatus(
+		error_flags=FoconDisplayError(0), temperature=20.0, mode=0, general_adjust=0, brightness_adjust=None,
+		temp_adjust=0, overall_adjust=0, power10_value=0, available_still_objects=8, available_scroll_objects=2,
+		visible_object_ids=[], used_object_ids=[],
+	)
+
+@pytest.fixture
+def make_bus() -> Callable[..., FoconMessageBus]:
+	# simulated bus with the given devices, extra arguments go to the transport
+	def make_bus(devices: list[FoconSimulatedDevice], **kwargs: Any) -> FoconMessageBus:
+		transport = FoconSimulatedTransport(devices, **kwargs)
+		return FoconMessageBus(FoconBus(transport, 0, clock=transport.time), 0)
+	return make_bus
+
+@pytest.fixture
+def simulated_display(display_status: FoconDisplayStatus) -> FoconSimulatedDisplay:
+	return FoconSimulatedDisplay(display_status)
+
+@pytest.fixture
+def display(make_bus: Callable[..., FoconMessageBus], simulated_display: FoconSimulatedDisplay) -> FoconDisplay:
+	# the simulated display, alone on a bus at address 3
+	return FoconDisplay(FoconDevice(make_bus([FoconSimulatedDevice(3, simulated_display)]), 3))
@@ -0,0 +1,70 @@
+from foconutil.sim import FoconSimulatedDisplay
+from foconutil.bitmap import FoconBitmap
+from foconutil.devices.display import (
+	FoconDisplay, FoconDisplayBatch, FoconDisplayCommand, FoconDisplayDrawSpec, FoconDisplayDrawComposition, FoconDisplayDrawList,
+	ANONYMOUS_OBJECT_ID,
+)
+
+
+def spec(object_id: int, output_id: int = 1) -> FoconDisplayDrawSpec:
+	return FoconDisplayDrawSpec(object_id=object_id, output_id=output_id, composition=FoconDisplayDrawComposition.Replace, x_end=7, y_end=7)
+
+def draw(batch: FoconDisplayBatch, object_id: int, output_id: int = 1) -> int:
+	return batch.draw_bitmap(FoconBitmap.filled(8, 8), spec(object_id, output_id), optimize=False)
+
+def calls(batch: FoconDisplayBatch) -> list[tuple[int, FoconDisplayCommand]]:
+	return [(op.call, op.command) for op in batch.collapse()]
+
+def test_last_draw_of_an_object_wins(display: FoconDisplay) -> None:
+	batch = display.batch()
+	draw(batch, 1)
+	draw(batch, 2)
+	draw(batch, 1)
+	# same ID on another output is another object
+	draw(batch, 1, output_id=2)
+	assert calls(batch) == [(1, FoconDisplayCommand.DrawPixels), (2, FoconDisplayCommand.DrawPixels), (3, FoconDisplayCommand.DrawPixels)]
+
+def test_anonymous_draws_are_all_sent(display: FoconDisplay) -> None:
+	batch = display.batch()
+	draw(batch, ANONYMOUS_OBJECT_ID)
+	draw(batch, ANONYMOUS_OBJECT_ID)
+	assert [call for call, _ in calls(batch)] == [0, 1]
+
+def test_draw_before_undraw_is_dropped(display: FoconDisplay) -> None:
+	batch = display.batch()
+	draw(batch, 1)
+	draw(batch, 2)
+	batch.undraw([1])
+	assert calls(batch) == [(1, FoconDisplayCommand.DrawPixels), (2, FoconDisplayCommand.Undraw)]
+
+def test_draw_before_undraw_without_update_is_kept(display: FoconDisplay) -> None:
+	batch = display.batch()
+	draw(batch, 1)
+	batch.undraw([1], update_screen=False)
+	assert calls(batch) == [(0, FoconDisplayCommand.DrawPixels), (1, FoconDisplayCommand.Undraw)]
+
+def test_redraw_after_undraw_is_kept(display: FoconDisplay, simulated_display: FoconSimulatedDisplay) -> None:
+	batch = display.batch()
+	batch.undraw([1, 2], update_screen=False)
+	batch.redraw([1])
+	assert calls(batch) == [(0, FoconDisplayCommand.Undraw), (1, FoconDisplayCommand.Redraw)]
+	results = batch.commit()
+	assert simulated_display.sent == [FoconDisplayCommand.Undraw, FoconDisplayCommand.Redraw]
+	assert [result.ids for result in results if isinstance(result, FoconDisplayDrawList)] == [[1, 2], [1]]
+
+def test_draw_after_undraw_of_everything_is_kept(display: FoconDisplay) -> None:
+	batch = display.batch()
+	draw(batch, 1)
+	batch.undraw([ANONYMOUS_OBJECT_ID], update_screen=False)
+	draw(batch, 1)
+	assert [call for call, _ in calls(batch)] == [0, 1, 2]
+
+def test_collapse_leaves_operations_alone(display: FoconDisplay) -> None:
+	batch = display.batch()
+	draw(batch, 1)
+	batch.undraw([1, 2])
+	batch.redraw([2])
+	operations = [(op.call, op.command, op.spec) for op in batch.operations]
+	first = calls(batch)
+	assert calls(batch) == first
+	assert [(op.call, op.command, op.spec) for op in batch.operations] == operations
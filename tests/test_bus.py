@@ -0,0 +1,68 @@
+from typing import Any
+
+import pytest
+
+from foconutil import frame as frame_module
+from foconutil.bus import FoconBus, FoconFrameSizeTuner
+from foconutil.frame import FoconFrame
+from foconutil.util import FoconBuffer
+
+
+class FoconReplayTransport:
+	# hands out the given chunks of data, one per read
+	def __init__(self, chunks: list[bytes]) -> None:
+		self.chunks = chunks
+
+	def read(self) -> bytes:
+		return self.chunks.pop(0)
+
+	def write(self, data: FoconBuffer) -> None:
+		pass
+
+def corrupt(data: bytes) -> bytes:
+	# flip a checksum bit
+	return data[:-3] + bytes([data[-3] ^ 1]) + data[-2:]
+
+def test_foreign_frames_are_dropped_unchecked(monkeypatch: pytest.MonkeyPatch) -> None:
+	checked = []
+	crc = frame_module.CRC
+	def counting_crc(*args: Any) -> Any:
+		checked.append(args)
+		return crc(*args)
+	monkeypatch.setattr(frame_module, 'CRC', counting_crc)
+
+	ours = FoconFrame(src_id=3, dest_id=14, num=1, total=1, data=b'ours').pack()
+	foreign = FoconFrame(src_id=3, dest_id=5, num=1, total=1, data=b'theirs').pack()
+	echo = FoconFrame(src_id=14, dest_id=3, num=1, total=1, data=b'echo').pack()
+	bus = FoconBus(FoconReplayTransport([corrupt(foreign) + corrupt(echo), ours]), 14)
+	checked.clear()
+
+	assert bus.recv_frame() is None
+	assert bus.recv_frame() == FoconFrame(src_id=3, dest_id=14, num=1, total=1, data=b'ours')
+	assert (bus.stats.foreign, bus.stats.echoes, bus.stats.received, bus.stats.errors) == (1, 1, 1, 0)
+	# only the frame for us was checksummed
+	assert len(checked) == 1
+
+def test_broadcasts_are_received() -> None:
+	broadcast = FoconFrame(src_id=3, dest_id=None, num=1, total=1, data=b'all').pack()
+	bus = FoconBus(FoconReplayTransport([broadcast]), 14)
+	assert bus.recv_frame() == FoconFrame(src_id=3, dest_id=None, num=1, total=1, data=b'all')
+
+def test_frames_received_together_are_all_returned() -> None:
+	frames = [FoconFrame(src_id=3, dest_id=14, num=i, total=2, data=bytes([i])) for i in (1, 2)]
+	foreign = FoconFrame(src_id=3, dest_id=5, num=1, total=1, data=b'theirs').pack()
+	bus = FoconBus(FoconReplayTransport([frames[0].pack() + foreign + frames[1].pack()]), 14)
+	assert bus.recv_frame() == frames[0]
+	# the rest is already there, without reading any more
+	assert bus.recv_frame() == frames[1]
+
+def test_frame_sizes_stay_within_limit() -> None:
+	bus = FoconBus(FoconReplayTransport([]), 14)
+	assert max(FoconFrameSizeTuner.SIZES) <= FoconBus.MAX_FRAME_SIZE
+	with pytest.raises(ValueError):
+		bus.set_frame_size(3, FoconBus.MAX_FRAME_SIZE + 1)
+	with pytest.raises(ValueError):
+		bus.tune_frame_size(3, FoconFrameSizeTuner(sizes=[256, 1024]))
+	bus.set_frame_size(3, 64)
+	assert bus.frame_size_of(3) == 64
+	assert bus.frame_size_of(None) == FoconBus.MAX_FRAME_SIZE
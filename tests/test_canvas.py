@@ -0,0 +1,43 @@
+from typing import Callable
+
+import dataclasses
+import random
+
+import pytest
+import PIL.Image
+
+from foconutil.bitmap import FoconBitmap
+from foconutil.canvas import FoconDisplayCanvas
+from foconutil.devices.display import FoconDisplay, FoconDisplayConfiguration
+
+
+@pytest.fixture
+def two_outputs(load_config: Callable[[str], FoconDisplayConfiguration]) -> FoconDisplayConfiguration:
+	# two 256x48 outputs
+	config = load_config('ns-sgmiii.id')
+	output = config.outputs[0]
+	return dataclasses.replace(config, outputs=[output, dataclasses.replace(output, index=2)])
+
+def noise(width: int, height: int) -> FoconBitmap:
+	rng = random.Random(width * height)
+	return FoconBitmap.from_values([[rng.random() < 0.5 for y in range(height)] for x in range(width)], height)
+
+def test_bitmap_to_image_round_trip() -> None:
+	bitmap = noise(13, 21)
+	assert FoconBitmap.from_image(bitmap.to_image()) == bitmap
+
+@pytest.mark.parametrize('vertical', [False, True])
+def test_slices_match_crops(display: FoconDisplay, two_outputs: FoconDisplayConfiguration, vertical: bool) -> None:
+	canvas = FoconDisplayCanvas(display, two_outputs, vertical=vertical)
+	assert (canvas.width, canvas.height) == ((256, 96) if vertical else (512, 48))
+	bitmap = noise(canvas.width, canvas.height)
+	expected = [bitmap.crop(r.x, r.y, r.x + r.width - 1, r.y + r.height - 1) for r in canvas.regions]
+	assert [part for _, part in canvas.slice(bitmap)] == expected
+	assert [part for _, part in canvas.slice(bitmap.to_image())] == expected
+
+def test_mismatched_size_is_rejected(display: FoconDisplay, two_outputs: FoconDisplayConfiguration) -> None:
+	canvas = FoconDisplayCanvas(display, two_outputs)
+	with pytest.raises(ValueError):
+		canvas.slice(FoconBitmap.blank(256, 48))
+	with pytest.raises(ValueError):
+		canvas.slice(PIL.Image.new('1', (512, 32)))
@@ -0,0 +1,44 @@
+import sys
+import json
+from pathlib import Path
+
+import pytest
+
+from foconutil.cli import main, parse_batch_line
+
+
+@pytest.mark.parametrize('line, argv', [
+	('', None),
+	('  # a comment', None),
+	('display -i 3 print "two words"\n', ['display', '-i', '3', 'print', 'two words']),
+	('["display", "fill", 0]', ['display', 'fill', '0']),
+	('{"args": ["display", "status"]}', ['display', 'status']),
+	('{"command": "display print \'hi there\'"}', ['display', 'print', 'hi there']),
+])
+def test_parse_batch_line(line: str, argv: list[str] | None) -> None:
+	assert parse_batch_line(line) == argv
+
+@pytest.mark.parametrize('line', ['[not json', '{"argv": []}', 'print "unclosed'])
+def test_parse_batch_line_rejects(line: str) -> None:
+	with pytest.raises((ValueError, KeyError)):
+		parse_batch_line(line)
+
+def test_batch_reports_every_line(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]) -> None:
+	for name, data in (('a', b'ac'), ('b', b'bd')):
+		(tmp_path / name).write_bytes(data)
+	commands = tmp_path / 'commands'
+	commands.write_text('\n'.join([
+		'# stitched twice',
+		'flash stitch {0}/out {0}/a {0}/b'.format(tmp_path),
+		'["flash", "stitch", "{0}/out2", "{0}/a", "{0}/b"]'.format(tmp_path),
+		'[broken',
+		'flash stitch',
+	]))
+	monkeypatch.setattr(sys, 'argv', ['focon-util', 'batch', '--keep-going', str(commands)])
+	with pytest.raises(SystemExit) as exit:
+		main()
+	assert exit.value.code == 1
+	records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+	assert [(r['line'], r['ok']) for r in records] == [(2, True), (3, True), (4, False), (5, False)]
+	assert records[2]['error'].startswith('invalid command')
+	assert (tmp_path / 'out').read_bytes() == (tmp_path / 'out2').read_bytes() == b'abcd'
@@ -0,0 +1,93 @@
+from typing import Any
+
+import pytest
+import serial
+
+from foconutil.bus import FoconSerialTransport
+from foconutil.direction import FoconDirectionControl, FoconCallbackDirectionControl, make_direction_control
+
+
+class FoconMockSerial:
+	# records what is done to the port, reads hand out the queued data
+	def __init__(self, port: str = '/dev/null', **kwargs: Any) -> None:
+		self.port = port
+		self.kwargs = kwargs
+		self.timeout = kwargs.get('timeout')
+		self.events: list[tuple[str, Any]] = []
+		self.incoming = bytearray()
+		self.rs485_mode: Any = None
+
+	@property
+	def rts(self) -> bool:
+		raise AssertionError('RTS is only ever set')
+
+	@rts.setter
+	def rts(self, level: bool) -> None:
+		self.events.append(('rts', level))
+
+	def flush(self) -> None:
+		self.events.append(('flush', None))
+
+	def write(self, data: bytes) -> None:
+		self.events.append(('write', bytes(data)))
+
+	def read(self) -> bytes:
+		data, self.incoming[:] = bytes(self.incoming[:1]), self.incoming[1:]
+		return data
+
+	def reset_input_buffer(self) -> None:
+		pass
+
+	def reset_output_buffer(self) -> None:
+		pass
+
+@pytest.fixture
+def transport(monkeypatch: pytest.MonkeyPatch) -> Any:
+	monkeypatch.setattr(serial, 'Serial', FoconMockSerial)
+	def transport(direction: FoconDirectionControl | str | None = None, flow_control: bool = False) -> FoconSerialTransport:
+		return FoconSerialTransport('/dev/ttyFOCON', direction=direction, flow_control=flow_control)
+	return transport
+
+def exchange(transport: FoconSerialTransport) -> list[tuple[str, Any]]:
+	# two frames back-to-back, then a reply
+	serial: FoconMockSerial = transport.serial
+	serial.events.clear()
+	serial.incoming += b'\x01'
+	transport.write(b'a')
+	transport.write(b'b')
+	transport.read()
+	return serial.events
+
+def test_none_leaves_the_line_alone(transport: Any) -> None:
+	t = transport('none')
+	assert exchange(t) == [('write', b'a'), ('write', b'b')]
+
+@pytest.mark.parametrize('name, tx_level', [('rts', True), ('rts-inverted', False)])
+def test_rts_switches_on_transitions_only(transport: Any, name: str, tx_level: bool) -> None:
+	t = transport(name)
+	assert t.serial.events == [('rts', not tx_level)]
+	assert exchange(t) == [('rts', tx_level), ('write', b'a'), ('write', b'b'), ('flush', None), ('rts', not tx_level)]
+	assert t.direction.switches == 3
+
+def test_rs485_configures_the_kernel(transport: Any) -> None:
+	t = transport('rs485')
+	mode = t.serial.rs485_mode
+	assert (mode.rts_level_for_tx, mode.rts_level_for_rx) == (True, False)
+	# the driver does the switching
+	assert exchange(t) == [('write', b'a'), ('write', b'b')]
+
+def test_callback_gets_line_state(transport: Any) -> None:
+	states: list[bool] = []
+	t = transport(FoconCallbackDirectionControl(states.append))
+	assert exchange(t) == [('write', b'a'), ('write', b'b'), ('flush', None)]
+	assert states == [False, True, False]
+
+@pytest.mark.parametrize('direction, rtscts', [(None, False), ('rts', False), ('rs485', False), ('none', True)])
+def test_flow_control_only_without_rts_direction(transport: Any, direction: str | None, rtscts: bool) -> None:
+	# flow control on its own picks RTS direction control, as it used to
+	t = transport(direction, flow_control=True)
+	assert t.serial.kwargs['rtscts'] is rtscts
+
+def test_unknown_direction_control() -> None:
+	with pytest.raises(ValueError):
+		make_direction_control('semaphore')
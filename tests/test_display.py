@@ -0,0 +1,107 @@
+from typing import Callable
+
+import pytest
+
+from foconutil.sim import FoconSimulatedDisplay
+from foconutil.bitmap import FoconBitmap
+from foconutil.devices.display import (
+	FoconDisplay, FoconDisplayCommand, FoconDisplayConfiguration, FoconDisplayHideSpecification, FoconDisplayOutputSelector,
+	FoconDisplayMemoryStats, FoconDisplayNetworkStats, FoconDisplayDrawSpec, FoconDisplayDrawComposition,
+	FoconDisplayDrawTransition, FoconDisplayBitmapObject, ANONYMOUS_OBJECT_ID, plan_clear, plan_pixels,
+)
+
+
+def area(output_id: int, x: tuple[int, int], y: tuple[int, int]) -> FoconDisplayHideSpecification:
+	return FoconDisplayHideSpecification(mode=FoconDisplayOutputSelector.SingleArea, output_id=output_id, x_start=x[0], x_end=x[1], y_start=y[0], y_end=y[1])
+
+ALL = FoconDisplayHideSpecification(mode=FoconDisplayOutputSelector.AllFrom, output_id=0)
+
+def test_plan_clear_everything(config: FoconDisplayConfiguration) -> None:
+	assert plan_clear(config) == [ALL]
+	assert plan_clear(config, [output.index for output in config.outputs]) == [ALL]
+
+def test_plan_clear_whole_window_area(config: FoconDisplayConfiguration) -> None:
+	# an area covering the whole output is merged into a whole-output clear
+	assert plan_clear(config, x=(config.x_start, config.x_end), y=(config.y_start, config.y_end)) == [ALL]
+	assert plan_clear(config, x=(0, 1000), y=(0, 1000)) == [ALL]
+
+def test_plan_clear_partial_area(config: FoconDisplayConfiguration) -> None:
+	output = config.outputs[0]
+	(x_start, x_end), (y_start, y_end) = config.area_of(output)
+	assert plan_clear(config, x=(x_start + 2, x_start + 9)) == [area(output.index, (x_start + 2, x_start + 9), (y_start, y_end))]
+	assert plan_clear(config, y=y_start + 4) == [area(output.index, (x_start, x_end), (y_start + 4, y_end))]
+	# clipped to the window
+	assert plan_clear(config, x=(x_end - 3, x_end + 100), y=(0, y_start + 1)) == [area(output.index, (x_end - 3, x_end), (y_start, y_start + 1))]
+
+def test_plan_clear_area_outside_window(load_config: Callable[[str], FoconDisplayConfiguration]) -> None:
+	config = load_config('ns-sgmiii.id')
+	assert config.y_start == 16
+	with pytest.raises(ValueError):
+		plan_clear(config, x=(0, 10), y=(0, 5))
+	with pytest.raises(ValueError):
+		plan_clear(config, x=(config.x_end + 1, config.x_end + 10))
+
+def test_plan_clear_unknown_output(config: FoconDisplayConfiguration) -> None:
+	with pytest.raises(ValueError):
+		plan_clear(config, [max(output.index for output in config.outputs) + 1])
+	with pytest.raises(ValueError):
+		plan_clear(config, [99], x=(0, 10))
+
+def test_parse_memory_stats() -> None:
+	stats = FoconDisplayMemoryStats.parse('FreeBuffer: 8:20:4 [S:M:L]  RunTime: 0:1:2:18 [D:H:M:S]')
+	assert stats.free_buffers == (8, 20, 4)
+	assert stats.runtime == 3738
+	with pytest.raises(ValueError):
+		FoconDisplayMemoryStats.parse('no buffers here')
+
+def test_parse_network_stats() -> None:
+	stats = FoconDisplayNetworkStats.parse('SnpInfo Tx=000012, Rx=0x1F --- Error: Pkt=00, PktNo=00, TxBuf=04, NoAnswer=0x0a, Chk=09')
+	assert (stats.tx, stats.rx, stats.tx_buffer_errors, stats.no_answer_errors, stats.checksum_errors) == (12, 31, 4, 10, 9)
+	assert stats.errors == 23
+	with pytest.raises(ValueError):
+		FoconDisplayNetworkStats.parse('SnpInfo Tx=000012')
+
+def draw_spec(object_id: int = ANONYMOUS_OBJECT_ID, composition: FoconDisplayDrawComposition = FoconDisplayDrawComposition.Replace,
+              transition: FoconDisplayDrawTransition = FoconDisplayDrawTransition.Appear) -> FoconDisplayDrawSpec:
+	return FoconDisplayDrawSpec(object_id=object_id, output_id=1, composition=composition, transition=transition, x_start=10, x_end=109, y_end=15)
+
+def dots(*points: tuple[int, int]) -> FoconBitmap:
+	return FoconBitmap.from_values([[(x, y) in points for y in range(16)] for x in range(100)], 16)
+
+def areas(ops: list[FoconDisplayHideSpecification | FoconDisplayBitmapObject]) -> list[tuple[str, int, int, int, int]]:
+	# kind and x/y extents of every planned operation
+	return [
+		('draw', op.spec.x_start, op.spec.y_start, op.spec.x_end, op.spec.y_end) if isinstance(op, FoconDisplayBitmapObject)
+		else ('clear', op.x_start, op.y_start, op.x_end, op.y_end)
+		for op in ops
+	]
+
+def test_plan_pixels_dense_bitmap_is_sent_whole() -> None:
+	assert areas(plan_pixels(FoconBitmap.filled(100, 16), draw_spec())) == [('draw', 10, 0, 109, 15)]
+
+def test_plan_pixels_blank_anonymous_area_is_cleared() -> None:
+	assert areas(plan_pixels(FoconBitmap.blank(100, 16), draw_spec())) == [('clear', 10, 0, 109, 15)]
+
+def test_plan_pixels_sparse_anonymous_bitmap_is_cleared_and_cropped() -> None:
+	assert areas(plan_pixels(dots((50, 3)), draw_spec())) == [('clear', 10, 0, 109, 15), ('draw', 60, 3, 60, 3)]
+	# far apart, cheaper as separate objects than as one spanning both
+	assert areas(plan_pixels(dots((2, 3), (97, 10)), draw_spec())) == [
+		('clear', 10, 0, 109, 15), ('draw', 12, 3, 12, 3), ('draw', 107, 10, 107, 10),
+	]
+
+def test_plan_pixels_additive_bitmap_is_cropped_without_clear() -> None:
+	assert areas(plan_pixels(dots((50, 3)), draw_spec(1, FoconDisplayDrawComposition.Add))) == [('draw', 60, 3, 60, 3)]
+	# a named object is always sent, even when blank
+	assert areas(plan_pixels(FoconBitmap.blank(100, 16), draw_spec(1, FoconDisplayDrawComposition.Add))) == [('draw', 10, 0, 109, 15)]
+
+@pytest.mark.parametrize('spec', [draw_spec(1), draw_spec(transition=FoconDisplayDrawTransition.LeftScroll)], ids=['named', 'scrolling'])
+def test_plan_pixels_keeps_full_object(spec: FoconDisplayDrawSpec) -> None:
+	assert areas(plan_pixels(dots((50, 3)), spec)) == [('draw', 10, 0, 109, 15)]
+
+def test_fill_sends_planned_commands(display: FoconDisplay, simulated_display: FoconSimulatedDisplay) -> None:
+	status = display.fill(draw_spec())
+	assert status is not None and status.accepted
+	# nothing to report on when the area is only cleared
+	assert display.fill(draw_spec(), on=False) is None
+	assert display.fill(draw_spec(), on=False, optimize=False) is not None
+	assert simulated_display.sent == [FoconDisplayCommand.DrawPixels, FoconDisplayCommand.Clear, FoconDisplayCommand.DrawPixels]
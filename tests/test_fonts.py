@@ -0,0 +1,29 @@
+from foconutil.bitmap import FoconBitmap
+from foconutil.text import FoconGlyph, FoconGlyphCache, FoconTextLayout
+from foconutil.fonts import FoconDeviceFont, plan_text
+from foconutil.devices.display import FoconDisplayDrawSpec, FoconDisplayDrawComposition, FoconDisplayTextObject, FoconDisplayBitmapObject
+
+
+def block_font(width: int, height: int, chars: str = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ ') -> FoconDeviceFont:
+	glyphs = {c: FoconGlyph(bitmap=FoconBitmap.filled(width, height), ascent=height) for c in chars}
+	return FoconDeviceFont(key=('block', width, height), glyphs=glyphs)
+
+def spec(width: int, height: int) -> FoconDisplayDrawSpec:
+	return FoconDisplayDrawSpec(object_id=1, output_id=1, composition=FoconDisplayDrawComposition.Replace, x_end=width - 1, y_end=height - 1)
+
+def test_plan_text_prefers_string_when_it_fits() -> None:
+	host = FoconTextLayout(block_font(6, 16), cache=FoconGlyphCache())
+	assert isinstance(plan_text('hello', spec(160, 32), host), FoconDisplayTextObject)
+
+def test_plan_text_falls_back_to_pixels_when_host_does_not_fit() -> None:
+	host = FoconTextLayout(block_font(6, 16), cache=FoconGlyphCache())
+	# 40 characters of 6 pixels do not fit in 160 columns
+	assert isinstance(plan_text('a' * 40, spec(160, 32), host), FoconDisplayBitmapObject)
+	assert isinstance(plan_text('hello', spec(160, 8), host), FoconDisplayBitmapObject)
+
+def test_plan_text_device_layout_decides() -> None:
+	host = FoconTextLayout(block_font(6, 16), cache=FoconGlyphCache())
+	device = FoconTextLayout(block_font(3, 16, 'abcdefghijklmnopqrstuvwxyz '), cache=FoconGlyphCache())
+	assert isinstance(plan_text('a' * 40, spec(160, 32), host, device=device), FoconDisplayTextObject)
+	# not in the device font
+	assert isinstance(plan_text('A', spec(160, 32), host, device=device), FoconDisplayBitmapObject)
@@ -0,0 +1,56 @@
+import sys
+
+import pytest
+
+from foconutil.frame import FoconFrame, FoconFrameLog
+from foconutil.message import FoconMessage
+
+
+# reply to GetDeviceInfo, as captured from a display
+CAPTURED = bytes.fromhex('ff ff ff 01 49 2a 01 01 00 12 49 30 00 00 49 30 00 08 00 41 46 41 31 30 31 31 33 30 8c 03 ff')
+
+def test_pack_matches_captured_frame() -> None:
+	frame, rest = FoconFrame.unpack(CAPTURED)
+	assert rest == b''
+	assert frame.pack() == CAPTURED
+
+@pytest.mark.parametrize('dest_id', [3, None])
+def test_pack_into_matches_pack(dest_id: int | None) -> None:
+	message = FoconMessage(src_id=14, dest_id=dest_id, cmd=0x24, value=bytes(range(200)))
+	expected = FoconFrame(src_id=14, dest_id=dest_id, num=2, total=3, data=message.pack()).pack()
+	# a reused buffer, bigger than the frame and with stale contents
+	buffer = bytearray(b'\xaa' * 512)
+	view = FoconFrame.pack_into(buffer, 14, dest_id, 2, 3, message.parts())
+	assert bytes(view) == expected
+	assert buffer[len(expected):] == b'\xaa' * (512 - len(expected))
+	assert FoconFrame.unpack(bytes(view))[0].data == message.pack()
+
+def test_pack_into_rejects_small_buffer() -> None:
+	with pytest.raises(ValueError):
+		FoconFrame.pack_into(bytearray(FoconFrame.OVERHEAD + 3), 14, 3, 1, 1, [b'abcd'])
+
+def frames(n: int) -> list[FoconFrame]:
+	return [FoconFrame(src_id=i % 16, dest_id=None if i % 5 == 0 else 14, num=i % 3 + 1, total=3, data=bytes([i % 256]) * 16) for i in range(n)]
+
+def test_frame_log_round_trip() -> None:
+	log = FoconFrameLog(frames(100))
+	assert len(log) == 100
+	assert list(log) == frames(100)
+	assert log[-1] == frames(100)[-1]
+	log.append(FoconFrame(src_id=1, dest_id=2, num=1, total=1, data=b''), time=1.5)
+	assert log[100].data == b'' and log.time_of(100) == 1.5
+
+def test_frame_log_data_outlives_appends() -> None:
+	log = FoconFrameLog(frames(1))
+	data = log.data_of(0)
+	log.append_parts(1, 14, 1, 1, b'x' * 4096)
+	assert data == frames(1)[0].data
+
+def test_frame_log_is_smaller_than_frame_list() -> None:
+	n = 1000
+	listed = frames(n)
+	log = FoconFrameLog(listed)
+	# per frame: source, destination, number and total bytes, a 64-bit offset, 16-bit length and a double time
+	assert log.nbytes == n * (4 + 8 + 2 + 8 + 16)
+	list_bytes = sys.getsizeof(listed) + sum(sys.getsizeof(frame) + sys.getsizeof(frame.data) for frame in listed)
+	assert log.nbytes * 3 < list_bytes
@@ -0,0 +1,49 @@
+import os
+import sys
+import json
+import statistics
+import subprocess
+
+import pytest
+
+
+# Our own share of the import, without the standard library modules loaded up front.
+# Importing the display schemas, bus or frame code takes over 100 ms, so these catch any of them coming back.
+THRESHOLDS = {
+	'foconutil': 0.01,
+	'foconutil.cli': 0.02,
+}
+STDLIB = ('io', 'json', 'shlex', 'argparse', 'contextlib', 'logging', 'dataclasses', 'typing', 'importlib')
+# only needed by the commands that use them
+HEAVY = ('PIL', 'serial', 'crcmod')
+# all the CLI needs before it knows the command
+CLI_MODULES = {'foconutil', 'foconutil.cli', 'foconutil.direction'}
+
+def measure(module: str, root: str) -> tuple[float, list[str]]:
+	code = (
+		'import sys, json, time, {}; start = time.perf_counter(); import {}; elapsed = time.perf_counter() - start; '
+		'print(json.dumps([elapsed, list(sys.modules)]))'
+	).format(', '.join(STDLIB), module)
+	# fresh interpreter, nothing of ours may be imported already; bytecode is written, so later runs don't compile
+	env = {k: v for k, v in os.environ.items() if k != 'PYTHONDONTWRITEBYTECODE'}
+	result = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True, cwd=root, env=env)
+	elapsed, modules = json.loads(result.stdout)
+	return elapsed, modules
+
+@pytest.mark.parametrize('module', THRESHOLDS)
+def test_import_time(module: str, root: str) -> None:
+	# the first run may have to compile
+	runs = [measure(module, root) for _ in range(4)][1:]
+	elapsed = statistics.median(elapsed for elapsed, _ in runs)
+	assert elapsed < THRESHOLDS[module], f'import {module} took {elapsed * 1000:.1f} ms'
+
+	modules = runs[0][1]
+	assert not [name for name in modules if name.split('.')[0] in HEAVY]
+
+def test_package_is_lazy(root: str) -> None:
+	_, modules = measure('foconutil', root)
+	assert not [name for name in modules if name.startswith('foconutil.')]
+
+def test_cli_imports_commands_lazily(root: str) -> None:
+	_, modules = measure('foconutil.cli', root)
+	assert {name for name in modules if name.startswith('foconutil')} == CLI_MODULES
@@ -0,0 +1,39 @@
+from dataclasses import replace
+
+import pytest
+
+from foconutil.sim import FoconSimulatedDisplay
+from foconutil.bitmap import FoconBitmap
+from foconutil.journal import FoconDisplayJournal
+from foconutil.devices.display import (
+	FoconDisplay, FoconDisplayCommand, FoconDisplayDrawSpec, FoconDisplayDrawComposition, FoconDisplayStatus,
+	FoconDisplayError,
+)
+
+
+@pytest.fixture
+def shown(display_status: FoconDisplayStatus) -> FoconDisplayStatus:
+	# the journaled object is still there
+	return replace(display_status, visible_object_ids=[1], used_object_ids=[1])
+
+@pytest.fixture
+def journal(display: FoconDisplay, simulated_display: FoconSimulatedDisplay) -> FoconDisplayJournal:
+	journal = FoconDisplayJournal(display).attach()
+	spec = FoconDisplayDrawSpec(object_id=1, output_id=1, composition=FoconDisplayDrawComposition.Replace, x_end=7, y_end=7)
+	display.draw_bitmap(FoconBitmap.filled(8, 8), spec, optimize=False)
+	simulated_display.commands.clear()
+	return journal
+
+def test_restore_on_watchdog_rising_edge_only(journal: FoconDisplayJournal, simulated_display: FoconSimulatedDisplay, shown: FoconDisplayStatus) -> None:
+	watchdog = replace(shown, error_flags=FoconDisplayError.Watchdog)
+	assert not journal.check(shown)
+	assert journal.check(watchdog)
+	assert simulated_display.sent == [FoconDisplayCommand.DrawPixels]
+	# the flag stays set after the reset
+	assert not journal.check(watchdog)
+	assert not journal.check(watchdog)
+	assert journal.restores == 1
+
+def test_watchdog_already_set_is_not_a_reset(journal: FoconDisplayJournal, simulated_display: FoconSimulatedDisplay, shown: FoconDisplayStatus) -> None:
+	assert not journal.check(replace(shown, error_flags=FoconDisplayError.Watchdog))
+	assert not simulated_display.commands
@@ -0,0 +1,69 @@
+from typing import Callable
+
+from foconutil.sim import FoconSimulatedTransport, FoconSimulatedDevice, FoconSimulatedDisplay
+from foconutil.message import FoconMessageBus
+from foconutil.bitmap import FoconBitmap
+from foconutil.devices.display import FoconDisplay, FoconDisplayDrawSpec, FoconDisplayDrawStatus, FoconDisplayDrawComposition
+
+
+def echo(command: int, payload: bytes) -> bytes:
+	return bytes([command]) + payload[:3]
+
+MakeBus = Callable[..., FoconMessageBus]
+
+MIXED = [
+	[(0x41, b'a'), (0x42, b'x' * 1000), (0x43, b'c')],
+	[(0x42, b'x' * 1000), (0x41, b'a')],
+	[(0x41, b'a'), (0x42, b'x' * 1000), (0x44, b'y' * 600), (0x43, b'b'), (0x45, b'c')],
+]
+
+def test_send_commands_mixed_frame_counts(make_bus: MakeBus) -> None:
+	device = FoconSimulatedDevice(3, echo)
+	bus = make_bus([device])
+	for commands in MIXED:
+		assert bus.send_commands(3, commands) == [echo(c, p) for c, p in commands]
+	assert device.messages == sum(len(c) for c in MIXED)
+
+def test_send_commands_mixed_frame_counts_windowed(make_bus: MakeBus) -> None:
+	bus = make_bus([FoconSimulatedDevice(3, echo)])
+	for commands in MIXED:
+		assert bus.send_commands(3, commands, window=1) == [echo(c, p) for c, p in commands]
+
+def test_send_commands_mixed_frame_counts_with_resends(make_bus: MakeBus) -> None:
+	bus = make_bus([FoconSimulatedDevice(3, echo)], bit_error_rate=5e-5, seed=1)
+	for _ in range(10):
+		for commands in MIXED:
+			assert bus.send_commands(3, commands) == [echo(c, p) for c, p in commands]
+	assert bus.bus.stats.resent > 0
+
+def test_batch_with_full_area_draw(display: FoconDisplay, simulated_display: FoconSimulatedDisplay) -> None:
+	def spec(object_id: int) -> FoconDisplayDrawSpec:
+		return FoconDisplayDrawSpec(object_id=object_id, output_id=0, composition=FoconDisplayDrawComposition.Replace, x_end=141, y_end=47)
+
+	with display.batch() as batch:
+		batch.fill(spec(1))
+		batch.draw_bitmap(FoconBitmap.filled(142, 48), spec(2))
+		batch.redraw([1])
+	assert len(simulated_display.commands) == 3
+	assert batch.results[0] == FoconDisplayDrawStatus(object_id=1, status=0)
+
+class Corrupting:
+	# stands in for the simulator's random source: corrupts the frames at the given positions
+	def __init__(self, *corrupted: int) -> None:
+		self.corrupted = set(corrupted)
+		self.n = 0
+
+	def random(self) -> float:
+		self.n += 1
+		return 1.0 if self.n in self.corrupted else 0.0
+
+def test_final_frame_resent(make_bus: MakeBus) -> None:
+	device = FoconSimulatedDevice(3, echo)
+	bus = make_bus([device], bit_error_rate=1e-9)
+	transport = bus.bus.transport
+	assert isinstance(transport, FoconSimulatedTransport)
+	# the second frame of the message is its last
+	transport.random = Corrupting(2)  # type: ignore[assignment]
+	assert bus.send_command(3, 0x42, b'x' * 1000) == echo(0x42, b'x' * 1000)
+	assert bus.bus.stats.resent == 1
+	assert device.messages == 1
@@ -0,0 +1,41 @@
+import dataclasses
+
+import pytest
+
+from foconutil.sim import FoconSimulatedDisplay
+from foconutil.objects import FoconDisplayObjectAllocator
+from foconutil.devices.display import FoconDisplay, FoconDisplayDrawSpec, FoconDisplayDrawComposition
+
+
+SPEC = FoconDisplayDrawSpec(object_id=0, output_id=1, composition=FoconDisplayDrawComposition.Replace, x_end=9, y_end=9)
+
+def test_refused_draw_releases_new_lease(display: FoconDisplay, simulated_display: FoconSimulatedDisplay) -> None:
+	allocator = FoconDisplayObjectAllocator(display)
+	simulated_display.draw_statuses = [1]
+	with pytest.raises(RuntimeError):
+		allocator.print('a', SPEC, key='a')
+	assert not allocator.leases and not allocator.keys
+	assert allocator.available[False] == 8
+
+def test_failed_redraw_keeps_existing_lease(display: FoconDisplay, simulated_display: FoconSimulatedDisplay) -> None:
+	allocator = FoconDisplayObjectAllocator(display)
+	status = allocator.print('a', SPEC, key='a')
+	assert status.accepted
+	simulated_display.draw_statuses = [1]
+	with pytest.raises(RuntimeError):
+		allocator.print('b', SPEC, key='a')
+	assert allocator.keys == {'a': status.object_id}
+	assert allocator.available[False] == 7
+
+@pytest.mark.parametrize('shown', [True, False])
+def test_kind_switch_keeps_slot_count(display: FoconDisplay, simulated_display: FoconSimulatedDisplay, shown: bool) -> None:
+	allocator = FoconDisplayObjectAllocator(display)
+	object_id = allocator.lease(key='a')
+	assert allocator.available == {False: 7, True: 2}
+	if shown:
+		simulated_display.status = dataclasses.replace(simulated_display.status, available_still_objects=7, used_object_ids=[object_id])
+	# stale bookkeeping, so taking a scroll slot asks the display first
+	allocator.available[True] = 0
+	assert allocator.lease(scroll=True, key='a') == object_id
+	assert allocator.available == {False: 8, True: 1}
+	assert allocator.leases[object_id].scroll and allocator.keys == {'a': object_id}
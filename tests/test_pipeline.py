@@ -0,0 +1,38 @@
+import io
+import sys
+import subprocess
+
+import pytest
+
+from foconutil.bitmap import FoconBitmap
+from foconutil.pipeline import FoconImagePipeline
+
+
+def animation(n_frames: int) -> io.BytesIO:
+	import PIL.Image
+
+	frames = [PIL.Image.new('1', (16, 8), v % 2) for v in range(n_frames)]
+	f = io.BytesIO()
+	frames[0].save(f, 'GIF', save_all=True, append_images=frames[1:], duration=40, loop=0)
+	f.seek(0)
+	return f
+
+@pytest.mark.parametrize('processes', [False, True])
+def test_frames_in_order(processes: bool) -> None:
+	frames = list(FoconImagePipeline(animation(10), workers=2, read_ahead=3, processes=processes))
+	assert [bitmap for bitmap, _ in frames] == [FoconBitmap.from_values([[bool(v % 2)] * 8] * 16, 8) for v in range(10)]
+	assert all(duration == 0.04 for _, duration in frames)
+
+@pytest.mark.parametrize('stop', [1, None])
+def test_process_pool_exits_cleanly(stop: int | None, root: str) -> None:
+	code = '\n'.join([
+		'import sys; sys.path.insert(0, "tests")',
+		'from test_pipeline import animation',
+		'from foconutil.pipeline import FoconImagePipeline',
+		'for n, _ in enumerate(FoconImagePipeline(animation(40), workers=2, read_ahead=4, processes=True)):',
+		'	if n == {}:'.format(stop),
+		'		break',
+	])
+	# in a fresh interpreter, so the workers are still around when it exits
+	result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=root)
+	assert result.returncode == 0 and not result.stderr, result.stderr
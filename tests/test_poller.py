@@ -0,0 +1,17 @@
+from foconutil.poller import FoconFleetPoller, FoconPolledDisplay
+from foconutil.devices.device import FoconDevice
+from foconutil.devices.display import FoconDisplay
+
+
+def test_unanswered_poll_fails_and_bus_recovers(display: FoconDisplay) -> None:
+	bus = display.device.bus
+	# nothing answers on address 4
+	missing = FoconPolledDisplay('missing', FoconDisplay(FoconDevice(bus, 4)))
+	present = FoconPolledDisplay('present', display)
+	poller = FoconFleetPoller([missing, present], clock=bus.bus.clock)
+
+	assert poller.poll(missing) is None
+	assert (missing.failures, missing.up) == (1, False)
+	sample = poller.poll(present)
+	assert sample is not None and sample.available_still_objects == 8
+	assert present.up
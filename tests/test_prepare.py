@@ -0,0 +1,24 @@
+import pytest
+import PIL.Image
+
+from foconutil.prepare import FoconImagePreparer, FoconScaling, FoconDithering
+
+
+def test_palette_is_part_of_cache_key() -> None:
+	preparer = FoconImagePreparer(4, 2, dithering=FoconDithering.Threshold)
+	image = PIL.Image.new('P', (4, 2))
+	image.putpalette([0, 0, 0] * 256)
+	dark = preparer(image)
+	image.putpalette([255, 255, 255] * 256)
+	light = preparer(image)
+	assert not any(map(any, dark.to_values()))
+	assert all(map(all, light.to_values()))
+
+@pytest.mark.parametrize('pitch', [(1.0, 1.0), (2.0, 1.0)])
+def test_crop_keeps_pixels(pitch: tuple[float, float]) -> None:
+	image = PIL.Image.new('L', (6, 4))
+	image.putpixel((0, 0), 255)
+	image.putpixel((5, 3), 255)
+	preparer = FoconImagePreparer(8, 4, scaling=FoconScaling.Crop, dithering=FoconDithering.Threshold, pitch=pitch)
+	values = preparer(image).to_values()
+	assert [(x, y) for x, column in enumerate(values) for y, v in enumerate(column) if v] == [(1, 0), (6, 3)]
@@ -0,0 +1,92 @@
+from typing import Callable
+
+import pytest
+
+from foconutil.bitmap import FoconBitmap
+from foconutil.schema import FoconStruct, Layout
+from foconutil.devices.device import FoconDeviceInfo, FoconBootMode
+from foconutil.devices.bootloader import FoconBootHeader, FoconBootFlashBlock
+from foconutil.devices.display import (
+	FoconDisplayConfiguration, FoconDisplayAssetData, FoconDisplayStatus, FoconDisplayError,
+	FoconDisplayHideSpecification, FoconDisplayOutputSelector, FoconDisplayDrawList,
+	FoconDisplayRedrawSpecification, FoconDisplayUndrawSpecification, FoconDisplayDrawSpec,
+	FoconDisplayDrawComposition, FoconDisplayDrawTransition, FoconDisplayTextObject, FoconDisplayPixelObject,
+	FoconDisplayBitmapObject, FoconDisplayDrawStatus, FoconDisplayAlignment, FoconDisplayHorizontalAlignment,
+	FoconDisplayVerticalAlignment,
+)
+
+
+SPEC = FoconDisplayDrawSpec(
+	object_id=3, output_id=1, composition=FoconDisplayDrawComposition.Add, x_start=2, y_start=1, x_end=99, y_end=15,
+	transition=FoconDisplayDrawTransition.Appear, count=2, duration=20, duration_duty=40, pwm_cycle=1,
+)
+
+OBJECTS: list[FoconStruct] = [
+	SPEC,
+	FoconDeviceInfo(kind='D', mode=FoconBootMode.Application, boot_version=(1, 2), app_version=(1, 30)),
+	FoconDeviceInfo(kind='D', mode=FoconBootMode.BootLoader, boot_version=(1, 2), app_version=None),
+	FoconBootHeader(checksum=0x1234, start_address=0x7000, end_address=0x7fff),
+	FoconBootFlashBlock(address=0x7000, data=b'\x01\x02\x03'),
+	FoconDisplayAssetData(version=(1, 4), part_id=123456, name='fonts', font_count=3, size=4096),
+	FoconDisplayStatus(
+		error_flags=FoconDisplayError.Watchdog | FoconDisplayError.Temperature, temperature=23.5, mode=1,
+		general_adjust=2, brightness_adjust=None, temp_adjust=3, overall_adjust=4, power10_value=5,
+		available_still_objects=6, available_scroll_objects=7, visible_object_ids=[1, 2], used_object_ids=[1, 2, 9],
+	),
+	FoconDisplayStatus(
+		error_flags=FoconDisplayError(0), temperature=0.0, mode=0, general_adjust=0, brightness_adjust=80,
+		temp_adjust=0, overall_adjust=0, power10_value=0, available_still_objects=0, available_scroll_objects=0,
+		visible_object_ids=[], used_object_ids=[],
+	),
+	FoconDisplayHideSpecification(mode=FoconDisplayOutputSelector.SingleArea, output_id=1, x_start=1, x_end=2, y_start=3, y_end=4),
+	FoconDisplayDrawList(ids=[1, 2, 3]),
+	FoconDisplayRedrawSpecification(composition=FoconDisplayDrawComposition.Replace, objects=FoconDisplayDrawList(ids=[4])),
+	FoconDisplayUndrawSpecification(update=True, objects=FoconDisplayDrawList(ids=[])),
+	FoconDisplayTextObject(
+		spec=SPEC, text='Hallo Welt', font_size=12,
+		alignment=FoconDisplayAlignment(FoconDisplayHorizontalAlignment.Left, FoconDisplayVerticalAlignment.Center),
+	),
+	FoconDisplayPixelObject(spec=SPEC, height=9, values=[[x == y for y in range(9)] for x in range(5)]),
+	FoconDisplayBitmapObject(spec=SPEC, bitmap=FoconBitmap.from_values([[x == y for y in range(9)] for x in range(5)], 9)),
+	FoconDisplayDrawStatus(object_id=3, status=1),
+]
+
+@pytest.mark.parametrize('obj', OBJECTS, ids=lambda obj: type(obj).__name__)
+def test_round_trip(obj: FoconStruct) -> None:
+	data = obj.pack()
+	assert type(obj).unpack(data) == obj
+
+	buffer = bytearray(len(data) + 3)
+	assert obj.pack_into(buffer, 3) == len(buffer)
+	assert bytes(buffer[3:]) == data
+	assert type(obj).unpack_from(buffer, 3) == obj
+
+@pytest.mark.parametrize('obj', OBJECTS, ids=lambda obj: type(obj).__name__)
+def test_compiled_matches_generic(obj: FoconStruct) -> None:
+	layout = type(obj).LAYOUT
+	data = Layout.pack(layout, obj)
+	assert obj.pack() == data
+	assert Layout.unpack(layout, data) == type(obj).unpack(data)
+	assert Layout.unpack_partial(layout, data + b'rest') == layout.unpack_partial(data + b'rest')
+
+def test_config_round_trip(config_name: str, load_config_data: Callable[[str], bytes]) -> None:
+	data = load_config_data(config_name)
+	config = FoconDisplayConfiguration.unpack(data)
+	assert config.pack() == data[:FoconDisplayConfiguration.sizeof()]
+	assert FoconDisplayConfiguration.unpack(config.pack()) == config
+
+@pytest.mark.parametrize('cls', [FoconDisplayDrawStatus, FoconDisplayStatus, FoconDisplayDrawSpec, FoconDisplayConfiguration])
+def test_truncated_fixed_part(cls: type[FoconStruct]) -> None:
+	with pytest.raises(ValueError):
+		cls.unpack(b'')
+	with pytest.raises(ValueError):
+		cls.unpack(bytes(cls.sizeof() - 1))
+	with pytest.raises(ValueError):
+		cls.unpack_from(bytes(cls.sizeof()), 1)
+
+def test_truncated_counted_tail() -> None:
+	data = FoconDisplayDrawList(ids=[1, 2, 3]).pack()
+	with pytest.raises(ValueError):
+		FoconDisplayDrawList.unpack(data[:-1])
+	with pytest.raises(ValueError):
+		FoconDisplayRedrawSpecification.unpack(b'N')
@@ -0,0 +1,69 @@
+from typing import Any, Callable, Iterator
+
+import os
+import threading
+
+import pytest
+
+from foconutil.sim import FoconSimulatedDevice
+from foconutil.message import FoconMessageBus
+from foconutil.server import FoconServer, FoconRemoteTarget, default_socket_path
+
+
+def handler(command: int, payload: bytes) -> bytes:
+	if command == 0x99:
+		raise IOError('device on fire')
+	return bytes([command])
+
+@pytest.fixture
+def serve(tmp_path: Any, make_bus: Callable[..., FoconMessageBus]) -> Iterator[Callable[[bool], FoconServer]]:
+	servers: list[FoconServer] = []
+	def serve(allow_dangerous: bool) -> FoconServer:
+		server = FoconServer(str(tmp_path / f'focon-{len(servers)}.sock'), lambda device: make_bus([FoconSimulatedDevice(3, handler)]), ['sim'], allow_dangerous=allow_dangerous)
+		servers.append(server)
+		threading.Thread(target=server.serve_forever, daemon=True).start()
+		while not os.path.exists(server.path):
+			pass
+		return server
+	yield serve
+	for server in servers:
+		server.close()
+
+def test_bus_errors_reach_the_client(serve: Callable[[bool], FoconServer]) -> None:
+	target = FoconRemoteTarget(serve(True).path, 'sim', 'device', 3)
+	try:
+		assert target.send_command(0x41) == b'\x41'
+		with pytest.raises(IOError, match='on fire'):
+			target.send_command(0x99)
+		# the connection survives the error
+		assert target.send_command(0x42) == b'\x42'
+	finally:
+		target.close()
+
+@pytest.mark.parametrize('allow_dangerous', [False, True])
+def test_only_served_methods_run(serve: Callable[[bool], FoconServer], allow_dangerous: bool) -> None:
+	server = serve(allow_dangerous)
+	display = FoconRemoteTarget(server.path, 'sim', 'display', 3)
+	device = FoconRemoteTarget(server.path, 'sim', 'device', 3)
+	try:
+		# not on the list, whatever the server allows
+		with pytest.raises(AttributeError):
+			display.batch()
+		with pytest.raises(AttributeError):
+			device.get_status()
+		if allow_dangerous:
+			display.set_unk47(1, 2)
+			assert device.send_command(0x41) == b'\x41'
+		else:
+			with pytest.raises(PermissionError):
+				display.set_unk47(1, 2)
+			with pytest.raises(PermissionError):
+				device.send_command(0x41)
+	finally:
+		display.close()
+		device.close()
+
+def test_no_shared_default_socket(monkeypatch: Any) -> None:
+	monkeypatch.delenv('XDG_RUNTIME_DIR', raising=False)
+	with pytest.raises(RuntimeError):
+		default_socket_path()
@@ -0,0 +1,64 @@
+import os
+import sys
+import subprocess
+from pathlib import Path
+
+from foconutil.sim import FoconSimulatedDisplay
+from foconutil.bitmap import FoconBitmap
+from foconutil.shm import FoconSharedFrameRing, FoconSharedFrameSender, SEQUENCE
+from foconutil.devices.display import (
+	FoconDisplay, FoconDisplayCommand, FoconDisplayDrawSpec, FoconDisplayDrawComposition, FoconDisplayBitmapObject,
+)
+
+
+SPEC = FoconDisplayDrawSpec(object_id=1, output_id=1, composition=FoconDisplayDrawComposition.Replace, x_end=7, y_end=7)
+
+def frame(value: int) -> FoconBitmap:
+	return FoconBitmap.from_values([[bool(value >> x & 1)] * 8 for x in range(8)], 8)
+
+def test_sender_sends_frame_written_before_start(tmp_path: Path, display: FoconDisplay, simulated_display: FoconSimulatedDisplay) -> None:
+	ring = FoconSharedFrameRing.create_file(os.path.join(tmp_path, 'ring'), 8, 8)
+	try:
+		ring.write_bitmap(frame(1))
+		sender = FoconSharedFrameSender(display, SPEC, ring)
+		assert sender.send_latest() is not None
+		assert sender.send_latest() is None
+
+		for value in (2, 3, 4):
+			ring.write_bitmap(frame(value))
+		assert sender.send_latest() is not None
+		assert simulated_display.sent == [FoconDisplayCommand.DrawPixels] * 2
+		assert [FoconDisplayBitmapObject.unpack(payload).bitmap for _, payload in simulated_display.commands] == [frame(1), frame(4)]
+		assert (sender.sent, sender.skipped) == (2, 2)
+	finally:
+		ring.close()
+		ring.unlink()
+
+def test_torn_slot_is_given_up(tmp_path: Path) -> None:
+	ring = FoconSharedFrameRing.create_file(os.path.join(tmp_path, 'ring'), 8, 8, slots=1)
+	try:
+		ring.write_bitmap(frame(1))
+		# the producer died while writing the next frame over the only slot
+		SEQUENCE.pack_into(ring.buf, ring.slot_offset(2), 2 * 2 - 1)
+		assert ring.read_bitmap() is None
+		# until it comes back
+		ring.write_bitmap(frame(2))
+		assert ring.read_bitmap() == (2, frame(2))
+	finally:
+		ring.close()
+		ring.unlink()
+
+def test_reader_exit_keeps_shared_block(root: str) -> None:
+	name = 'focon-test-{}'.format(os.getpid())
+	ring = FoconSharedFrameRing.create_shared(name, 8, 8)
+	try:
+		ring.write_bitmap(frame(5))
+		code = 'from foconutil.shm import FoconSharedFrameRing; FoconSharedFrameRing.open({!r}).close()'.format(name)
+		result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=root)
+		assert result.returncode == 0 and not result.stderr
+		reader = FoconSharedFrameRing.open(name)
+		assert reader.read_bitmap() == (1, frame(5))
+		reader.close()
+	finally:
+		ring.close()
+		ring.unlink()
@@ -0,0 +1,73 @@
+import io
+
+import pytest
+
+from foconutil.sim import FoconSimulatedDisplay
+from foconutil.bitmap import FoconBitmap
+from foconutil.stream import FoconRawFrameSource, FoconDisplayStream, raw_to_bitmap
+from foconutil.devices.display import (
+	FoconDisplay, FoconDisplayCommand, FoconDisplayDrawSpec, FoconDisplayDrawComposition, FoconDisplayBitmapObject,
+)
+
+
+SPEC = FoconDisplayDrawSpec(object_id=1, output_id=1, composition=FoconDisplayDrawComposition.Replace, x_end=7, y_end=7)
+
+def frame(value: int) -> bytes:
+	# 8x8 pixels, one bit per pixel
+	return bytes([value]) * 8
+
+class FoconTricklingReader(io.RawIOBase):
+	# like a pipe that has only a few bytes ready at a time
+	def __init__(self, data: bytes, chunk: int) -> None:
+		self.data = io.BytesIO(data)
+		self.chunk = chunk
+
+	def readable(self) -> bool:
+		return True
+
+	def readinto(self, buffer: memoryview) -> int:  # type: ignore[override]
+		return self.data.readinto(buffer[:self.chunk])
+
+def test_source_reads_whole_frames() -> None:
+	source = FoconRawFrameSource(FoconTricklingReader(frame(1) + frame(2) + b'\xff' * 3, chunk=3), 8, 8, depth=1)  # type: ignore[arg-type]
+	assert [source.read(), source.read(), source.read()] == [frame(1), frame(2), None]
+
+def test_source_rejects_depth() -> None:
+	with pytest.raises(ValueError):
+		FoconRawFrameSource(io.BytesIO(), 8, 8, depth=4)
+
+def sent_bitmaps(simulated_display: FoconSimulatedDisplay) -> list[FoconBitmap]:
+	assert set(simulated_display.sent) <= {FoconDisplayCommand.DrawPixels}
+	return [FoconDisplayBitmapObject.unpack(payload).bitmap for _, payload in simulated_display.commands]
+
+def test_unchanged_frames_are_skipped(display: FoconDisplay, simulated_display: FoconSimulatedDisplay) -> None:
+	stream = FoconDisplayStream(display, SPEC, FoconRawFrameSource(io.BytesIO(), 8, 8, depth=1))
+	for data in (frame(1), frame(1), frame(2), frame(2), frame(1)):
+		stream.submit(data)
+		stream.queue.flush()
+	assert sent_bitmaps(simulated_display) == [raw_to_bitmap(frame(v), 8, 8, 1) for v in (1, 2, 1)]
+	assert (stream.stats.received, stream.stats.unchanged, stream.stats.sent, stream.stats.dropped) == (5, 2, 3, 0)
+
+def test_waiting_frames_are_replaced(display: FoconDisplay, simulated_display: FoconSimulatedDisplay) -> None:
+	converted: list[bytes] = []
+	def convert(data: bytes) -> FoconBitmap:
+		converted.append(data)
+		return raw_to_bitmap(data, 8, 8, 1)
+	stream = FoconDisplayStream(display, SPEC, FoconRawFrameSource(io.BytesIO(), 8, 8, depth=1), convert=convert)
+	# the bus is busy while these come in
+	for value in (1, 2, 3):
+		stream.submit(frame(value))
+	stream.queue.flush()
+	assert sent_bitmaps(simulated_display) == [raw_to_bitmap(frame(3), 8, 8, 1)]
+	# dropped frames were never converted
+	assert converted == [frame(3)]
+	assert (stream.stats.received, stream.stats.dropped, stream.stats.sent) == (3, 2, 1)
+
+def test_run_accounts_for_every_frame(display: FoconDisplay, simulated_display: FoconSimulatedDisplay) -> None:
+	data = b''.join(frame(v) for v in (1, 1, 2, 3, 4))
+	stream = FoconDisplayStream(display, SPEC, FoconRawFrameSource(io.BytesIO(data), 8, 8, depth=1))
+	stats = stream.run()
+	assert stats.received == 5 and stats.unchanged == 1 and stats.failed == 0
+	assert stats.sent + stats.dropped == 4
+	# the last frame always makes it
+	assert sent_bitmaps(simulated_display)[-1] == raw_to_bitmap(frame(4), 8, 8, 1)
@@ -0,0 +1,45 @@
+import os
+import glob
+import tempfile
+
+from foconutil.text import FoconFont, FoconGlyphCache, load_font
+
+
+BDF = '''STARTFONT 2.1
+FONT -test-tiny-medium-r-normal--4-40-75-75-c-40-iso10646-1
+SIZE 4 75 75
+FONTBOUNDINGBOX 3 4 0 0
+STARTPROPERTIES 2
+FONT_ASCENT 4
+FONT_DESCENT 0
+ENDPROPERTIES
+CHARS 1
+STARTCHAR A
+ENCODING 65
+SWIDTH 750 0
+DWIDTH 3 0
+BBX 3 4 0 0
+BITMAP
+40
+A0
+E0
+A0
+ENDCHAR
+ENDFONT
+'''
+
+def temp_font_dirs() -> set[str]:
+	return set(glob.glob(os.path.join(tempfile.gettempdir(), 'foconutil-font-*')))
+
+def test_bitmap_font_leaves_no_files(tmp_path: 'os.PathLike[str]') -> None:
+	path = os.path.join(tmp_path, 'tiny.bdf')
+	with open(path, 'w') as f:
+		f.write(BDF)
+	before = temp_font_dirs()
+	load_font.cache_clear()
+	font = FoconFont(path)
+	bitmap = FoconGlyphCache().render('AA', font)
+	assert temp_font_dirs() == before
+	assert (bitmap.width, bitmap.height) == (6, 4)
+	values = bitmap.to_values()
+	assert values[1][0] and not values[0][0]
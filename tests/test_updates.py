@@ -0,0 +1,36 @@
+import itertools
+
+import pytest
+
+from foconutil import updates
+from foconutil.sim import FoconSimulatedDisplay
+from foconutil.bitmap import FoconBitmap
+from foconutil.updates import FoconDisplayUpdateQueue, FoconDisplayUpdateResult
+from foconutil.devices.display import FoconDisplay, FoconDisplayCommand, FoconDisplayDrawSpec, FoconDisplayDrawComposition, FoconDisplayDrawStatus
+
+
+def spec(object_id: int) -> FoconDisplayDrawSpec:
+	return FoconDisplayDrawSpec(object_id=object_id, output_id=1, composition=FoconDisplayDrawComposition.Replace, x_end=7, y_end=7)
+
+def test_merged_updates_wait_since_the_oldest(display: FoconDisplay, simulated_display: FoconSimulatedDisplay, monkeypatch: pytest.MonkeyPatch) -> None:
+	results: list[FoconDisplayUpdateResult] = []
+	queue = FoconDisplayUpdateQueue(display, callback=results.append)
+	# submitted at 0, 1 and 2, sent at 3
+	clock = itertools.count()
+	monkeypatch.setattr(updates.time, 'monotonic', lambda: float(next(clock)))
+	for value in (False, True, False):
+		queue.fill(spec(1), on=value, optimize=False)
+	queue.flush()
+	assert simulated_display.sent == [FoconDisplayCommand.DrawPixels]
+	assert [(result.merged, result.latency) for result in results] == [(2, 3.0)]
+	assert (queue.stats.enqueued, queue.stats.merged, queue.stats.sent, queue.stats.latency_max) == (3, 2, 1, 3.0)
+
+def test_refused_draws_are_failed(display: FoconDisplay, simulated_display: FoconSimulatedDisplay) -> None:
+	results: list[FoconDisplayUpdateResult] = []
+	queue = FoconDisplayUpdateQueue(display, callback=results.append)
+	simulated_display.draw_statuses = [0, 2]
+	queue.draw_bitmap(FoconBitmap.filled(8, 8), spec(1), optimize=False)
+	queue.draw_bitmap(FoconBitmap.filled(8, 8), spec(2), optimize=False)
+	queue.flush()
+	assert (queue.stats.sent, queue.stats.failed) == (1, 1)
+	assert [result.result for result in results] == [FoconDisplayDrawStatus(1, 0), FoconDisplayDrawStatus(2, 2)]
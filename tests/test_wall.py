@@ -0,0 +1,66 @@
+from typing import Callable
+
+import pytest
+
+from foconutil.sim import FoconSimulatedDevice, FoconSimulatedDisplay
+from foconutil.message import FoconMessageBus
+from foconutil.bitmap import FoconBitmap
+from foconutil.wall import FoconVideoWall, FoconWallTile
+from foconutil.devices.device import FoconDevice
+from foconutil.devices.display import (
+	FoconDisplay, FoconDisplayCommand, FoconDisplayConfiguration, FoconDisplayDrawComposition, FoconDisplayStatus,
+)
+
+
+def test_present_only_redraws_wall_members(load_config: Callable[[str], FoconDisplayConfiguration], make_bus: Callable[..., FoconMessageBus],
+                                           display_status: FoconDisplayStatus) -> None:
+	config = load_config('ns-sgmiii.ed')
+	recorders_a = {i: FoconSimulatedDisplay(display_status) for i in (1, 2, 5)}
+	recorders_b = {3: FoconSimulatedDisplay(display_status)}
+	bus_a = make_bus([FoconSimulatedDevice(i, r) for i, r in recorders_a.items()])
+	bus_b = make_bus([FoconSimulatedDevice(i, r) for i, r in recorders_b.items()])
+	tiles = []
+	for i, (bus, dest_id) in enumerate([(bus_a, 1), (bus_a, 2), (bus_b, 3)]):
+		display = FoconDisplay(FoconDevice(bus, dest_id))
+		display.use_config(config)
+		tiles.append(FoconWallTile(display, x=i * config.width, y=0))
+	wall = FoconVideoWall(tiles, object_id=7)
+
+	presentation = wall.present(FoconBitmap.filled(wall.width, wall.height))
+	assert len(presentation.present_times) == 3
+
+	for recorder in (recorders_a[1], recorders_a[2], recorders_b[3]):
+		assert recorder.sent == [FoconDisplayCommand.Undraw, FoconDisplayCommand.DrawPixels, FoconDisplayCommand.Redraw]
+		# the tile is drawn without showing it, and only shown by the redraw
+		draw = recorder.commands[1][1]
+		assert draw[0] == 7 and chr(draw[1]) == FoconDisplayDrawComposition.Remove.value
+		assert chr(recorder.commands[2][1][0]) == FoconDisplayDrawComposition.Add.value
+	# not part of the wall, but on the same bus
+	assert recorders_a[5].commands == []
+
+@pytest.fixture
+def wall_of(load_config: Callable[[str], FoconDisplayConfiguration], make_bus: Callable[..., FoconMessageBus],
+            display_status: FoconDisplayStatus) -> Callable[[int], FoconVideoWall]:
+	# a row of tiles, all on one bus
+	def wall_of(n_tiles: int) -> FoconVideoWall:
+		config = load_config('ns-icmm.esd')
+		bus = make_bus([FoconSimulatedDevice(i + 1, FoconSimulatedDisplay(display_status)) for i in range(n_tiles)])
+		tiles = []
+		for i in range(n_tiles):
+			display = FoconDisplay(FoconDevice(bus, i + 1))
+			display.use_config(config)
+			tiles.append(FoconWallTile(display, x=i * config.width, y=0))
+		return FoconVideoWall(tiles)
+	return wall_of
+
+def test_skew_grows_with_tiles_per_bus(wall_of: Callable[[int], FoconVideoWall]) -> None:
+	skews = []
+	for n_tiles in (1, 2, 4):
+		wall = wall_of(n_tiles)
+		presentation = wall.present(FoconBitmap.blank(wall.width, wall.height))
+		assert presentation.present_times == sorted(presentation.present_times)
+		skews.append(presentation.skew)
+	assert skews[0] == 0.0
+	assert 0.0 < skews[1] < skews[2]
+	# every redraw after the first one takes the same time on the wire
+	assert skews[2] == pytest.approx(skews[1] * 3)